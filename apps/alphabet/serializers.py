@@ -35,5 +35,7 @@ class LearnedLetterSerializer(serializers.ModelSerializer):
     def get_count(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return LearnedLetter.objects.filter(user=request.user).count()
+            if not hasattr(self, '_count'):
+                self._count = LearnedLetter.objects.filter(user=request.user).count()
+            return self._count
         return 0
@@ -163,3 +163,19 @@ class LearnedLetterAPITests(APITestCase):
         url = reverse("alphabet:learned-delete-all")
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class QueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="testuser", password="testpass")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            letter = Letter.objects.create(letter=f"Letter {i}", audio="audio.mp3")
+            LearnedLetter.objects.create(user=self.user, letter=letter)
+
+    def test_learned_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse("alphabet:learned-list"))
+        self.assertEqual(len(response.data), 25)
+        self.assertEqual(response.data[0]["count"], 25)
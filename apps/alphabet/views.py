@@ -25,7 +25,7 @@ class LearnedLetterViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return LearnedLetter.objects.filter(user=self.request.user)
+        return LearnedLetter.objects.filter(user=self.request.user).select_related('letter')
 
     @action(detail=False, methods=['get'], url_path='count')
     def get_count(self, request):
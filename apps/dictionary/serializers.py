@@ -111,5 +111,8 @@ class LearnedWordSerializer(serializers.ModelSerializer):
     def get_count(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return LearnedWord.objects.filter(user=request.user).count()
+            # A list shares one child serializer, so the count runs once per response.
+            if not hasattr(self, '_count'):
+                self._count = LearnedWord.objects.filter(user=request.user).count()
+            return self._count
         return 0
@@ -248,3 +248,56 @@ class TranslationValidationTests(APITestCase):
             {'name': '   '}
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class QueryCountTests(APITestCase):
+    # Every word, translation and learned entry gets its own category, part of
+    # speech and origin, so a missing join would show up as one query per row.
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            word = Word.objects.create(
+                text=f'Слово {i}',
+                category=Category.objects.create(name=f'Категория {i}'),
+                part_of_speech=PartOfSpeech.objects.create(name=f'Часть речи {i}')
+            )
+            translation = Translation.objects.create(
+                text=f'Перевод {i}',
+                audio=f'audio{i}.mp3',
+                word=word,
+                origin=Origin.objects.create(language=f'Язык {i}')
+            )
+            FavoriteWord.objects.create(user=self.user, translation=translation)
+            LearnedWord.objects.create(user=self.user, translation=translation)
+        self.word = word
+        Translation.objects.bulk_create(
+            Translation(text=f'Перевод {i}', audio='audio.mp3', word=word, origin=Origin.objects.create(language=f'Диалект {i}'))
+            for i in range(10)
+        )
+
+    def test_word_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dictionary:word-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_word_detail(self):
+        with self.assertNumQueries(1):
+            self.client.get(reverse('dictionary:word-detail', args=[self.word.id]))
+
+    def test_word_translations(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dictionary:word-translations', args=[self.word.id]))
+        self.assertEqual(len(response.data['translations']), 11)
+
+    def test_favorite_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('dictionary:favorite-list'))
+        self.assertEqual(len(response.data), 25)
+
+    def test_learned_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('dictionary:learned-list'))
+        self.assertEqual(len(response.data), 25)
+        self.assertEqual(response.data[0]['count'], 25)
@@ -46,12 +46,12 @@ class DictionaryViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['category', 'part_of_speech']
     search_fields = ['text']
-    queryset = Word.objects.all()
+    queryset = Word.objects.select_related('category', 'part_of_speech')
 
     @action(detail=True, methods=['get'], url_path='translations')
     def translations(self, request, pk=None):
         word = self.get_object()
-        translations = Translation.objects.filter(word=word)
+        translations = Translation.objects.filter(word=word).select_related('origin')
         response_data = {
             "word": WordSerializer(word).data,
             "translations": TranslationSerializer(translations, many=True).data
@@ -65,7 +65,7 @@ class FavoriteWordViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return FavoriteWord.objects.filter(user=self.request.user)
+        return FavoriteWord.objects.filter(user=self.request.user).select_related('translation__origin')
 
     def perform_create(self, serializer):
         if FavoriteWord.objects.filter(
@@ -112,7 +112,7 @@ class LearnedWordViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return LearnedWord.objects.filter(user=self.request.user)
+        return LearnedWord.objects.filter(user=self.request.user).select_related('translation__origin')
 
     @action(detail=False, methods=['get'], url_path='count')
     def get_learned_count(self, request):
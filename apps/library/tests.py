@@ -10,7 +10,8 @@ from apps.library.models import (
     Book,
     Category,
     Sentence,
-    Bookmark
+    Bookmark,
+    CompletedBook
 )
 
 User = get_user_model()
@@ -146,3 +147,50 @@ class BookmarkSerializerTests(APITestCase):
 
         serializer = BookmarkSerializer(data=data)
         self.assertTrue(serializer.is_valid())
+
+
+class QueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            book = Book.objects.create(
+                title=f'Book {i}',
+                author='Author',
+                category=Category.objects.create(name=f'Category {i}'),
+                logo='logo.jpg'
+            )
+            sentence = Sentence.objects.create(
+                text=f'Sentence {i}',
+                audio='audio.mp3',
+                translate=f'Translate {i}',
+                book=book
+            )
+            Bookmark.objects.create(user=self.user, book=book, sentence=sentence)
+            CompletedBook.objects.create(user=self.user, book=book)
+        self.book = book
+        Sentence.objects.bulk_create(
+            Sentence(text=f'More {i}', audio='audio.mp3', translate='Translate', book=book)
+            for i in range(10)
+        )
+
+    def test_book_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('library:book-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_book_sentences(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('library:book-sentences', args=[self.book.id]))
+        self.assertEqual(len(response.data['sentences']), 11)
+
+    def test_completed_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('library:completed-list'))
+        self.assertEqual(len(response.data), 25)
+
+    def test_bookmark_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('library:bookmark-list'))
+        self.assertEqual(len(response.data), 25)
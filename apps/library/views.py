@@ -37,12 +37,12 @@ class LibraryViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['category']
     search_fields = ['title', 'author']
-    queryset = Book.objects.all()
+    queryset = Book.objects.select_related('category')
 
     @action(detail=True, methods=['get'], url_path='sentences')
     def sentences(self, request, pk=None):
         book = self.get_object()
-        sentences = Sentence.objects.filter(book=book)
+        sentences = Sentence.objects.filter(book=book).select_related('book__category')
         response_data = {
             "book": BookSerializer(book).data,
             "sentences": SentenceSerializer(sentences, many=True).data
@@ -56,7 +56,7 @@ class CompletedBookViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return CompletedBook.objects.filter(user=self.request.user)
+        return CompletedBook.objects.filter(user=self.request.user).select_related('book__category')
 
     @action(detail=False, methods=['get'], url_path='count')
     def get_completed_count(self, request):
@@ -108,7 +108,9 @@ class BookmarkViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return Bookmark.objects.filter(user=self.request.user)
+        return Bookmark.objects.filter(user=self.request.user).select_related(
+            'book__category', 'sentence__book__category'
+        )
 
     def perform_create(self, serializer):
         book = serializer.validated_data['book']
@@ -83,5 +83,7 @@ class LearnedPhraseSerializer(serializers.ModelSerializer):
     def get_count(self, obj):
         request = self.context.get('request')
         if request and request.user.is_authenticated:
-            return LearnedPhrase.objects.filter(user=request.user).count()
+            if not hasattr(self, '_count'):
+                self._count = LearnedPhrase.objects.filter(user=request.user).count()
+            return self._count
         return 0
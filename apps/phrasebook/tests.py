@@ -195,3 +195,38 @@ class SerializerValidationTests(APITestCase):
         self.assertFalse(serializer.is_valid())
         self.assertIn('Текст перевода не может быть пустым!', str(serializer.errors))
         self.assertIn('Аудио перевода не может быть пустым!', str(serializer.errors))
+
+
+class QueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            phrase = Phrase.objects.create(
+                text=f'Phrase {i}',
+                category=Category.objects.create(name=f'Category {i}')
+            )
+            translation = Translation.objects.create(text=f'Translation {i}', audio='audio.mp3', phrase=phrase)
+            FavoritePhrase.objects.create(user=self.user, translation=translation)
+            LearnedPhrase.objects.create(user=self.user, translation=translation)
+        self.phrase = phrase
+
+    def test_phrase_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('phrasebook:phrase-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_phrase_translations(self):
+        with self.assertNumQueries(2):
+            self.client.get(reverse('phrasebook:phrase-translations', args=[self.phrase.id]))
+
+    def test_favorite_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('phrasebook:favorite-list'))
+        self.assertEqual(len(response.data), 25)
+
+    def test_learned_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('phrasebook:learned-list'))
+        self.assertEqual(len(response.data), 25)
@@ -37,7 +37,7 @@ class PhrasebookViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, SearchFilter]
     filterset_fields = ['category', ]
     search_fields = ['text']
-    queryset = Phrase.objects.all()
+    queryset = Phrase.objects.select_related('category')
 
     @action(detail=True, methods=['get'], url_path='translations')
     def translations(self, request, pk=None):
@@ -56,7 +56,7 @@ class FavoritePhraseViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return FavoritePhrase.objects.filter(user=self.request.user)
+        return FavoritePhrase.objects.filter(user=self.request.user).select_related('translation')
 
     def perform_create(self, serializer):
         if FavoritePhrase.objects.filter(
@@ -103,7 +103,7 @@ class LearnedPhraseViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return LearnedPhrase.objects.filter(user=self.request.user)
+        return LearnedPhrase.objects.filter(user=self.request.user).select_related('translation')
 
     @action(detail=False, methods=['get'], url_path='count')
     def get_learned_count(self, request):
@@ -163,3 +163,27 @@ class AuthenticationTests(APITestCase):
         for url in endpoints:
             response = self.client.get(url)
             self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class QueryCountTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser', password='testpass')
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        for i in range(25):
+            source = Source.objects.create(
+                text=f'Source {i}',
+                link='https://example.com',
+                category=Category.objects.create(name=f'Category {i}')
+            )
+            MarkedSource.objects.create(user=self.user, source=source)
+
+    def test_source_list(self):
+        with self.assertNumQueries(2):
+            response = self.client.get(reverse('sources:source-list'))
+        self.assertEqual(len(response.data['results']), 20)
+
+    def test_marked_list(self):
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('sources:marked-list'))
+        self.assertEqual(len(response.data), 25)
@@ -31,7 +31,7 @@ class SourceViewSet(viewsets.ReadOnlyModelViewSet):
     filter_backends = [DjangoFilterBackend, filters.SearchFilter]
     filterset_fields = ['category']
     search_fields = ['text']
-    queryset = Source.objects.all()
+    queryset = Source.objects.select_related('category')
 
 
 class MarkedSourceViewSet(viewsets.ModelViewSet):
@@ -40,7 +40,7 @@ class MarkedSourceViewSet(viewsets.ModelViewSet):
     pagination_class = None
 
     def get_queryset(self):
-        return MarkedSource.objects.filter(user=self.request.user)
+        return MarkedSource.objects.filter(user=self.request.user).select_related('source__category')
 
     def perform_create(self, serializer):
         if MarkedSource.objects.filter(
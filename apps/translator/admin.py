@@ -0,0 +1,17 @@
+from django.contrib import admin
+from .models import MemoryEntry, TTSJob
+
+
+@admin.register(TTSJob)
+class TTSJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'status', 'lezgin_text', 'created_at', 'finished_at', 'expires_at')
+    list_filter = ('status',)
+    search_fields = ('lezgin_text',)
+    readonly_fields = ('created_at', 'started_at', 'finished_at')
+
+
+@admin.register(MemoryEntry)
+class MemoryEntryAdmin(admin.ModelAdmin):
+    list_display = ('text', 'translation', 'source', 'source_id')
+    list_filter = ('source',)
+    search_fields = ('text', 'translation')
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class TranslatorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.translator'
+
+    def ready(self):
+        from . import signals
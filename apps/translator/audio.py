@@ -0,0 +1,168 @@
+import io
+import os
+import tempfile
+
+import numpy as np
+import soundfile as sf
+
+from .cache import get_audio_cache
+from .conf import get_setting
+from .metrics import timed
+
+WAV = 'audio/wav'
+
+# media type: (soundfile format, subtype, file suffix, Content-Type)
+FORMATS = {
+    WAV: ('WAV', 'PCM_16', '.wav', 'audio/wav'),
+    'audio/flac': ('FLAC', 'PCM_16', '.flac', 'audio/flac'),
+    'audio/ogg': ('OGG', 'VORBIS', '.ogg', 'audio/ogg'),
+    'audio/opus': ('OGG', 'OPUS', '.opus', 'audio/ogg; codecs=opus'),
+    'audio/mpeg': ('MP3', 'MPEG_LAYER_III', '.mp3', 'audio/mpeg'),
+}
+# The only sample rates libsndfile writes Opus at.
+OPUS_RATES = (8000, 12000, 16000, 24000, 48000)
+CONTENT_TYPES = {suffix: content_type for _, _, suffix, content_type in FORMATS.values()}
+
+
+def negotiate_format(accept):
+    best, best_quality = WAV, 0
+    for part in accept.split(','):
+        media_type, _, params = part.partition(';')
+        media_type = media_type.strip().lower()
+        if media_type not in FORMATS:
+            continue
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0
+        if quality > best_quality:
+            best, best_quality = media_type, quality
+    return best
+
+
+def content_type_for(path):
+    return CONTENT_TYPES.get(os.path.splitext(path)[1], WAV)
+
+
+def downmix(samples):
+    return samples.mean(axis=1) if samples.ndim == 2 else samples
+
+
+def lowpass(samples, cutoff, taps=63):
+    # Windowed-sinc FIR; cutoff is a fraction of the sample rate.
+    n = np.arange(taps) - (taps - 1) / 2
+    kernel = np.sinc(2 * cutoff * n) * np.hamming(taps)
+    return np.convolve(samples, kernel / kernel.sum(), mode='same')
+
+
+def resample(samples, rate, target_rate):
+    if rate == target_rate or not len(samples):
+        return samples
+    if target_rate < rate:
+        samples = lowpass(samples, 0.45 * target_rate / rate)
+    positions = np.arange(int(len(samples) * target_rate / rate)) * (rate / target_rate)
+    return np.interp(positions, np.arange(len(samples)), samples)
+
+
+def trim_silence(samples, rate, threshold_db=-40, frame_ms=10, padding_ms=50):
+    frame = max(rate * frame_ms // 1000, 1)
+    count = len(samples) // frame
+    if not count:
+        return samples
+    rms = np.sqrt(np.mean(samples[:count * frame].reshape(count, frame) ** 2, axis=1))
+    loud = np.flatnonzero(rms > 10 ** (threshold_db / 20))
+    if not len(loud):
+        return samples
+    padding = rate * padding_ms // 1000
+    start = max(loud[0] * frame - padding, 0)
+    end = min((loud[-1] + 1) * frame + padding, len(samples))
+    return samples[start:end]
+
+
+def process(samples, rate, target_rate=None, trim=True, threshold_db=-40):
+    samples = downmix(samples)
+    if trim:
+        samples = trim_silence(samples, rate, threshold_db)
+    if target_rate and target_rate < rate:
+        samples, rate = resample(samples, rate, target_rate), target_rate
+    return samples.astype(np.float32), rate
+
+
+def opus_rate(rate):
+    return next((opus_rate for opus_rate in OPUS_RATES if opus_rate >= rate), OPUS_RATES[-1])
+
+
+def encode(samples, rate, media_type):
+    audio_format, subtype, _, _ = FORMATS[media_type]
+    if subtype == 'OPUS' and rate not in OPUS_RATES:
+        samples, rate = resample(samples, rate, opus_rate(rate)).astype(np.float32), opus_rate(rate)
+    buffer = io.BytesIO()
+    sf.write(buffer, samples, rate, format=audio_format, subtype=subtype)
+    return buffer.getvalue()
+
+
+def chunk_spans(audio_paths):
+    # (start, end) seconds of every clip in concatenate(audio_paths).
+    spans, offset, rate = [], 0, None
+    for path in audio_paths:
+        info = sf.info(path)
+        rate = rate or info.samplerate
+        frames = info.frames if info.samplerate == rate else int(info.frames * rate / info.samplerate)
+        spans.append((offset / rate, (offset + frames) / rate))
+        offset += frames
+    return spans
+
+
+def concatenate(audio_paths):
+    # Joins clips into one mono WAV at the first clip's sample rate.
+    parts, rate = [], None
+    for path in audio_paths:
+        samples, clip_rate = sf.read(path, dtype='float32', always_2d=True)
+        rate = rate or clip_rate
+        parts.append(resample(downmix(samples), clip_rate, rate))
+    return encode(np.concatenate(parts).astype(np.float32), rate, WAV)
+
+
+def transcode_bytes(audio_path, media_type):
+    with timed('transcode'):
+        samples, rate = sf.read(audio_path, dtype='float32', always_2d=True)
+        samples, rate = process(
+            samples,
+            rate,
+            target_rate=get_setting('AUDIO_SAMPLE_RATE'),
+            trim=get_setting('AUDIO_TRIM_SILENCE'),
+            threshold_db=get_setting('AUDIO_SILENCE_THRESHOLD_DB')
+        )
+        return encode(samples, rate, media_type)
+
+
+def transcode(audio_path, media_type):
+    # WAV is passed through untouched; other formats are processed once and
+    # kept next to the source, or in the audio cache when it is enabled.
+    if media_type == WAV:
+        return audio_path
+    suffix = FORMATS[media_type][2]
+    cache = get_audio_cache()
+    if cache is not None:
+        key = cache.make_key(
+            os.path.abspath(audio_path),
+            media_type,
+            get_setting('AUDIO_SAMPLE_RATE'),
+            get_setting('AUDIO_TRIM_SILENCE')
+        )
+        cached_path = cache.get(key, suffix)
+        if cached_path is not None:
+            return cached_path
+        return cache.put(key, transcode_bytes(audio_path, media_type), suffix)
+
+    target = os.path.splitext(audio_path)[0] + suffix
+    if not os.path.exists(target):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target), suffix=suffix)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(transcode_bytes(audio_path, media_type))
+        os.replace(tmp_path, target)
+    return target
@@ -0,0 +1,118 @@
+import os
+import shutil
+import tempfile
+import time
+
+from django.utils.module_loading import import_string
+from gradio_client.client import DEFAULT_TEMP_DIR
+
+from .conf import get_setting
+
+
+class Backend:
+    # A model served behind the client pool. connect() opens a client,
+    # submit() starts one call on it and returns a job exposing .future,
+    # .result() and .cancel(), like gradio_client.Job.
+
+    ping_args = ()
+
+    def __init__(self, source, **options):
+        self.source = source
+        self.options = options
+
+    def connect(self, **kwargs):
+        from .clients import create_client
+        return create_client(self.source, download_files=download_dir(), **kwargs)
+
+    def submit(self, client, *args):
+        raise NotImplementedError
+
+    def ping(self, client):
+        # The smallest real call, so the Space loads its model and not only its UI.
+        return self.submit(client, *self.ping_args)
+
+
+class GradioTranslator(Backend):
+    ping_args = ('Привет',)
+
+    def submit(self, client, text):
+        return client.submit(text=text, api_name="/translate")
+
+
+class GradioTTS(Backend):
+    ping_args = ('салам', 1, 0, False)
+
+    def submit(self, client, text, speaking_rate, noise_scale, add_pauses):
+        return client.submit(text, speaking_rate, noise_scale, add_pauses, fn_index=0)
+
+
+class FakeBackendMixin:
+    # Answers locally with FakeSpaceClient; options are the same as its
+    # source URL parameters (latency, error_rate, audio_seconds, seed, ...).
+
+    def connect(self, **kwargs):
+        from .fake import FakeSpaceClient
+        return FakeSpaceClient(self.source, **{'download_files': download_dir(), **self.options, **kwargs})
+
+
+class FakeTranslator(FakeBackendMixin, GradioTranslator):
+    pass
+
+
+class FakeTTS(FakeBackendMixin, GradioTTS):
+    pass
+
+
+SOURCE_SETTINGS = {
+    'translator': 'TRANSLATOR_SPACE',
+    'tts': 'TTS_SPACE',
+}
+
+
+def get_backend(name):
+    backend_class = import_string(get_setting('BACKENDS')[name])
+    return backend_class(get_setting(SOURCE_SETTINGS[name]), **get_setting('BACKEND_OPTIONS').get(name, {}))
+
+
+def connect(backend, **kwargs):
+    return backend.connect(**kwargs)
+
+
+def download_dir():
+    return os.path.abspath(get_setting('DOWNLOAD_DIR') or DEFAULT_TEMP_DIR)
+
+
+def is_download(path):
+    # gradio_client stores every output file as <download dir>/<sha256>/<name>.
+    return bool(path) and os.path.dirname(os.path.dirname(os.path.abspath(path))) == download_dir()
+
+
+def download_path(name):
+    # A fresh file laid out like a backend download.
+    os.makedirs(download_dir(), exist_ok=True)
+    return os.path.join(tempfile.mkdtemp(dir=download_dir()), name)
+
+
+def sweep_downloads(max_age):
+    # Removes backend output older than max_age seconds. Files handed out by
+    # signed URL or kept as job audio have nobody to discard them otherwise.
+    directory = download_dir()
+    if not os.path.isdir(directory):
+        return 0
+    cutoff = time.time() - max_age
+    removed = 0
+    for entry in os.scandir(directory):
+        try:
+            if entry.is_dir(follow_symlinks=False) and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except FileNotFoundError:
+            continue
+    return removed
+
+
+def discard_download(path):
+    # Removes a backend output file together with its directory, which also
+    # holds the formats transcoded from it when the audio cache is disabled.
+    if is_download(path):
+        shutil.rmtree(os.path.dirname(os.path.abspath(path)), ignore_errors=True)
@@ -0,0 +1,79 @@
+import hashlib
+
+import httpx
+from django.apps import apps
+from django.core.files import File
+from django.core.files.storage import default_storage
+
+from .audio import FORMATS, transcode
+from .backends import discard_download
+from .memory import refresh
+from .models import MemoryEntry
+from .services import synthesize
+
+AUDIO_PREFIX = 'tts'
+
+# name: (model, Lezgian text field, translation memory source, memory key field)
+TARGETS = {
+    'dictionary': ('dictionary.Translation', 'text', MemoryEntry.DICTIONARY, 'word_id'),
+    'phrasebook': ('phrasebook.Translation', 'text', MemoryEntry.PHRASEBOOK, 'phrase_id'),
+    'library': ('library.Sentence', 'translate', MemoryEntry.LIBRARY, 'id'),
+    'alphabet': ('alphabet.Letter', 'letter', None, None),
+}
+
+
+def target_rows(target):
+    model_label, text_field, _, memory_field = TARGETS[target]
+    fields = {'id', text_field, 'audio'}
+    if memory_field:
+        fields.add(memory_field.removesuffix('_id'))
+    return apps.get_model(model_label).objects.only(*fields).order_by('id')
+
+
+def audio_name(target, row_id, text, media_type):
+    # The text hash in the name makes edited rows stale and lets an
+    # interrupted run reuse files it already stored.
+    digest = hashlib.sha256(text.encode('utf-8')).hexdigest()[:16]
+    return f'{AUDIO_PREFIX}/{target}/{row_id}-{digest}{FORMATS[media_type][2]}'
+
+
+def link_ok(url, timeout=10):
+    try:
+        response = httpx.head(url, timeout=timeout, follow_redirects=True)
+    except httpx.HTTPError:
+        return False
+    return response.status_code < 400
+
+
+def needs_audio(target, row, media_type, force=False, check_links=False):
+    text = getattr(row, TARGETS[target][1]).strip()
+    if not text:
+        return False
+    if force or not row.audio:
+        return True
+    if row.audio == default_storage.url(audio_name(target, row.id, text, media_type)):
+        return False
+    if row.audio.startswith(default_storage.url(f'{AUDIO_PREFIX}/{target}/')):
+        return True
+    return check_links and not link_ok(row.audio)
+
+
+def generate_audio(target, row, media_type, force=False):
+    # With force a stored file is synthesized again and replaced under its name.
+    text = getattr(row, TARGETS[target][1]).strip()
+    name = audio_name(target, row.id, text, media_type)
+    if force or not default_storage.exists(name):
+        audio_path = transcode(synthesize(text), media_type)
+        with open(audio_path, 'rb') as f:
+            if force:
+                default_storage.delete(name)
+            name = default_storage.save(name, File(f))
+        discard_download(audio_path)
+    return default_storage.url(name)
+
+
+def save_rows(target, rows):
+    model_label, _, memory_source, memory_field = TARGETS[target]
+    apps.get_model(model_label).objects.bulk_update(rows, ['audio'])
+    if memory_source:
+        refresh(memory_source, sorted({getattr(row, memory_field) for row in rows}))
@@ -0,0 +1,228 @@
+import asyncio
+import functools
+import os
+import random
+import threading
+import time
+
+from filelock import FileLock, Timeout
+
+from .conf import get_setting
+from .metrics import record
+from .responses import close_with, overloaded_response
+
+
+class BulkheadFull(Exception):
+    code = 'overloaded'
+
+    def __init__(self, reason, retry_after):
+        super().__init__(f'Translator is busy ({reason}), retry in {retry_after:.0f}s')
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class Bulkhead:
+    # Caps concurrent translator work. Without lock_dir the cap is per process;
+    # with it, slots and queue places are lock files shared by every worker on
+    # the host. Only async callers queue, polling for a free slot until
+    # queue_timeout: a sync caller waiting would hold a whole worker, so it is
+    # turned away at once when every slot is taken.
+
+    def __init__(self, limit, queue_size=0, queue_timeout=10, retry_after=2, lock_dir=None, poll_interval=0.01):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+        self.lock_dir = lock_dir
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._active = 0
+        self._queued = 0
+        self._stats = {'admitted': 0, 'queued': 0, 'rejected': 0, 'timed_out': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _lock_paths(self, kind, count):
+        return [os.path.join(self.lock_dir, f'{kind}-{i}.lock') for i in range(count)]
+
+    @staticmethod
+    def _try_lock_files(paths):
+        # A fresh FileLock per attempt: instances are re-entrant, and async
+        # waiters share one thread. Not thread-local, because a streamed
+        # response is closed, and its slot released, on another thread.
+        start = random.randrange(len(paths)) if paths else 0
+        for path in paths[start:] + paths[:start]:
+            lock = FileLock(path, thread_local=False)
+            try:
+                lock.acquire(blocking=False)
+            except Timeout:
+                continue
+            return lock
+        return None
+
+    def _try_take(self, kind, count, counter):
+        if self.lock_dir:
+            token = self._try_lock_files(self._lock_paths(kind, count))
+            if token is None:
+                return None
+            with self._lock:
+                setattr(self, counter, getattr(self, counter) + 1)
+            return token
+        with self._lock:
+            if getattr(self, counter) >= count:
+                return None
+            setattr(self, counter, getattr(self, counter) + 1)
+            return True
+
+    def _give_back(self, token, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) - 1)
+        if isinstance(token, FileLock):
+            token.release()
+
+    def _try_slot(self):
+        return self._try_take('slot', self.limit, '_active')
+
+    def _admitted(self, waited):
+        record('queue', waited)
+        with self._lock:
+            self._stats['admitted'] += 1
+            self._stats['wait_total'] += waited
+            self._stats['wait_max'] = max(self._stats['wait_max'], waited)
+
+    def _reject(self, stat, reason):
+        with self._lock:
+            self._stats[stat] += 1
+        return BulkheadFull(reason, self.retry_after)
+
+    def _enqueue(self):
+        place = self._try_take('queue', self.queue_size, '_queued') if self.queue_size else None
+        if place is None:
+            raise self._reject('rejected', 'queue is full')
+        with self._lock:
+            self._stats['queued'] += 1
+        return place
+
+    def acquire(self):
+        slot = self._try_slot()
+        if slot is None:
+            raise self._reject('rejected', 'no free slot')
+        self._admitted(0.0)
+        return slot
+
+    async def aacquire(self):
+        started = time.monotonic()
+        slot = self._try_slot()
+        if slot is None:
+            place = self._enqueue()
+            try:
+                while slot is None:
+                    if time.monotonic() - started >= self.queue_timeout:
+                        raise self._reject('timed_out', 'queue timeout')
+                    await asyncio.sleep(self.poll_interval)
+                    slot = self._try_slot()
+            finally:
+                self._give_back(place, '_queued')
+        self._admitted(time.monotonic() - started)
+        return slot
+
+    def release(self, slot):
+        self._give_back(slot, '_active')
+
+    def _held(self, kind, count):
+        # Probes every lock file; a free one is held for an instant only.
+        held = 0
+        for path in self._lock_paths(kind, count):
+            lock = self._try_lock_files([path])
+            if lock is None:
+                held += 1
+            else:
+                lock.release()
+        return held
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats.update(limit=self.limit, queue_size=self.queue_size, active=self._active, queue_depth=self._queued)
+        stats['wait_avg'] = stats['wait_total'] / stats['admitted'] if stats['admitted'] else 0.0
+        if self.lock_dir:
+            stats['host_active'] = self._held('slot', self.limit)
+            stats['host_queue_depth'] = self._held('queue', self.queue_size)
+        return stats
+
+
+_bulkhead = None
+_bulkhead_lock = threading.Lock()
+
+
+def get_bulkhead():
+    global _bulkhead
+    if not get_setting('BULKHEAD_LIMIT'):
+        return None
+    if _bulkhead is None:
+        with _bulkhead_lock:
+            if _bulkhead is None:
+                _bulkhead = Bulkhead(
+                    limit=get_setting('BULKHEAD_LIMIT'),
+                    queue_size=get_setting('BULKHEAD_QUEUE_SIZE'),
+                    queue_timeout=get_setting('BULKHEAD_QUEUE_TIMEOUT'),
+                    retry_after=get_setting('BULKHEAD_RETRY_AFTER'),
+                    lock_dir=get_setting('BULKHEAD_LOCK_DIR'),
+                )
+    return _bulkhead
+
+
+def reset_bulkhead():
+    global _bulkhead
+    with _bulkhead_lock:
+        _bulkhead = None
+
+
+def _hold_until_closed(response, bulkhead, slot):
+    # Event streams do their work while the body is sent, so the slot is
+    # released when the response is closed rather than when the view returns.
+    if response.get('Content-Type', '').startswith('text/event-stream'):
+        response.streaming_content = close_with(response.streaming_content, lambda: bulkhead.release(slot))
+        return True
+    return False
+
+
+def limit_concurrency(view):
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            bulkhead = get_bulkhead()
+            if bulkhead is None:
+                return await view(*args, **kwargs)
+            try:
+                slot = await bulkhead.aacquire()
+            except BulkheadFull as e:
+                return overloaded_response(e)
+            held = False
+            try:
+                response = await view(*args, **kwargs)
+                held = _hold_until_closed(response, bulkhead, slot)
+                return response
+            finally:
+                if not held:
+                    bulkhead.release(slot)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        bulkhead = get_bulkhead()
+        if bulkhead is None:
+            return view(*args, **kwargs)
+        try:
+            slot = bulkhead.acquire()
+        except BulkheadFull as e:
+            return overloaded_response(e)
+        held = False
+        try:
+            response = view(*args, **kwargs)
+            held = _hold_until_closed(response, bulkhead, slot)
+            return response
+        finally:
+            if not held:
+                bulkhead.release(slot)
+    return wrapper
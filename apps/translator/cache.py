@@ -0,0 +1,274 @@
+import errno
+import hashlib
+import json
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from django.core.cache import caches
+from filelock import FileLock
+
+from .conf import get_setting
+
+
+def _file_size(path):
+    try:
+        return os.stat(path).st_size
+    except FileNotFoundError:
+        return 0
+
+
+class AudioCache:
+    def __init__(self, directory, max_bytes, low_watermark=0.9):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.low_watermark = low_watermark
+        self._lock = threading.Lock()
+        self._stats = {'hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        os.makedirs(self.directory, exist_ok=True)
+        self._file_lock = FileLock(os.path.join(self.directory, '.lock'))
+        self._size_path = os.path.join(self.directory, '.size')
+
+    @staticmethod
+    def make_key(*parts):
+        payload = json.dumps(parts, ensure_ascii=False, separators=(',', ':'))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def path(self, key, suffix='.wav'):
+        return os.path.join(self.directory, key[:2], key + suffix)
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key, suffix='.wav'):
+        path = self.path(key, suffix)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            self._count('misses')
+            return None
+        self._count('hits')
+        return path
+
+    def put_file(self, key, source_path, suffix='.wav', move=False):
+        # move=True takes ownership of source_path: on the same filesystem it is
+        # renamed into place without copying a byte.
+        if move:
+            path = self.path(key, suffix)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            replaced = _file_size(path)
+            try:
+                os.replace(source_path, path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+            else:
+                self._count('writes')
+                self._grow(_file_size(path) - replaced)
+                return path
+        path = self._write(key, suffix, source_path=source_path)
+        if move:
+            os.unlink(source_path)
+        return path
+
+    def put(self, key, data, suffix='.wav'):
+        return self._write(key, suffix, data=data)
+
+    def _write(self, key, suffix, data=None, source_path=None):
+        path = self.path(key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-')
+        try:
+            if source_path is not None:
+                os.close(fd)
+                # copyfile uses sendfile(), so the data never passes through Python.
+                shutil.copyfile(source_path, temp_path)
+            else:
+                with os.fdopen(fd, 'wb') as target:
+                    target.write(data)
+            size = _file_size(temp_path) - _file_size(path)
+            os.replace(temp_path, path)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except FileNotFoundError:
+                pass
+            raise
+        self._count('writes')
+        self._grow(size)
+        return path
+
+    def _read_total(self):
+        try:
+            with open(self._size_path) as f:
+                return int(f.read())
+        except (FileNotFoundError, ValueError):
+            return None
+
+    def _write_total(self, total):
+        with open(self._size_path, 'w') as f:
+            f.write(str(max(total, 0)))
+
+    def _grow(self, delta):
+        # The running total is kept in a file shared by every process, so a
+        # write only scans the directory when the total passes max_bytes (or
+        # the counter is missing).
+        with self._file_lock:
+            total = self._read_total()
+            if total is not None and total + delta <= self.max_bytes:
+                self._write_total(total + delta)
+                return 0
+            return self._evict_locked()
+
+    def _entries(self):
+        for bucket in os.scandir(self.directory):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.startswith('.tmp-'):
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield stat.st_mtime, stat.st_size, entry.path
+
+    def evict(self):
+        with self._file_lock:
+            return self._evict_locked()
+
+    def _evict_locked(self):
+        entries = list(self._entries())
+        total = sum(size for _, size, _ in entries)
+        removed = 0
+        if total > self.max_bytes:
+            target = self.max_bytes * self.low_watermark
+            for _, size, path in sorted(entries):
+                if total <= target:
+                    break
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                removed += 1
+        self._write_total(total)
+        with self._lock:
+            self._stats['evictions'] += removed
+        return removed
+
+    def stats(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+class TranslationCache:
+    def __init__(self, cache_alias='default', ttl=86400, max_entries=1000, prefix='translator:mt'):
+        self.cache_alias = cache_alias
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._local = OrderedDict()
+        self._stats = {'l1_hits': 0, 'l2_hits': 0, 'misses': 0, 'evictions': 0}
+
+    @staticmethod
+    def normalize(text):
+        text = unicodedata.normalize('NFC', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def make_key(self, text):
+        digest = hashlib.sha256(self.normalize(text).encode('utf-8')).hexdigest()
+        return f'{self.prefix}:{digest}'
+
+    @property
+    def shared(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _remember(self, key, value, expires_at):
+        with self._lock:
+            self._local[key] = (value, expires_at)
+            self._local.move_to_end(key)
+            while len(self._local) > self.max_entries:
+                self._local.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get(self, text):
+        key = self.make_key(text)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._local.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._local.move_to_end(key)
+                    self._stats['l1_hits'] += 1
+                    return entry[0]
+                del self._local[key]
+
+        shared = self.shared
+        value = shared.get(key) if shared is not None else None
+        with self._lock:
+            self._stats['l2_hits' if value is not None else 'misses'] += 1
+        if value is not None:
+            self._remember(key, value, now + self.ttl)
+        return value
+
+    def set(self, text, value):
+        key = self.make_key(text)
+        self._remember(key, value, time.monotonic() + self.ttl)
+        shared = self.shared
+        if shared is not None:
+            shared.set(key, value, self.ttl)
+
+    def clear(self):
+        with self._lock:
+            self._local.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['l1_size'] = len(self._local)
+        lookups = stats['l1_hits'] + stats['l2_hits'] + stats['misses']
+        stats['hit_ratio'] = (stats['l1_hits'] + stats['l2_hits']) / lookups if lookups else 0.0
+        return stats
+
+
+_audio_cache = None
+_audio_cache_lock = threading.Lock()
+
+
+def get_audio_cache():
+    global _audio_cache
+    directory = get_setting('AUDIO_CACHE_DIR')
+    if not directory:
+        return None
+    if _audio_cache is None or _audio_cache.directory != str(directory):
+        with _audio_cache_lock:
+            if _audio_cache is None or _audio_cache.directory != str(directory):
+                _audio_cache = AudioCache(directory, get_setting('AUDIO_CACHE_MAX_BYTES'))
+    return _audio_cache
+
+
+_translation_cache = None
+_translation_cache_lock = threading.Lock()
+
+
+def get_translation_cache():
+    global _translation_cache
+    if not get_setting('TRANSLATION_CACHE_ENABLED'):
+        return None
+    if _translation_cache is None:
+        with _translation_cache_lock:
+            if _translation_cache is None:
+                _translation_cache = TranslationCache(
+                    cache_alias=get_setting('TRANSLATION_CACHE_ALIAS'),
+                    ttl=get_setting('TRANSLATION_CACHE_TTL'),
+                    max_entries=get_setting('TRANSLATION_CACHE_MAX_ENTRIES'),
+                )
+    return _translation_cache
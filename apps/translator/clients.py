@@ -0,0 +1,191 @@
+import asyncio
+import os
+import threading
+import time
+import urllib.parse
+from collections import deque
+from contextlib import contextmanager, asynccontextmanager
+
+import httpx
+from asgiref.sync import sync_to_async
+from gradio_client import Client
+from gradio_client.exceptions import AppError
+
+from .backends import connect, get_backend
+from .conf import get_setting
+from .metrics import timed
+
+TRANSLATOR = 'translator'
+TTS = 'tts'
+
+
+def create_client(src, **kwargs):
+    if src.startswith('fake://'):
+        from .fake import FakeSpaceClient
+        return FakeSpaceClient(src, **kwargs)
+    return Client(src, **kwargs)
+
+
+class ClientPool:
+    def __init__(self, sources, client_factory=create_client, max_idle=4,
+                 health_check_interval=60, health_check_timeout=5):
+        self.sources = dict(sources)
+        self.client_factory = client_factory
+        self.max_idle = max_idle
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self._lock = threading.Lock()
+        self._idle = {name: deque() for name in self.sources}
+        self._stale = {name: 0 for name in self.sources}
+        self._stats = {'hits': 0, 'misses': 0, 'reconnects': 0, 'created': 0, 'discarded': 0}
+
+    def _create(self, name):
+        client = self.client_factory(self.sources[name], verbose=False)
+        with self._lock:
+            self._stats['created'] += 1
+        return client
+
+    def _is_healthy(self, client):
+        src = getattr(client, 'src', None)
+        if not src:
+            return True
+        try:
+            response = httpx.get(
+                urllib.parse.urljoin(src, 'config'),
+                headers=getattr(client, 'headers', None),
+                timeout=self.health_check_timeout,
+                follow_redirects=True
+            )
+        except httpx.HTTPError:
+            return False
+        return response.status_code == 200
+
+    @staticmethod
+    def _close(client):
+        close = getattr(client, 'close', None)
+        if close is not None:
+            try:
+                close()
+            except Exception:
+                pass
+
+    def acquire(self, name):
+        while True:
+            with self._lock:
+                idle = self._idle[name]
+                entry = idle.pop() if idle else None
+                if entry is None:
+                    reconnect = self._stale[name] > 0
+                    if reconnect:
+                        self._stale[name] -= 1
+                        self._stats['reconnects'] += 1
+                    else:
+                        self._stats['misses'] += 1
+            if entry is None:
+                return self._create(name)
+
+            client, last_used = entry
+            if time.monotonic() - last_used < self.health_check_interval or self._is_healthy(client):
+                with self._lock:
+                    self._stats['hits'] += 1
+                return client
+            self._discard(name, client)
+
+    def release(self, name, client):
+        with self._lock:
+            idle = self._idle[name]
+            if len(idle) < self.max_idle:
+                idle.append((client, time.monotonic()))
+                return
+            self._stats['discarded'] += 1
+        self._close(client)
+
+    def _discard(self, name, client):
+        with self._lock:
+            self._stale[name] += 1
+            self._stats['discarded'] += 1
+        self._close(client)
+
+    @contextmanager
+    def client(self, name):
+        with timed('client', name):
+            client = self.acquire(name)
+        try:
+            yield client
+        except AppError:
+            self.release(name, client)
+            raise
+        except BaseException:
+            self._discard(name, client)
+            raise
+        else:
+            self.release(name, client)
+
+    @asynccontextmanager
+    async def aclient(self, name):
+        with timed('client', name):
+            client = await sync_to_async(self.acquire, thread_sensitive=False)(name)
+        try:
+            yield client
+        except (AppError, asyncio.CancelledError):
+            self.release(name, client)
+            raise
+        except BaseException:
+            self._discard(name, client)
+            raise
+        else:
+            self.release(name, client)
+
+    def warm(self, names=None):
+        for name in names or self.sources:
+            self.release(name, self._create(name))
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['idle'] = {name: len(idle) for name, idle in self._idle.items()}
+        return stats
+
+    def close(self):
+        with self._lock:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            for idle in self._idle.values():
+                idle.clear()
+        for client, _ in entries:
+            self._close(client)
+
+
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool, _pool_pid
+    pid = os.getpid()
+    if _pool is not None and _pool_pid == pid:
+        return _pool
+    with _pool_lock:
+        if _pool is None or _pool_pid != pid:
+            pool = ClientPool(
+                {
+                    TRANSLATOR: get_backend(TRANSLATOR),
+                    TTS: get_backend(TTS),
+                },
+                client_factory=connect,
+                max_idle=get_setting('POOL_MAX_IDLE'),
+                health_check_interval=get_setting('POOL_HEALTH_CHECK_INTERVAL'),
+                health_check_timeout=get_setting('POOL_HEALTH_CHECK_TIMEOUT'),
+            )
+            if get_setting('POOL_PREWARM'):
+                pool.warm()
+            _pool, _pool_pid = pool, pid
+    return _pool
+
+
+def reset_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is not None:
+            _pool.close()
+        _pool, _pool_pid = None, None
@@ -0,0 +1,167 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import Future
+
+from asgiref.sync import sync_to_async
+from filelock import FileLock, Timeout
+
+from .conf import get_setting
+
+
+class LeaderCancelled(Exception):
+    pass
+
+
+class SingleFlight:
+    # Identical concurrent calls share one in-flight call. Within a process,
+    # followers wait on the leader's future. Across workers, leaders of the same
+    # key serialise on a lock file and re-check the shared cache once they hold
+    # it, so only the first worker reaches the remote Space. Keys are hashed
+    # onto a fixed set of lock files, which keeps lock_dir from growing.
+
+    def __init__(self, lock_dir=None, lock_timeout=60, poll_interval=0.05, stripes=4096):
+        self.lock_dir = lock_dir
+        self.lock_timeout = lock_timeout
+        self.poll_interval = poll_interval
+        self.stripes = stripes
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._stats = {'leaders': 0, 'collapsed': 0, 'collapsed_across_workers': 0}
+        if lock_dir:
+            os.makedirs(lock_dir, exist_ok=True)
+
+    def _join(self, key):
+        with self._lock:
+            future = self._inflight.get(key)
+            if future is not None:
+                self._stats['collapsed'] += 1
+                return future, False
+            future = Future()
+            self._inflight[key] = future
+            self._stats['leaders'] += 1
+            return future, True
+
+    def _finish(self, key, future, result=None, error=None):
+        with self._lock:
+            if self._inflight.get(key) is future:
+                del self._inflight[key]
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def _lock_path(self, key):
+        # Enough stripes that unrelated keys rarely wait on each other.
+        digest = hashlib.sha256(repr(key).encode('utf-8')).digest()
+        stripe = int.from_bytes(digest[:8], 'big') % self.stripes
+        return os.path.join(self.lock_dir, f'{stripe}.lock')
+
+    def _rechecked(self, value):
+        if value is not None:
+            with self._lock:
+                self._stats['collapsed_across_workers'] += 1
+        return value
+
+    def _run(self, key, fn, recheck):
+        if recheck is None:
+            return fn()
+        if not self.lock_dir:
+            value = self._rechecked(recheck())
+            return fn() if value is None else value
+        try:
+            with FileLock(self._lock_path(key), timeout=self.lock_timeout):
+                value = self._rechecked(recheck())
+                return fn() if value is None else value
+        except Timeout:
+            return fn()
+
+    async def _alock(self, key):
+        # Polled without blocking so the event loop keeps running and a
+        # cancelled caller never leaves a lock taken behind it.
+        lock = FileLock(self._lock_path(key), thread_local=False)
+        deadline = time.monotonic() + self.lock_timeout
+        while True:
+            try:
+                lock.acquire(blocking=False)
+                return lock
+            except Timeout:
+                if time.monotonic() >= deadline:
+                    return None
+                await asyncio.sleep(self.poll_interval)
+
+    async def _arun(self, key, coro_fn, recheck):
+        if recheck is None:
+            return await coro_fn()
+        lock = None
+        if self.lock_dir:
+            lock = await self._alock(key)
+            if lock is None:
+                return await coro_fn()
+        try:
+            value = self._rechecked(await sync_to_async(recheck, thread_sensitive=False)())
+            return await coro_fn() if value is None else value
+        finally:
+            if lock is not None:
+                lock.release()
+
+    def do(self, key, fn, recheck=None):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return future.result()
+            except LeaderCancelled:
+                continue
+        try:
+            result = self._run(key, fn, recheck)
+        except BaseException as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    async def ado(self, key, coro_fn, recheck=None):
+        while True:
+            future, leader = self._join(key)
+            if leader:
+                break
+            try:
+                return await asyncio.shield(asyncio.wrap_future(future))
+            except LeaderCancelled:
+                continue
+        try:
+            result = await self._arun(key, coro_fn, recheck)
+        except asyncio.CancelledError:
+            self._finish(key, future, error=LeaderCancelled())
+            raise
+        except Exception as e:
+            self._finish(key, future, error=e)
+            raise
+        self._finish(key, future, result=result)
+        return result
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['inflight'] = len(self._inflight)
+        return stats
+
+
+_single_flight = None
+_single_flight_lock = threading.Lock()
+
+
+def get_single_flight():
+    global _single_flight
+    if _single_flight is None:
+        with _single_flight_lock:
+            if _single_flight is None:
+                _single_flight = SingleFlight(
+                    lock_dir=get_setting('COALESCE_LOCK_DIR'),
+                    lock_timeout=get_setting('COALESCE_LOCK_TIMEOUT'),
+                )
+    return _single_flight
@@ -0,0 +1,75 @@
+import os
+
+from django.conf import settings
+
+# gunicorn and uvicorn take their worker count from WEB_CONCURRENCY; the
+# translator gets at most half of the workers so the catalog API keeps the rest.
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+DEFAULTS = {
+    'TRANSLATOR_SPACE': 'stazizov/lezghian_translator_v1',
+    'TTS_SPACE': 'https://leks-forever-lez-tts.hf.space/',
+    'BACKENDS': {
+        'translator': 'apps.translator.backends.GradioTranslator',
+        'tts': 'apps.translator.backends.GradioTTS',
+    },
+    'BACKEND_OPTIONS': {},
+    'POOL_MAX_IDLE': 4,
+    'POOL_HEALTH_CHECK_INTERVAL': 60,
+    'POOL_HEALTH_CHECK_TIMEOUT': 5,
+    'POOL_PREWARM': False,
+    'AUDIO_CACHE_DIR': None,
+    'AUDIO_CACHE_MAX_BYTES': 512 * 1024 * 1024,
+    'DOWNLOAD_DIR': None,
+    'TRANSLATION_CACHE_ENABLED': True,
+    'TRANSLATION_CACHE_ALIAS': 'default',
+    'TRANSLATION_CACHE_TTL': 24 * 60 * 60,
+    'TRANSLATION_CACHE_MAX_ENTRIES': 1000,
+    'AUDIO_URL_TTL': 300,
+    'MEMORY_ENABLED': True,
+    'MEMORY_FUZZY_THRESHOLD': None,
+    'MEMORY_RECORDING_TIMEOUT': 10,
+    'FALLBACK_ENABLED': True,
+    'FALLBACK_MIN_COVERAGE': 0.5,
+    'LANGUAGE_DETECTION_ENABLED': True,
+    'LANGUAGE_MIN_SHARE': 0.6,
+    'LANGUAGE_SAMPLE_CHARS': 500,
+    'LANGUAGE_TRAINING_LIMIT': 20000,
+    'AUDIO_SAMPLE_RATE': 16000,
+    'AUDIO_TRIM_SILENCE': True,
+    'AUDIO_SILENCE_THRESHOLD_DB': -40,
+    'BATCH_MAX_ITEMS': 50,
+    'MAX_INPUT_CHARS': 5000,
+    'CHUNK_MAX_CHARS': 400,
+    'CHUNK_PARALLELISM': 4,
+    'LIVE_DEBOUNCE': 0.3,
+    'LIVE_DRAFT_CALLS': 3,
+    'BATCH_MAX_WORKERS': 8,
+    'COALESCE_LOCK_DIR': None,
+    'COALESCE_LOCK_TIMEOUT': 60,
+    'TTS_JOB_TTL': 60 * 60,
+    'TTS_JOB_TIMEOUT': 5 * 60,
+    'TTS_JOB_MAX_ATTEMPTS': 3,
+    'TTS_JOB_MAX_WAIT': 5,
+    'TTS_JOB_MAX_WORKERS': 4,
+    'TIMEOUTS': {'translator': 30, 'tts': 60},
+    'RETRIES': {'translator': 1, 'tts': 0},
+    'RETRY_BACKOFF': 0.5,
+    'HEDGE_DELAYS': {'translator': None, 'tts': None},
+    'BREAKER_FAILURE_THRESHOLD': 5,
+    'BREAKER_RESET_TIMEOUT': 30,
+    'KEEP_WARM_INTERVAL': 240,
+    'KEEP_WARM_TIMEOUT': 20,
+    'KEEP_WARM_RETRY_AFTER': 15,
+    'BULKHEAD_LIMIT': max(WEB_CONCURRENCY // 2, 1),
+    'BULKHEAD_QUEUE_SIZE': 8,
+    'BULKHEAD_QUEUE_TIMEOUT': 10,
+    'BULKHEAD_RETRY_AFTER': 2,
+    'BULKHEAD_LOCK_DIR': None,
+    'METRICS_DIR': None,
+    'METRICS_FLUSH_INTERVAL': 1,
+}
+
+
+def get_setting(name):
+    return getattr(settings, 'TRANSLATOR', {}).get(name, DEFAULTS[name])
@@ -0,0 +1,133 @@
+import math
+import os
+import random
+import struct
+import tempfile
+import threading
+import time
+import wave
+from concurrent.futures import Future, ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+
+SAMPLE_RATE = 16000
+
+
+def write_wav(path, text, sample_rate=SAMPLE_RATE, seconds_per_char=0.06, seconds=None):
+    if seconds is None:
+        seconds = len(text) * seconds_per_char
+    frames = max(int(seconds * sample_rate), sample_rate // 10)
+    pitch = 220 + (sum(map(ord, text)) % 220)
+    samples = (
+        int(8000 * math.sin(2 * math.pi * pitch * i / sample_rate))
+        for i in range(frames)
+    )
+    with wave.open(path, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(struct.pack(f'<{frames}h', *samples))
+    return path
+
+
+class FakeJob:
+    def __init__(self, future, cancelled):
+        self.future = future
+        self._cancelled = cancelled
+
+    def result(self, timeout=None):
+        return self.future.result(timeout=timeout)
+
+    def done(self):
+        return self.future.done()
+
+    def cancel(self):
+        self._cancelled.set()
+        return self.future.cancel()
+
+
+class FakeSpaceClient:
+    """Stand-in for ``gradio_client.Client`` that answers locally.
+
+    Configured through the source URL, e.g. ``fake://tts?latency=0.2&error_rate=0.1``,
+    or keyword options with the same names. ``fail_first`` makes the first N calls
+    to that source fail, across reconnects; ``seed`` fixes the ``error_rate``
+    pattern; ``audio_seconds`` fixes the length of the generated WAV;
+    ``char_latency`` adds seconds per input character to ``latency``; with
+    ``sleep_after`` the source goes to sleep after that many idle seconds and
+    the next call waits ``wake_latency`` seconds for it to start again.
+    """
+
+    executor = ThreadPoolExecutor(max_workers=64, thread_name_prefix='fake-space')
+    served = {}
+    awake = {}
+    served_lock = threading.Lock()
+
+    def __init__(self, src, verbose=False, **kwargs):
+        parts = urlsplit(src)
+        self.url = src
+        options = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        options.update(kwargs)
+        self.src = None
+        self.name = parts.netloc
+        self.latency = float(options.get('latency', 0))
+        self.char_latency = float(options.get('char_latency', 0))
+        self.error_rate = float(options.get('error_rate', 0))
+        self.fail_first = int(options.get('fail_first', 0))
+        self.random = random.Random(options.get('seed', 0))
+        self.audio_seconds = float(options['audio_seconds']) if options.get('audio_seconds') else None
+        self.sleep_after = float(options['sleep_after']) if options.get('sleep_after') is not None else None
+        self.wake_latency = float(options.get('wake_latency', 0))
+        self.output_dir = (
+            options.get('output_dir') or options.get('download_files') or tempfile.mkdtemp(prefix='fake-space-')
+        )
+        self._lock = threading.Lock()
+        self._counter = 0
+        self.calls = 0
+
+    def _wake_delay(self):
+        # Seconds until the source is awake; called under served_lock.
+        now = time.monotonic()
+        awake_at, last_call = self.awake.get(self.url, (None, None))
+        if awake_at is None or now - last_call > self.sleep_after:
+            awake_at = now + self.wake_latency
+        self.awake[self.url] = (awake_at, max(now, awake_at))
+        return max(awake_at - now, 0)
+
+    def _run(self, cancelled, args, api_name, kwargs, fail, delay=0):
+        text = kwargs['text'] if api_name == '/translate' else args[0]
+        if cancelled.wait(delay + self.latency + self.char_latency * len(text)):
+            raise RuntimeError('Job cancelled')
+        if fail:
+            raise ConnectionError(f'Injected failure in fake {self.name} Space')
+        if api_name == '/translate':
+            return f"lez:{kwargs['text']}"
+        with self._lock:
+            self._counter += 1
+            counter = self._counter
+        # One directory per output file, like gradio_client downloads.
+        directory = os.path.join(self.output_dir, f'{os.getpid()}-{id(self)}-{counter}')
+        os.makedirs(directory, exist_ok=True)
+        return write_wav(os.path.join(directory, 'audio.wav'), args[0], seconds=self.audio_seconds)
+
+    def submit(self, *args, api_name=None, fn_index=None, **kwargs):
+        with self.served_lock:
+            self.calls += 1
+            self.served[self.url] = served = self.served.get(self.url, 0) + 1
+            fail = served <= self.fail_first or self.random.random() < self.error_rate
+            delay = self._wake_delay() if self.sleep_after is not None else 0
+        cancelled = threading.Event()
+        if delay or self.latency or self.char_latency:
+            future = self.executor.submit(self._run, cancelled, args, api_name, kwargs, fail, delay)
+        else:
+            future = Future()
+            try:
+                future.set_result(self._run(cancelled, args, api_name, kwargs, fail))
+            except Exception as e:
+                future.set_exception(e)
+        return FakeJob(future, cancelled)
+
+    def predict(self, *args, api_name=None, fn_index=None, **kwargs):
+        return self.submit(*args, api_name=api_name, fn_index=fn_index, **kwargs).result()
+
+    def close(self):
+        pass
@@ -0,0 +1,147 @@
+import re
+import threading
+
+from django.db import connection
+
+from .conf import get_setting
+from .memory import version
+from .metrics import timed
+from .models import MemoryEntry
+
+WORD_RE = re.compile(r"\w+(?:[-']\w+)*")
+# Common Russian inflections, longest first; dictionary entries are lemmas.
+ENDINGS = sorted({
+    'ами', 'ями', 'ого', 'его', 'ому', 'ему', 'ыми', 'ими', 'ых', 'их', 'ой', 'ей', 'ый', 'ий', 'ая', 'яя',
+    'ое', 'ее', 'ую', 'юю', 'ом', 'ем', 'ам', 'ям', 'ах', 'ях', 'ов', 'ев', 'ть', 'ся', 'сь',
+    'а', 'я', 'о', 'е', 'ы', 'и', 'у', 'ю', 'ь',
+}, key=len, reverse=True)
+SOURCES = (MemoryEntry.DICTIONARY, MemoryEntry.PHRASEBOOK)
+
+
+def fold(word):
+    return word.casefold().replace('ё', 'е')
+
+
+def words(text):
+    return [fold(word) for word in WORD_RE.findall(text)]
+
+
+def stem(word):
+    for ending in ENDINGS:
+        if word.endswith(ending) and len(word) - len(ending) >= 3:
+            return word[:-len(ending)]
+    return word
+
+
+class FallbackIndex:
+    # Dictionary words and phrasebook phrases keyed by their word tuples.
+    # translate() replaces the longest known phrase at every position, then
+    # single words by stem, and keeps unknown words as they are.
+
+    def __init__(self, entries, version=None):
+        self.version = version
+        self.phrases = {}
+        self.stems = {}
+        self.max_words = 1
+        for text, translation in entries:
+            key = tuple(words(text))
+            if not key or not translation:
+                continue
+            self.phrases.setdefault(key, translation)
+            self.max_words = max(self.max_words, len(key))
+            if len(key) == 1:
+                self.stems.setdefault(stem(key[0]), translation)
+
+    def __len__(self):
+        return len(self.phrases)
+
+    def _match(self, tokens, start):
+        for size in range(min(self.max_words, len(tokens) - start), 0, -1):
+            translation = self.phrases.get(tuple(tokens[start:start + size]))
+            if translation is not None:
+                return size, translation
+        return 1, self.stems.get(stem(tokens[start]))
+
+    def translate(self, text):
+        # Returns (translation, share of words translated).
+        matches = list(WORD_RE.finditer(text))
+        tokens = [fold(match.group()) for match in matches]
+        parts, position, index, translated = [], 0, 0, 0
+        while index < len(tokens):
+            size, translation = self._match(tokens, index)
+            start, end = matches[index].start(), matches[index + size - 1].end()
+            parts.append(text[position:start])
+            parts.append(translation if translation is not None else text[start:end])
+            if translation is not None:
+                translated += size
+            position = end
+            index += size
+        parts.append(text[position:])
+        return ''.join(parts), translated / len(tokens) if tokens else 0.0
+
+
+def build_index():
+    entries = MemoryEntry.objects.filter(source__in=SOURCES).order_by('source', 'id')
+    current = version()
+    return FallbackIndex(entries.values_list('normalized', 'translation').iterator(), version=current)
+
+
+_index = None
+_index_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild_index():
+    # Only one rebuild runs at a time; the others keep the current index.
+    global _index
+    if not _rebuild_lock.acquire(blocking=False):
+        return _index
+    try:
+        _index = build_index()
+    finally:
+        _rebuild_lock.release()
+    return _index
+
+
+def _rebuild_in_background():
+    try:
+        rebuild_index()
+    finally:
+        connection.close()
+
+
+def start_rebuild():
+    if _index is not None and not _rebuild_lock.locked():
+        threading.Thread(target=_rebuild_in_background, name='fallback-index', daemon=True).start()
+
+
+def get_index():
+    # Built on first use. After the translation memory changes the old index
+    # keeps serving while the new one is built in the background.
+    global _index
+    index = _index
+    if index is None:
+        with _index_lock:
+            if _index is None:
+                _index = build_index()
+            return _index
+    if index.version != version():
+        start_rebuild()
+    return index
+
+
+def reset_index():
+    global _index
+    with _index_lock:
+        _index = None
+
+
+def fallback_translate(russian_text):
+    # A word-by-word translation, or None when too little of the text is known.
+    if not get_setting('FALLBACK_ENABLED'):
+        return None
+    with timed('fallback'):
+        translation, coverage = get_index().translate(russian_text)
+    if not coverage or coverage < get_setting('FALLBACK_MIN_COVERAGE'):
+        return None
+    return translation
@@ -0,0 +1,171 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections
+from django.utils import timezone
+
+from .backends import discard_download, sweep_downloads
+from .conf import get_setting
+from .models import TTSJob
+from .services import synthesize
+
+FINISHED = (TTSJob.DONE, TTSJob.FAILED)
+
+# Futures of the jobs this process is running itself, by job id.
+_running = {}
+_running_lock = threading.Lock()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_job_executor():
+    # Kept apart from the shared executor: a job synthesizing chunks submits
+    # them there and waits, which from inside that pool could deadlock it.
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_setting('TTS_JOB_MAX_WORKERS'),
+                    thread_name_prefix='tts-jobs'
+                )
+    return _executor
+
+
+def submit_job(lezgin_text, **params):
+    return TTSJob.objects.create(
+        lezgin_text=lezgin_text,
+        expires_at=timezone.now() + timedelta(seconds=get_setting('TTS_JOB_TTL')),
+        **params
+    )
+
+
+def claim_next_job():
+    # The conditional UPDATE is the claim: only one worker can move a given job
+    # out of PENDING, on any database backend.
+    candidates = TTSJob.objects.filter(
+        status=TTSJob.PENDING,
+        expires_at__gt=timezone.now()
+    ).order_by('created_at').values_list('pk', flat=True)[:10]
+    for pk in candidates:
+        claimed = TTSJob.objects.filter(pk=pk, status=TTSJob.PENDING).update(
+            status=TTSJob.RUNNING,
+            started_at=timezone.now()
+        )
+        if claimed:
+            return TTSJob.objects.get(pk=pk)
+    return None
+
+
+def run_job(job, produce=None):
+    # produce() makes the audio instead of plain synthesis of job.lezgin_text.
+    try:
+        if produce is not None:
+            audio_path = produce()
+        else:
+            audio_path = synthesize(
+                job.lezgin_text,
+                speaking_rate=job.speaking_rate,
+                noise_scale=job.noise_scale,
+                add_pauses=job.add_pauses
+            )
+    except Exception as e:
+        job.attempts += 1
+        if job.attempts < get_setting('TTS_JOB_MAX_ATTEMPTS'):
+            job.status = TTSJob.PENDING
+        else:
+            job.status = TTSJob.FAILED
+            job.finished_at = timezone.now()
+        job.error = str(e)
+        job.save(update_fields=['status', 'error', 'attempts', 'finished_at'])
+        return job
+
+    job.status = TTSJob.DONE
+    job.audio_path = audio_path
+    job.error = ''
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'audio_path', 'error', 'finished_at'])
+    return job
+
+
+def _run_in_background(job, produce):
+    close_old_connections()
+    try:
+        return run_job(job, produce)
+    finally:
+        close_old_connections()
+        with _running_lock:
+            _running.pop(job.pk, None)
+
+
+def start_job(lezgin_text, produce=None, **params):
+    # Creates a job already claimed by this process and runs it on the job
+    # executor. If the process dies, requeue_stale_jobs hands it to the TTS
+    # worker, which synthesizes job.lezgin_text.
+    job = submit_job(lezgin_text, status=TTSJob.RUNNING, started_at=timezone.now(), **params)
+    with _running_lock:
+        _running[job.pk] = get_job_executor().submit(_run_in_background, job, produce)
+    return job
+
+
+def wait_for_job(job, timeout, poll_interval=0.1):
+    # Long-polls until the job is finished or timeout passes. Jobs running in
+    # this process are awaited directly; others are polled in the database.
+    deadline = time.monotonic() + timeout
+    with _running_lock:
+        future = _running.get(job.pk)
+    if future is not None:
+        try:
+            future.result(timeout=timeout)
+        except Exception:
+            pass  # a timeout; failures are recorded on the job itself
+        job.refresh_from_db()
+        return job
+    while job.status not in FINISHED:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        time.sleep(min(poll_interval, remaining))
+        job.refresh_from_db()
+    return job
+
+
+def process_next_job():
+    job = claim_next_job()
+    if job is None:
+        return None
+    return run_job(job)
+
+
+def requeue_stale_jobs():
+    deadline = timezone.now() - timedelta(seconds=get_setting('TTS_JOB_TIMEOUT'))
+    return TTSJob.objects.filter(status=TTSJob.RUNNING, started_at__lt=deadline).update(
+        status=TTSJob.PENDING,
+        started_at=None
+    )
+
+
+def purge_expired_jobs():
+    expired = TTSJob.objects.filter(expires_at__lte=timezone.now())
+    for audio_path in expired.exclude(audio_path='').values_list('audio_path', flat=True):
+        discard_download(audio_path)
+    deleted_count, _ = expired.delete()
+    return deleted_count
+
+
+def sweep_expired_downloads():
+    # Audio served by URL must outlive its link, job audio its job.
+    return sweep_downloads(max(get_setting('AUDIO_URL_TTL'), get_setting('TTS_JOB_TTL')))
+
+
+def worker_loop(stop_event, poll_interval=1.0):
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = process_next_job()
+        finally:
+            close_old_connections()
+        if job is None:
+            stop_event.wait(poll_interval)
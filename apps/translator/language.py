@@ -0,0 +1,161 @@
+import math
+import re
+import threading
+
+from django.apps import apps
+from django.db import connection
+
+from .conf import get_setting
+from .memory import version
+from .metrics import timed
+from .models import MemoryEntry
+
+RUSSIAN = 'ru'
+LEZGIAN = 'lez'
+
+PALOCHKA = 'ӏ'
+# People type the palochka as a Latin I or l, a digit 1 or a stick; after the
+# consonants that take it none of these occur in Russian text.
+PALOCHKA_RE = re.compile(r'(?<=[кптцчКПТЦЧ])[ӀӏIl1|](?![\d])')
+WORD_RE = re.compile(r'[а-яёӏ]+')
+# Used while the alphabet table is empty.
+DIGRAPHS = ('гъ', 'гь', 'къ', 'кь', 'кӏ', 'пӏ', 'тӏ', 'уь', 'хъ', 'хь', 'цӏ', 'чӏ')
+NGRAM = 3
+
+
+def normalize(text):
+    return WORD_RE.findall(PALOCHKA_RE.sub(PALOCHKA, text).casefold().replace('ё', 'е'))
+
+
+def ngrams(word):
+    padded = f' {word} '
+    return [padded[i:i + NGRAM] for i in range(len(padded) - NGRAM + 1)]
+
+
+def alphabet_digraphs():
+    letters = apps.get_model('alphabet', 'Letter').objects.values_list('letter', flat=True)
+    digraphs = {
+        token for letter in letters for token in normalize(letter)
+        if len(token) > 1
+    }
+    return sorted(digraphs) or list(DIGRAPHS)
+
+
+class LanguageDetector:
+    # Marks words holding a palochka or a Lezgian digraph, and scores the rest
+    # with the log-likelihood ratio of their character trigrams under the
+    # Lezgian and Russian halves of the translation memory.
+
+    def __init__(self, russian_texts=(), lezgian_texts=(), digraphs=DIGRAPHS, version=None):
+        self.version = version
+        russian = self._count(russian_texts)
+        lezgian = self._count(lezgian_texts)
+        # A digraph seen in Russian text is no evidence for Lezgian.
+        russian_bigrams = {gram[i:i + 2] for gram in russian for i in range(NGRAM - 1)}
+        self.markers = tuple(digraph for digraph in digraphs if digraph not in russian_bigrams)
+        self.weights = {}
+        if russian and lezgian:
+            vocabulary = len(russian.keys() | lezgian.keys())
+            russian_total = sum(russian.values()) + vocabulary
+            lezgian_total = sum(lezgian.values()) + vocabulary
+            for gram in russian.keys() | lezgian.keys():
+                self.weights[gram] = (
+                    math.log((lezgian.get(gram, 0) + 1) / lezgian_total)
+                    - math.log((russian.get(gram, 0) + 1) / russian_total)
+                )
+
+    @staticmethod
+    def _count(texts):
+        counts = {}
+        for text in texts:
+            for word in normalize(text):
+                for gram in ngrams(word):
+                    counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def is_lezgian_word(self, word):
+        if PALOCHKA in word or any(marker in word for marker in self.markers):
+            return True
+        weights = self.weights
+        return sum(weights.get(gram, 0) for gram in ngrams(word)) > 0
+
+    def share(self, text):
+        # Share of words that look Lezgian; None for text without Cyrillic words.
+        words = normalize(text)
+        if not words:
+            return None
+        return sum(1 for word in words if self.is_lezgian_word(word)) / len(words)
+
+    def detect(self, text, min_share=0.6):
+        share = self.share(text)
+        return LEZGIAN if share is not None and share >= min_share else RUSSIAN
+
+
+def build_detector():
+    entries = MemoryEntry.objects.order_by('id').values_list('normalized', 'translation')
+    entries = list(entries[:get_setting('LANGUAGE_TRAINING_LIMIT')])
+    return LanguageDetector(
+        (text for text, _ in entries),
+        (translation for _, translation in entries),
+        digraphs=alphabet_digraphs(),
+        version=version()
+    )
+
+
+_detector = None
+_detector_lock = threading.Lock()
+_rebuild_lock = threading.Lock()
+
+
+def rebuild_detector():
+    # Only one rebuild runs at a time; the others keep the current detector.
+    global _detector
+    if not _rebuild_lock.acquire(blocking=False):
+        return _detector
+    try:
+        _detector = build_detector()
+    finally:
+        _rebuild_lock.release()
+    return _detector
+
+
+def _rebuild_in_background():
+    try:
+        rebuild_detector()
+    finally:
+        connection.close()
+
+
+def start_rebuild():
+    if _detector is not None and not _rebuild_lock.locked():
+        threading.Thread(target=_rebuild_in_background, name='language-detector', daemon=True).start()
+
+
+def get_detector():
+    # Trained on first use; retrained in the background after the translation
+    # memory changes, while the old detector keeps answering.
+    global _detector
+    detector = _detector
+    if detector is None:
+        with _detector_lock:
+            if _detector is None:
+                _detector = build_detector()
+            return _detector
+    if detector.version != version():
+        start_rebuild()
+    return detector
+
+
+def reset_detector():
+    global _detector
+    with _detector_lock:
+        _detector = None
+
+
+def is_lezgian(text):
+    # Only the start of long texts is looked at, which keeps detection well under a millisecond.
+    if not get_setting('LANGUAGE_DETECTION_ENABLED'):
+        return False
+    detector = get_detector()
+    with timed('language'):
+        return detector.detect(text[:get_setting('LANGUAGE_SAMPLE_CHARS')], get_setting('LANGUAGE_MIN_SHARE')) == LEZGIAN
@@ -0,0 +1,168 @@
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections
+
+from .bulkhead import BulkheadFull, get_bulkhead
+from .conf import get_setting
+from .resilience import BackendError
+from .services import alookup_translation, split_sentences
+from .warmup import fail_fast_while_cold
+
+LIVE_PATH = '/ws/translator/live/'
+SENTENCE_END = ('.', '!', '?', '…')
+
+
+def is_complete(sentence):
+    return sentence.rstrip().endswith(SENTENCE_END)
+
+
+class LiveSession:
+    # One WebSocket connection. Text is translated sentence by sentence after
+    # debounce seconds without typing; a sentence that disappears from the text
+    # has its translation task cancelled, which cancels the remote job too.
+    # The sentence still being typed gets at most draft_calls translations
+    # before it is finished with . ! ? or … Deleting sentences pushes the
+    # shorter translation right away.
+
+    def __init__(self, send, debounce=0.3, draft_calls=3):
+        self._send = send
+        self.debounce = debounce
+        self.draft_calls = draft_calls
+        self.text = ''
+        self.translations = {}
+        self.tasks = {}
+        self.pushed = []
+        self._push_task = None
+        self.draft_index = None
+        self.drafts = 0
+        self._timer = None
+        self._send_lock = asyncio.Lock()
+
+    async def send_json(self, data):
+        async with self._send_lock:
+            await self._send({'type': 'websocket.send', 'text': json.dumps(data, ensure_ascii=False)})
+
+    async def receive(self, text):
+        try:
+            data = json.loads(text or '')
+        except ValueError:
+            data = None
+        if not isinstance(data, dict) or not isinstance(data.get('text', data.get('append')), str):
+            await self.send_json({'type': 'error', 'code': 'invalid', 'error': 'Expected {"text": ...} or {"append": ...}'})
+            return
+        text = data['text'] if 'text' in data else self.text + data['append']
+        max_chars = get_setting('MAX_INPUT_CHARS')
+        if max_chars and len(text) > max_chars:
+            await self.send_json({'type': 'error', 'code': 'too_long', 'error': f'Text is longer than {max_chars} characters'})
+            return
+        self.update(text)
+
+    def update(self, text):
+        self.text = text
+        current = set(split_sentences(text))
+        for sentence, task in list(self.tasks.items()):
+            if sentence not in current:
+                task.cancel()
+                del self.tasks[sentence]
+        if self._timer is not None:
+            self._timer.cancel()
+        self._timer = asyncio.get_running_loop().call_later(self.debounce, self.schedule)
+
+    def schedule(self):
+        self._timer = None
+        sentences = split_sentences(self.text)
+        self.translations = {
+            sentence: translation for sentence, translation in self.translations.items()
+            if sentence in sentences
+        }
+        if any(sentence not in sentences for sentence in self.pushed):
+            self._push_task = asyncio.ensure_future(self.push())
+        for index, sentence in enumerate(sentences):
+            if sentence in self.translations or sentence in self.tasks:
+                continue
+            if index == len(sentences) - 1 and not is_complete(sentence):
+                if index != self.draft_index:
+                    self.draft_index, self.drafts = index, 0
+                if self.drafts >= self.draft_calls:
+                    continue
+                self.drafts += 1
+            self.tasks[sentence] = asyncio.ensure_future(self.translate(sentence))
+
+    async def lookup(self, sentence):
+        bulkhead = get_bulkhead()
+        if bulkhead is None:
+            return await self.alookup(sentence)
+        slot = await bulkhead.aacquire()
+        try:
+            return await self.alookup(sentence)
+        finally:
+            bulkhead.release(slot)
+
+    @staticmethod
+    async def alookup(sentence):
+        # WebSockets bypass Django's request cycle, so the connection checks it
+        # runs around every request are run around every lookup instead.
+        await sync_to_async(close_old_connections)()
+        try:
+            return await alookup_translation(sentence)
+        finally:
+            await sync_to_async(close_old_connections)()
+
+    async def translate(self, sentence):
+        try:
+            lezgin_text, source, _, _, score = await self.lookup(sentence)
+        except (BackendError, BulkheadFull) as e:
+            await self.send_json({'type': 'error', 'code': e.code, 'error': str(e), 'text': sentence})
+        except Exception as e:
+            await self.send_json({'type': 'error', 'code': 'error', 'error': f'Processing error: {str(e)}', 'text': sentence})
+        else:
+            self.translations[sentence] = {'translation': lezgin_text, 'source': source, 'score': score}
+            await self.push()
+        finally:
+            if self.tasks.get(sentence) is asyncio.current_task():
+                del self.tasks[sentence]
+
+    async def push(self):
+        sentences = [
+            {'text': sentence, **self.translations.get(sentence, {'translation': None, 'source': None, 'score': None})}
+            for sentence in split_sentences(self.text)
+        ]
+        self.pushed = [item['text'] for item in sentences]
+        await self.send_json({
+            'type': 'translation',
+            'text': self.text,
+            'translation': ' '.join(item['translation'] for item in sentences if item['translation']),
+            'sentences': sentences,
+            'complete': all(item['translation'] is not None for item in sentences)
+        })
+
+    def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        if self._push_task is not None:
+            self._push_task.cancel()
+        for task in self.tasks.values():
+            task.cancel()
+        self.tasks.clear()
+
+
+@fail_fast_while_cold
+async def live_translation(scope, receive, send):
+    # A plain ASGI WebSocket handler; messages are {"text": "<whole text>"} or
+    # {"append": "<typed characters>"}.
+    message = await receive()
+    if message['type'] != 'websocket.connect':
+        return
+    await send({'type': 'websocket.accept'})
+    session = LiveSession(send, debounce=get_setting('LIVE_DEBOUNCE'), draft_calls=get_setting('LIVE_DRAFT_CALLS'))
+    try:
+        while True:
+            message = await receive()
+            if message['type'] == 'websocket.disconnect':
+                break
+            if message['type'] == 'websocket.receive':
+                await session.receive(message.get('text'))
+    finally:
+        session.close()
@@ -0,0 +1,85 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.translator.audio import FORMATS
+from apps.translator.backfill import TARGETS, generate_audio, needs_audio, save_rows, target_rows
+
+
+class Command(BaseCommand):
+    help = 'Synthesize missing or stale audio for dictionary, phrasebook, library and alphabet rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('targets', nargs='*', help=f"Any of: {', '.join(TARGETS)}; all by default")
+        parser.add_argument('--workers', type=int, default=4, help='Concurrent TTS requests')
+        parser.add_argument('--batch-size', type=int, default=100, help='Rows per bulk update')
+        parser.add_argument('--format', default='audio/mpeg', help=f"One of: {', '.join(FORMATS)}")
+        parser.add_argument('--limit', type=int, help='Process at most this many rows per target')
+        parser.add_argument('--force', action='store_true', help='Regenerate audio for every row')
+        parser.add_argument('--check-links', action='store_true', help='Also replace external links that do not answer')
+
+    def backfill(self, target, executor, options):
+        rows = target_rows(target)
+        if options['check_links']:
+            # Link checks are network calls, so they run on the pool with synthesis.
+            candidates = list(rows)
+        else:
+            candidates = [
+                row for row in rows.iterator()
+                if needs_audio(target, row, options['format'], force=options['force'])
+            ]
+        candidates = candidates[:options['limit']]
+
+        def process(row):
+            if options['check_links'] and not needs_audio(
+                target, row, options['format'], force=options['force'], check_links=True
+            ):
+                return None
+            return generate_audio(target, row, options['format'], force=options['force'])
+
+        started = time.perf_counter()
+        updated, failed, pending = 0, 0, []
+        futures = {executor.submit(process, row): row for row in candidates}
+        for done, future in enumerate(as_completed(futures), start=1):
+            row = futures[future]
+            try:
+                url = future.result()
+            except Exception as e:
+                failed += 1
+                self.stderr.write(f'{target} #{row.id}: {e}')
+                url = None
+            if url is not None:
+                row.audio = url
+                pending.append(row)
+            if len(pending) >= options['batch_size'] or done == len(candidates):
+                if pending:
+                    save_rows(target, pending)
+                    updated += len(pending)
+                    pending = []
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f'{target}: {done}/{len(candidates)} checked, {updated} updated, {failed} failed, '
+                    f'{done / elapsed if elapsed else 0:.1f} rows/s'
+                )
+        return len(candidates), updated, failed, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        if options['format'] not in FORMATS:
+            raise CommandError(f"Unknown format {options['format']}, expected one of: {', '.join(FORMATS)}")
+        targets = options['targets'] or list(TARGETS)
+        unknown = set(targets) - set(TARGETS)
+        if unknown:
+            raise CommandError(f"Unknown targets: {', '.join(sorted(unknown))}")
+
+        totals = [0, 0, 0, 0]
+        with ThreadPoolExecutor(max_workers=options['workers'], thread_name_prefix='tts-backfill') as executor:
+            for target in targets:
+                result = self.backfill(target, executor, options)
+                totals = [total + value for total, value in zip(totals, result)]
+
+        checked, updated, failed, elapsed = totals
+        self.stdout.write(self.style.SUCCESS(
+            f'Done: {checked} rows checked, {updated} updated, {failed} failed in {elapsed:.1f} s '
+            f'({updated / elapsed if elapsed else 0:.2f} rows/s with {options["workers"]} workers)'
+        ))
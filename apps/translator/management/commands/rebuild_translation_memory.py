@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from apps.translator.memory import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the translation memory from the dictionary, phrasebook and library tables'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            created = rebuild()
+        self.stdout.write(self.style.SUCCESS(f'Translation memory rebuilt: {created} entries'))
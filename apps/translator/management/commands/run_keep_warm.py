@@ -0,0 +1,44 @@
+import signal
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.translator.conf import get_setting
+from apps.translator.warmup import KeepWarm, keep_warm_loop
+
+
+class Command(BaseCommand):
+    help = 'Ping the translator and TTS Spaces on an interval so they do not fall asleep, and record warm/cold state'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--interval', type=float, default=None, help='Seconds between pings; KEEP_WARM_INTERVAL')
+        parser.add_argument('--timeout', type=float, default=None, help='Seconds before a backend counts as cold; KEEP_WARM_TIMEOUT')
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Ping every backend once, print the result and exit')
+
+    def write_state(self, name, state):
+        details = f"{state['latency']:.2f}s" if 'latency' in state else state.get('error', '')
+        self.stdout.write(f"{name}: {state['state']} {details}".rstrip())
+
+    def handle(self, *args, **options):
+        keep_warm = KeepWarm(
+            interval=options['interval'] or get_setting('KEEP_WARM_INTERVAL'),
+            timeout=options['timeout'] or get_setting('KEEP_WARM_TIMEOUT'),
+        )
+        if options['once']:
+            keep_warm.tick()
+            while keep_warm.pending:
+                time.sleep(options['poll_interval'])
+                for name, state in keep_warm.tick():
+                    self.write_state(name, state)
+            keep_warm.close()
+            return
+
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+        self.stdout.write(f'Keeping {", ".join(keep_warm.names)} warm every {keep_warm.interval:.0f}s')
+        keep_warm_loop(stop_event, keep_warm, options['poll_interval'], on_record=self.write_state)
+        keep_warm.close()
+        self.stdout.write('Keep-warm stopped')
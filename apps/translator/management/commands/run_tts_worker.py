@@ -0,0 +1,47 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from apps.translator.jobs import worker_loop, requeue_stale_jobs, purge_expired_jobs, sweep_expired_downloads
+
+
+class Command(BaseCommand):
+    help = 'Process queued TTS jobs with a local pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--housekeeping-interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        stop_event = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: stop_event.set())
+
+        threads = [
+            threading.Thread(
+                target=worker_loop,
+                args=(stop_event, options['poll_interval']),
+                name=f'tts-worker-{i}',
+                daemon=True
+            )
+            for i in range(options['threads'])
+        ]
+        for thread in threads:
+            thread.start()
+        self.stdout.write(f"Started {len(threads)} TTS worker threads")
+
+        while not stop_event.is_set():
+            requeued = requeue_stale_jobs()
+            purged = purge_expired_jobs()
+            swept = sweep_expired_downloads()
+            if requeued or purged or swept:
+                self.stdout.write(
+                    f"Requeued {requeued} stale jobs, purged {purged} expired jobs, removed {swept} old downloads"
+                )
+            stop_event.wait(options['housekeeping_interval'])
+
+        for thread in threads:
+            thread.join()
+        self.stdout.write("TTS workers stopped")
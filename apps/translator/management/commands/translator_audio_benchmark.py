@@ -0,0 +1,47 @@
+import os
+import tempfile
+import time
+
+import soundfile as sf
+from django.core.management.base import BaseCommand
+
+from apps.translator.audio import FORMATS, WAV, encode, process
+from apps.translator.fake import write_wav
+
+
+class Command(BaseCommand):
+    help = 'Report bytes per second of speech and CPU cost of each translator audio format'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--input', help='WAV file to encode; defaults to a generated clip')
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--sample-rate', type=int, default=16000)
+        parser.add_argument('--no-trim', action='store_true')
+
+    def handle(self, *args, **options):
+        path = options['input']
+        if path is None:
+            path = os.path.join(tempfile.mkdtemp(), 'speech.wav')
+            write_wav(path, 'Салам, гьикӏ ава? ' * 6, sample_rate=22050)
+        samples, rate = sf.read(path, dtype='float32', always_2d=True)
+        source_bytes = os.path.getsize(path)
+        seconds = len(samples) / rate
+        self.stdout.write(
+            f'{path}: {seconds:.1f} s of speech, {rate} Hz, {samples.shape[1]} channel(s), '
+            f'{source_bytes / seconds / 1024:.1f} KiB/s as delivered by the Space'
+        )
+
+        for media_type in FORMATS:
+            started = time.process_time()
+            for _ in range(options['rounds']):
+                processed, processed_rate = process(
+                    samples, rate, target_rate=options['sample_rate'], trim=not options['no_trim']
+                )
+                data = encode(processed, processed_rate, media_type)
+            cpu = (time.process_time() - started) / options['rounds']
+            self.stdout.write(
+                f'{media_type:<11} {len(data) / seconds / 1024:7.1f} KiB/s of speech  '
+                f'{len(data) / source_bytes * 100:5.1f}% of source  '
+                f'{cpu * 1000:6.1f} ms CPU per clip  {cpu / seconds * 1000:5.1f} ms CPU per second of speech'
+                + ('  (passed through unprocessed by default)' if media_type == WAV else '')
+            )
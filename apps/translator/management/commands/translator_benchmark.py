@@ -0,0 +1,85 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.test import Client, AsyncClient, override_settings
+from django.urls import reverse
+
+from apps.translator.clients import reset_pool
+
+
+def summarize(name, latencies, elapsed, errors):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0
+    return (
+        f"{name:<6} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {statistics.median(latencies) * 1000 if latencies else 0:7.0f} ms  "
+        f"p95 {p95 * 1000:7.0f} ms  errors {errors}"
+    )
+
+
+class Command(BaseCommand):
+    help = 'Compare concurrent throughput of the sync and async translator views against a local fake Space'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=40)
+        parser.add_argument('--concurrency', type=int, default=20)
+        parser.add_argument('--workers', type=int, default=4, help='Sync worker threads, like gunicorn sync workers')
+        parser.add_argument('--latency', type=float, default=0.25, help='Seconds per fake remote call')
+
+    def run_sync(self, url, texts, workers):
+        client = Client()
+
+        def call(text):
+            started = time.perf_counter()
+            response = client.post(url, {'text': text}, content_type='application/json')
+            return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(executor.map(call, texts))
+        return results, time.perf_counter() - started
+
+    async def run_async(self, url, texts, concurrency):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def call(text):
+            async with semaphore:
+                started = time.perf_counter()
+                response = await client.post(url, {'text': text}, content_type='application/json')
+                return time.perf_counter() - started, response.status_code
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*(call(text) for text in texts))
+        return results, time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        latency = options['latency']
+        fake_settings = {
+            'TRANSLATOR_SPACE': f'fake://translator?latency={latency}',
+            'TTS_SPACE': f'fake://tts?latency={latency}',
+            'AUDIO_CACHE_DIR': None,
+            'TRANSLATION_CACHE_ENABLED': False,
+            'BULKHEAD_LIMIT': None,
+        }
+        with override_settings(TRANSLATOR=fake_settings, ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False):
+            reset_pool()
+            self.stdout.write(
+                f"{options['requests']} requests, fake remote latency {latency * 1000:.0f} ms per call, "
+                f"{options['workers']} sync workers vs {options['concurrency']} concurrent async requests"
+            )
+            for name, run in (
+                ('sync', lambda texts: self.run_sync(
+                    reverse('translator:translator'), texts, options['workers'])),
+                ('async', lambda texts: asyncio.run(self.run_async(
+                    reverse('translator:translator-async'), texts, options['concurrency']))),
+            ):
+                texts = [f'{name} текст {i}' for i in range(options['requests'])]
+                results, elapsed = run(texts)
+                latencies = [took for took, code in results if code == 200]
+                errors = sum(1 for _, code in results if code != 200)
+                self.stdout.write(summarize(name, latencies, elapsed, errors))
+            reset_pool()
@@ -0,0 +1,88 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from apps.translator.backends import discard_download
+from apps.translator.clients import reset_pool
+from apps.translator.resilience import reset_breakers
+from apps.translator.services import lookup_translation, speak, speak_chunks, split_chunks
+
+SENTENCES = [
+    'Дагестан расположен на берегу Каспийского моря.',
+    'Лезгины живут в южном Дагестане и на севере Азербайджана, в горах и на равнине.',
+    'Весной, когда тает снег, реки становятся широкими и быстрыми.',
+    'Мы собрались у дедушки, чтобы послушать старые песни.',
+]
+
+
+def sample_text(length):
+    text = ''
+    index = 0
+    while len(text) < length:
+        text += SENTENCES[index % len(SENTENCES)] + ' '
+        index += 1
+    return text[:length].rsplit(' ', 1)[0]
+
+
+class Command(BaseCommand):
+    help = 'Time translation with audio for inputs of increasing length, whole and in parallel chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lengths', type=int, nargs='+', default=[250, 500, 1000, 2000, 4000])
+        parser.add_argument(
+            '--parallelism', type=int, nargs='+', default=[1, 4, 8],
+            help='Chunk parallelism values to compare; capped by BATCH_MAX_WORKERS'
+        )
+        parser.add_argument('--chunk-chars', type=int, default=400)
+        parser.add_argument('--latency', type=float, default=0.1, help='Seconds per fake backend call')
+        parser.add_argument(
+            '--char-latency', type=float, default=0.002,
+            help='Extra seconds per input character, so long requests are slower like the real model'
+        )
+
+    def run(self, text):
+        started = time.perf_counter()
+        lezgin_text, _, recording_url, chunks, _ = lookup_translation(text)
+        if chunks:
+            audio_path, _ = speak_chunks([translation for _, translation in chunks])
+        else:
+            audio_path = speak(lezgin_text, recording_url)
+        discard_download(audio_path)
+        return time.perf_counter() - started
+
+    def handle(self, *args, **options):
+        fake_options = {'latency': options['latency'], 'char_latency': options['char_latency']}
+        base_settings = {
+            'BACKENDS': {
+                'translator': 'apps.translator.backends.FakeTranslator',
+                'tts': 'apps.translator.backends.FakeTTS',
+            },
+            'BACKEND_OPTIONS': {'translator': fake_options, 'tts': fake_options},
+            'AUDIO_CACHE_DIR': None,
+            'TRANSLATION_CACHE_ENABLED': False,
+            'MEMORY_ENABLED': False,
+            'MAX_INPUT_CHARS': None,
+            'CHUNK_MAX_CHARS': options['chunk_chars'],
+        }
+        configurations = [('whole', {'CHUNK_MAX_CHARS': None})] + [
+            (f'x{parallelism}', {'CHUNK_PARALLELISM': parallelism})
+            for parallelism in options['parallelism']
+        ]
+
+        self.stdout.write(
+            f"fake backends: {options['latency'] * 1000:.0f} ms + {options['char_latency'] * 1000:.1f} ms per char, "
+            f"chunks of up to {options['chunk_chars']} chars"
+        )
+        self.stdout.write(f"{'chars':>6} {'chunks':>6}  " + '  '.join(f'{name:>8}' for name, _ in configurations))
+        for length in options['lengths']:
+            text = sample_text(length)
+            timings = []
+            for _, overrides in configurations:
+                with override_settings(TRANSLATOR={**base_settings, **overrides}):
+                    reset_pool()
+                    reset_breakers()
+                    timings.append(self.run(text))
+            reset_pool()
+            chunks = len(split_chunks(text, options['chunk_chars']))
+            self.stdout.write(f'{len(text):>6} {chunks:>6}  ' + '  '.join(f'{took:>7.2f}s' for took in timings))
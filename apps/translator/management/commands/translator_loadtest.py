@@ -0,0 +1,165 @@
+import asyncio
+import statistics
+import tempfile
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+from django.core.management.base import BaseCommand, CommandError
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from apps.translator.bulkhead import reset_bulkhead
+from apps.translator.clients import reset_pool
+from apps.translator.resilience import reset_breakers
+
+# name: (url name, async view, JSON body for one text)
+ENDPOINTS = {
+    'app': ('translator:translator', False, lambda text: {'text': text}),
+    'tts': ('translator:tts', False, lambda text: {'lezgin_text': text}),
+    'batch': ('translator:batch', False, lambda text: {'texts': [text, f'{text} 2', f'{text} 3']}),
+    'async-app': ('translator:translator-async', True, lambda text: {'text': text}),
+    'async-tts': ('translator:tts-async', True, lambda text: {'lezgin_text': text}),
+}
+
+
+def percentile(values, fraction):
+    return values[min(int(len(values) * fraction), len(values) - 1)] if values else 0
+
+
+def report(name, results, elapsed):
+    latencies = sorted(took for took, code, _ in results if code == 200)
+    codes = Counter(code for _, code, _ in results if code != 200)
+    size = statistics.mean(size for _, code, size in results if code == 200) if latencies else 0
+    return (
+        f"{name:<10} {len(latencies) / elapsed:8.1f} req/s  "
+        f"p50 {percentile(latencies, 0.5) * 1000:6.0f} ms  "
+        f"p95 {percentile(latencies, 0.95) * 1000:6.0f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:6.0f} ms  "
+        f"max {(latencies[-1] if latencies else 0) * 1000:6.0f} ms  "
+        f"{size / 1024:6.1f} KiB/resp  "
+        f"errors {sum(codes.values())}" + (f" {dict(codes)}" if codes else '')
+    )
+
+
+class Command(BaseCommand):
+    help = 'Load-test the translator endpoints offline against the fake translator and TTS backends'
+
+    def add_arguments(self, parser):
+        parser.add_argument('endpoints', nargs='*', help=f"Any of: {', '.join(ENDPOINTS)}; all by default")
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--unique', type=int, help='Distinct texts to cycle through; all distinct by default')
+        parser.add_argument('--latency', type=float, default=0.2, help='Seconds per fake backend call')
+        parser.add_argument('--error-rate', type=float, default=0.0, help='Share of failing fake backend calls')
+        parser.add_argument('--audio-seconds', type=float, default=2.0, help='Length of every fake TTS answer')
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--base-url',
+            help='Send real HTTP requests to a running server instead (start it with fake:// Spaces)'
+        )
+
+    def run_threads(self, call, texts, concurrency):
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(call, texts))
+        return results, time.perf_counter() - started
+
+    def run_in_process(self, url, is_async, body, texts, concurrency):
+        if not is_async:
+            client = Client()
+
+            def call(text):
+                started = time.perf_counter()
+                response = client.post(url, body(text), content_type='application/json')
+                return time.perf_counter() - started, response.status_code, len(response.content)
+            return self.run_threads(call, texts, concurrency)
+
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(concurrency)
+
+            async def call(text):
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.post(url, body(text), content_type='application/json')
+                    return time.perf_counter() - started, response.status_code, len(response.content)
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(call(text) for text in texts))
+            return results, time.perf_counter() - started
+        return asyncio.run(run())
+
+    def run_http(self, url, body, texts, concurrency):
+        with httpx.Client(timeout=120, limits=httpx.Limits(max_connections=concurrency)) as client:
+            def call(text):
+                started = time.perf_counter()
+                try:
+                    response = client.post(url, json=body(text))
+                except httpx.HTTPError:
+                    return time.perf_counter() - started, 0, 0
+                return time.perf_counter() - started, response.status_code, len(response.content)
+            return self.run_threads(call, texts, concurrency)
+
+    def handle(self, *args, **options):
+        names = options['endpoints'] or list(ENDPOINTS)
+        unknown = set(names) - set(ENDPOINTS)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        fake_options = {
+            'latency': options['latency'],
+            'error_rate': options['error_rate'],
+            'seed': options['seed'],
+        }
+        fake_settings = {
+            'BACKENDS': {
+                'translator': 'apps.translator.backends.FakeTranslator',
+                'tts': 'apps.translator.backends.FakeTTS',
+            },
+            'BACKEND_OPTIONS': {
+                'translator': fake_options,
+                'tts': {**fake_options, 'audio_seconds': options['audio_seconds']},
+            },
+            'TRANSLATOR_SPACE': 'fake://translator',
+            'TTS_SPACE': 'fake://tts',
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(prefix='translator-loadtest-'),
+            'TRANSLATION_CACHE_ENABLED': False,
+            'MEMORY_ENABLED': False,
+            'POOL_MAX_IDLE': options['concurrency'],
+            # In-process requests share one worker, so every concurrent one gets a slot.
+            'BULKHEAD_LIMIT': options['concurrency'],
+        }
+        unique = options['unique'] or options['requests']
+        where = options['base_url'] or 'in-process'
+        self.stdout.write(
+            f"{options['requests']} requests per endpoint, concurrency {options['concurrency']}, "
+            f"{unique} distinct texts, {where}"
+        )
+        if not options['base_url']:
+            self.stdout.write(
+                f"fake backends: {options['latency'] * 1000:.0f} ms per call, "
+                f"error rate {options['error_rate']:.0%}, {options['audio_seconds']:.1f} s of audio"
+            )
+
+        with override_settings(TRANSLATOR=fake_settings, ALLOWED_HOSTS=['*'], SECURE_SSL_REDIRECT=False):
+            reset_pool()
+            reset_breakers()
+            reset_bulkhead()
+            try:
+                for name in names:
+                    url_name, is_async, body = ENDPOINTS[name]
+                    texts = [f'{name} текст {i % unique}' for i in range(options['requests'])]
+                    if options['base_url']:
+                        url = options['base_url'].rstrip('/') + reverse(url_name)
+                        results, elapsed = self.run_http(url, body, texts, options['concurrency'])
+                    else:
+                        results, elapsed = self.run_in_process(
+                            reverse(url_name), is_async, body, texts, options['concurrency']
+                        )
+                    self.stdout.write(report(name, results, elapsed))
+            finally:
+                reset_pool()
+                reset_breakers()
+                reset_bulkhead()
@@ -0,0 +1,169 @@
+import difflib
+import math
+import re
+import time
+import unicodedata
+
+from django.apps import apps
+from django.core.cache import caches
+
+from .conf import get_setting
+from .models import MemoryEntry
+
+MODEL = 'model'
+FALLBACK = 'fallback'
+INPUT = 'input'
+VERSION_KEY = 'translator:memory-version'
+
+EDGE_PUNCTUATION = '.,!?…;:"\'«»()-— '
+WHITESPACE_RE = re.compile(r'\s+')
+WORD_RE = re.compile(r'\w+')
+# Fuzzy matches must agree on these, or «не пришел» would pass for «пришел».
+NEGATIONS = frozenset(('не', 'ни', 'нет'))
+MAX_LENGTH = MemoryEntry._meta.get_field('normalized').max_length
+
+
+def normalize(text):
+    text = unicodedata.normalize('NFC', text).casefold().replace('ё', 'е')
+    return WHITESPACE_RE.sub(' ', text).strip(EDGE_PUNCTUATION)
+
+
+def words(normalized):
+    return WORD_RE.findall(normalized)
+
+
+def _entry(source, source_id, text, translation, audio):
+    normalized = normalize(text)
+    return MemoryEntry(
+        source=source,
+        source_id=source_id,
+        text=text,
+        normalized=normalized,
+        length=len(normalized),
+        words=len(words(normalized)),
+        translation=translation,
+        audio=audio or ''
+    )
+
+
+def _storable(entry):
+    # Texts that do not fit the columns are left out rather than cut, since a
+    # cut text would match inputs that only share its beginning.
+    return 0 < entry.length <= MAX_LENGTH and len(entry.text) <= MAX_LENGTH and len(entry.translation) <= MAX_LENGTH
+
+
+def _dictionary_entries(word_ids=None):
+    Translation = apps.get_model('dictionary', 'Translation')
+    translations = Translation.objects.select_related('word').order_by('word_id', 'id')
+    if word_ids is not None:
+        translations = translations.filter(word_id__in=word_ids)
+    seen = set()
+    for translation in translations:
+        if translation.word_id not in seen:
+            seen.add(translation.word_id)
+            yield _entry(MemoryEntry.DICTIONARY, translation.word_id, translation.word.text,
+                         translation.text, translation.audio)
+
+
+def _phrasebook_entries(phrase_ids=None):
+    Translation = apps.get_model('phrasebook', 'Translation')
+    translations = Translation.objects.select_related('phrase').order_by('phrase_id', 'id')
+    if phrase_ids is not None:
+        translations = translations.filter(phrase_id__in=phrase_ids)
+    seen = set()
+    for translation in translations:
+        if translation.phrase_id not in seen:
+            seen.add(translation.phrase_id)
+            yield _entry(MemoryEntry.PHRASEBOOK, translation.phrase_id, translation.phrase.text,
+                         translation.text, translation.audio)
+
+
+def _library_entries(sentence_ids=None):
+    sentences = apps.get_model('library', 'Sentence').objects.exclude(translate='')
+    if sentence_ids is not None:
+        sentences = sentences.filter(id__in=sentence_ids)
+    for sentence in sentences.order_by('id'):
+        yield _entry(MemoryEntry.LIBRARY, sentence.id, sentence.text, sentence.translate, sentence.audio)
+
+
+ENTRY_BUILDERS = {
+    MemoryEntry.DICTIONARY: _dictionary_entries,
+    MemoryEntry.PHRASEBOOK: _phrasebook_entries,
+    MemoryEntry.LIBRARY: _library_entries,
+}
+
+
+def version():
+    # Changes whenever the memory does; shared by workers through the translation cache backend.
+    return caches[get_setting('TRANSLATION_CACHE_ALIAS')].get(VERSION_KEY, 0)
+
+
+def _bump_version():
+    caches[get_setting('TRANSLATION_CACHE_ALIAS')].set(VERSION_KEY, time.time_ns(), None)
+
+
+def refresh(source, source_ids):
+    MemoryEntry.objects.filter(source=source, source_id__in=source_ids).delete()
+    MemoryEntry.objects.bulk_create(
+        (entry for entry in ENTRY_BUILDERS[source](source_ids) if _storable(entry)),
+        batch_size=1000
+    )
+    _bump_version()
+
+
+def rebuild():
+    MemoryEntry.objects.all().delete()
+    created = 0
+    for build in ENTRY_BUILDERS.values():
+        created += len(MemoryEntry.objects.bulk_create(
+            (entry for entry in build() if _storable(entry)),
+            batch_size=1000
+        ))
+    _bump_version()
+    return created
+
+
+def _best_fuzzy(normalized, threshold):
+    # Scored on words, not characters, so a dropped short word costs as much as
+    # any other. SequenceMatcher.ratio() >= threshold bounds the candidate's
+    # word count, so the indexed words column keeps the scan to near-equal ones.
+    tokens = words(normalized)
+    count = len(tokens)
+    negations = NEGATIONS.intersection(tokens)
+    candidates = MemoryEntry.objects.filter(words__range=(
+        math.ceil(count * threshold / (2 - threshold)),
+        math.floor(count * (2 - threshold) / threshold)
+    )).values_list('id', 'normalized')
+    matcher = difflib.SequenceMatcher(b=tokens, autojunk=False)
+    best_id, best_score = None, threshold
+    for entry_id, candidate in candidates.iterator():
+        candidate_tokens = words(candidate)
+        matcher.set_seq1(candidate_tokens)
+        if matcher.real_quick_ratio() < best_score or matcher.quick_ratio() < best_score:
+            continue
+        if NEGATIONS.intersection(candidate_tokens) != negations:
+            continue
+        score = matcher.ratio()
+        if score >= best_score:
+            best_id, best_score = entry_id, score
+    return best_id, best_score
+
+
+def lookup(text):
+    normalized = normalize(text)
+    if not normalized or len(normalized) > MAX_LENGTH:
+        return None
+    entry = MemoryEntry.objects.filter(normalized=normalized).order_by('source', 'id').first()
+    if entry is not None:
+        entry.score = 1.0
+        return entry
+
+    threshold = get_setting('MEMORY_FUZZY_THRESHOLD')
+    if not threshold or threshold >= 1:
+        return None
+    entry_id, score = _best_fuzzy(normalized, threshold)
+    if entry_id is None:
+        return None
+    entry = MemoryEntry.objects.get(id=entry_id)
+    entry.score = score
+    return entry
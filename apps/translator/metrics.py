@@ -0,0 +1,256 @@
+import asyncio
+import contextvars
+import functools
+import json
+import math
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from .conf import get_setting
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, math.inf)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_timings = contextvars.ContextVar('translator_timings', default=None)
+_timings_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, counts=None, total=0.0):
+        self.counts = list(counts) if counts else [0] * len(BUCKETS)
+        self.total = total
+
+    def observe(self, seconds):
+        for index, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+        self.total += seconds
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def merge(self, other):
+        return Histogram([a + b for a, b in zip(self.counts, other.counts)], self.total + other.total)
+
+    def quantile(self, q):
+        # Linear interpolation inside the bucket, like Prometheus' histogram_quantile.
+        count = self.count
+        if not count:
+            return None
+        rank = q * count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if seen + bucket_count >= rank and bucket_count:
+                lower = BUCKETS[index - 1] if index else 0
+                upper = BUCKETS[index]
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return BUCKETS[-2]
+
+    def summary(self):
+        count = self.count
+        return {
+            'count': count,
+            'sum': self.total,
+            'avg': self.total / count if count else None,
+            **{f'p{round(q * 100)}': self.quantile(q) for q in QUANTILES}
+        }
+
+
+class Metrics:
+    # Stage latency histograms keyed by (stage, backend). With metrics_dir set,
+    # every process flushes its histograms to <pid>.json and snapshot() merges
+    # them, so any worker can answer a scrape for the whole host.
+
+    def __init__(self, metrics_dir=None, flush_interval=1):
+        self.metrics_dir = metrics_dir
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._flushed_at = 0
+        if metrics_dir:
+            os.makedirs(metrics_dir, exist_ok=True)
+
+    def observe(self, stage, backend, seconds):
+        with self._lock:
+            histogram = self._histograms.get((stage, backend))
+            if histogram is None:
+                histogram = self._histograms[(stage, backend)] = Histogram()
+            histogram.observe(seconds)
+
+    def _own_path(self):
+        return os.path.join(self.metrics_dir, f'{os.getpid()}.json')
+
+    def _dump(self):
+        with self._lock:
+            return [
+                {'stage': stage, 'backend': backend, 'counts': histogram.counts, 'sum': histogram.total}
+                for (stage, backend), histogram in self._histograms.items()
+            ]
+
+    def flush(self, force=False):
+        if not self.metrics_dir:
+            return
+        now = time.monotonic()
+        if not force and now - self._flushed_at < self.flush_interval:
+            return
+        self._flushed_at = now
+        fd, temp_path = tempfile.mkstemp(dir=self.metrics_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump(self._dump(), f)
+        os.replace(temp_path, self._own_path())
+
+    def snapshot(self):
+        histograms = {}
+        rows = self._dump()
+        if self.metrics_dir:
+            own = self._own_path()
+            for name in os.listdir(self.metrics_dir):
+                path = os.path.join(self.metrics_dir, name)
+                if not name.endswith('.json') or path == own:
+                    continue
+                try:
+                    with open(path) as f:
+                        rows += json.load(f)
+                except (OSError, ValueError):
+                    continue
+        for row in rows:
+            key = (row['stage'], row['backend'])
+            histogram = Histogram(row['counts'], row['sum'])
+            histograms[key] = histograms[key].merge(histogram) if key in histograms else histogram
+        return dict(sorted(histograms.items()))
+
+    def stats(self):
+        return [
+            {'stage': stage, 'backend': backend, **histogram.summary()}
+            for (stage, backend), histogram in self.snapshot().items()
+        ]
+
+    def prometheus(self):
+        lines = [
+            '# HELP translator_stage_seconds Time spent in each stage of translator requests.',
+            '# TYPE translator_stage_seconds histogram',
+        ]
+        snapshot = self.snapshot()
+        for (stage, backend), histogram in snapshot.items():
+            labels = f'stage="{stage}",backend="{backend}"'
+            cumulative = 0
+            for bound, count in zip(BUCKETS, histogram.counts):
+                cumulative += count
+                le = '+Inf' if math.isinf(bound) else repr(float(bound))
+                lines.append(f'translator_stage_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'translator_stage_seconds_sum{{{labels}}} {histogram.total}')
+            lines.append(f'translator_stage_seconds_count{{{labels}}} {cumulative}')
+        lines += [
+            '# HELP translator_stage_quantile_seconds Stage latency quantiles estimated from the histogram.',
+            '# TYPE translator_stage_quantile_seconds gauge',
+        ]
+        for (stage, backend), histogram in snapshot.items():
+            for q in QUANTILES:
+                value = histogram.quantile(q)
+                if value is not None:
+                    lines.append(
+                        f'translator_stage_quantile_seconds{{stage="{stage}",backend="{backend}",quantile="{q}"}} {value}'
+                    )
+        return '\n'.join(lines) + '\n'
+
+
+_metrics = None
+_metrics_lock = threading.Lock()
+
+
+def get_metrics():
+    global _metrics
+    if _metrics is None:
+        with _metrics_lock:
+            if _metrics is None:
+                _metrics = Metrics(
+                    metrics_dir=get_setting('METRICS_DIR'),
+                    flush_interval=get_setting('METRICS_FLUSH_INTERVAL')
+                )
+    return _metrics
+
+
+def reset_metrics():
+    global _metrics
+    with _metrics_lock:
+        _metrics = None
+
+
+def record(stage, seconds, backend=''):
+    get_metrics().observe(stage, backend, seconds)
+    timings = _timings.get()
+    if timings is not None:
+        name = f'{backend}-{stage}' if backend else stage
+        with _timings_lock:
+            timings[name] = timings.get(name, 0) + seconds
+
+
+@contextmanager
+def timed(stage, backend=''):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - started, backend)
+
+
+def server_timing_header(timings):
+    return ', '.join(f'{name};dur={seconds * 1000:.1f}' for name, seconds in timings.items())
+
+
+def _finish(response, timings, started):
+    total = time.perf_counter() - started
+    record('total', total)
+    if timings:
+        timings['total'] = total
+        response['Server-Timing'] = server_timing_header(timings)
+        response['Access-Control-Expose-Headers'] = ', '.join(filter(None, [
+            response.get('Access-Control-Expose-Headers'),
+            'Server-Timing'
+        ]))
+    get_metrics().flush()
+    return response
+
+
+def server_timing(view):
+    # Collects the stages timed while the view runs into a Server-Timing header.
+    # Work done later, while a streaming body is sent, only reaches the histograms.
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            timings = {}
+            token = _timings.set(timings)
+            try:
+                response = await view(*args, **kwargs)
+            finally:
+                _timings.reset(token)
+            return _finish(response, timings, started)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        timings = {}
+        token = _timings.set(timings)
+        try:
+            response = view(*args, **kwargs)
+        finally:
+            _timings.reset(token)
+        return _finish(response, timings, started)
+    return wrapper
+
+
+def propagate(fn):
+    # Runs fn in the caller's context, so stages timed on executor threads
+    # still reach the request's Server-Timing header.
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
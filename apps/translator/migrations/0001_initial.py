@@ -0,0 +1,39 @@
+# Generated by Django 5.2 on 2026-10-17 10:31
+
+import uuid
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TTSJob',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('lezgin_text', models.TextField(help_text='Текст для озвучки', verbose_name='Текст на лезгинском')),
+                ('speaking_rate', models.FloatField(default=1, verbose_name='Скорость речи')),
+                ('noise_scale', models.FloatField(default=0, verbose_name='Уровень шума')),
+                ('add_pauses', models.BooleanField(default=True, verbose_name='Добавлять паузы')),
+                ('status', models.CharField(choices=[('pending', 'В очереди'), ('running', 'Выполняется'), ('done', 'Готово'), ('failed', 'Ошибка')], default='pending', max_length=10, verbose_name='Статус')),
+                ('audio_path', models.CharField(blank=True, max_length=1000, verbose_name='Путь к аудио')),
+                ('error', models.TextField(blank=True, verbose_name='Ошибка')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попытки')),
+                ('created_at', models.DateTimeField(auto_now_add=True, verbose_name='Создано')),
+                ('started_at', models.DateTimeField(blank=True, null=True, verbose_name='Начато')),
+                ('finished_at', models.DateTimeField(blank=True, null=True, verbose_name='Завершено')),
+                ('expires_at', models.DateTimeField(db_index=True, verbose_name='Истекает')),
+            ],
+            options={
+                'verbose_name': 'Задача озвучки',
+                'verbose_name_plural': 'Задачи озвучки',
+                'ordering': ['created_at'],
+                'indexes': [models.Index(fields=['status', 'created_at'], name='translator__status_5dc6a9_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2 on 2026-10-17 10:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MemoryEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('source', models.CharField(choices=[('dictionary', 'Словарь'), ('phrasebook', 'Разговорник'), ('library', 'Библиотека')], max_length=10, verbose_name='Источник')),
+                ('source_id', models.PositiveIntegerField(verbose_name='Запись источника')),
+                ('text', models.CharField(max_length=255, verbose_name='Текст на русском')),
+                ('normalized', models.CharField(db_index=True, max_length=255, verbose_name='Нормализованный текст')),
+                ('length', models.PositiveSmallIntegerField(db_index=True, verbose_name='Длина нормализованного текста')),
+                ('translation', models.CharField(max_length=255, verbose_name='Перевод')),
+                ('audio', models.CharField(blank=True, max_length=1000, verbose_name='Аудио перевода')),
+            ],
+            options={
+                'verbose_name': 'Запись памяти переводов',
+                'verbose_name_plural': 'Память переводов',
+                'ordering': ['id'],
+                'unique_together': {('source', 'source_id')},
+            },
+        ),
+    ]
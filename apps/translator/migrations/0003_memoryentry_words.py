@@ -0,0 +1,27 @@
+import re
+
+from django.db import migrations, models
+
+
+def count_words(apps, schema_editor):
+    MemoryEntry = apps.get_model('translator', 'MemoryEntry')
+    entries = list(MemoryEntry.objects.only('id', 'normalized'))
+    for entry in entries:
+        entry.words = len(re.findall(r'\w+', entry.normalized))
+    MemoryEntry.objects.bulk_update(entries, ['words'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('translator', '0002_memoryentry'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='memoryentry',
+            name='words',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, verbose_name='Число слов нормализованного текста'),
+        ),
+        migrations.RunPython(count_words, migrations.RunPython.noop),
+    ]
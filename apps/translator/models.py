@@ -0,0 +1,140 @@
+import uuid
+from django.utils.translation import gettext_lazy as _
+from django.db import models
+
+
+class TTSJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, _('В очереди')),
+        (RUNNING, _('Выполняется')),
+        (DONE, _('Готово')),
+        (FAILED, _('Ошибка')),
+    )
+
+    id = models.UUIDField(
+        primary_key=True,
+        default=uuid.uuid4,
+        editable=False
+    )
+    lezgin_text = models.TextField(
+        verbose_name=_('Текст на лезгинском'),
+        help_text=_('Текст для озвучки')
+    )
+    speaking_rate = models.FloatField(
+        default=1,
+        verbose_name=_('Скорость речи')
+    )
+    noise_scale = models.FloatField(
+        default=0,
+        verbose_name=_('Уровень шума')
+    )
+    add_pauses = models.BooleanField(
+        default=True,
+        verbose_name=_('Добавлять паузы')
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+        verbose_name=_('Статус')
+    )
+    audio_path = models.CharField(
+        max_length=1000,
+        blank=True,
+        verbose_name=_('Путь к аудио')
+    )
+    error = models.TextField(
+        blank=True,
+        verbose_name=_('Ошибка')
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_('Попытки')
+    )
+    created_at = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Создано')
+    )
+    started_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Начато')
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Завершено')
+    )
+    expires_at = models.DateTimeField(
+        db_index=True,
+        verbose_name=_('Истекает')
+    )
+    objects = models.Manager()
+    class Meta:
+        verbose_name = _('Задача озвучки')
+        verbose_name_plural = _('Задачи озвучки')
+        ordering = ['created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+    def __str__(self):
+        return f"{self.id} - {self.status}"
+
+
+class MemoryEntry(models.Model):
+    DICTIONARY = 'dictionary'
+    PHRASEBOOK = 'phrasebook'
+    LIBRARY = 'library'
+    SOURCE_CHOICES = (
+        (DICTIONARY, _('Словарь')),
+        (PHRASEBOOK, _('Разговорник')),
+        (LIBRARY, _('Библиотека')),
+    )
+
+    source = models.CharField(
+        max_length=10,
+        choices=SOURCE_CHOICES,
+        verbose_name=_('Источник')
+    )
+    source_id = models.PositiveIntegerField(
+        verbose_name=_('Запись источника')
+    )
+    text = models.CharField(
+        max_length=255,
+        verbose_name=_('Текст на русском')
+    )
+    normalized = models.CharField(
+        max_length=255,
+        db_index=True,
+        verbose_name=_('Нормализованный текст')
+    )
+    length = models.PositiveSmallIntegerField(
+        db_index=True,
+        verbose_name=_('Длина нормализованного текста')
+    )
+    words = models.PositiveSmallIntegerField(
+        db_index=True,
+        default=0,
+        verbose_name=_('Число слов нормализованного текста')
+    )
+    translation = models.CharField(
+        max_length=255,
+        verbose_name=_('Перевод')
+    )
+    audio = models.CharField(
+        max_length=1000,
+        blank=True,
+        verbose_name=_('Аудио перевода')
+    )
+    objects = models.Manager()
+    class Meta:
+        unique_together = ('source', 'source_id')
+        verbose_name = _('Запись памяти переводов')
+        verbose_name_plural = _('Память переводов')
+        ordering = ['id']
+    def __str__(self):
+        return f"{self.text} - {self.translation}"
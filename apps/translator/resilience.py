@@ -0,0 +1,142 @@
+import threading
+import time
+
+from .conf import get_setting
+
+
+class BackendError(Exception):
+    code = 'backend_error'
+    status = 502
+
+    def __init__(self, backend, message):
+        super().__init__(message)
+        self.backend = backend
+
+
+class BackendUnavailable(BackendError):
+    code = 'backend_unavailable'
+    status = 503
+
+    def __init__(self, backend, retry_after):
+        super().__init__(backend, f'{backend} backend is unavailable, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class BackendWarming(BackendUnavailable):
+    code = 'backend_warming'
+
+    def __init__(self, backend, retry_after):
+        BackendError.__init__(self, backend, f'{backend} backend is starting up, retry in {retry_after:.0f}s')
+        self.retry_after = retry_after
+
+
+class BackendTimeout(BackendError):
+    code = 'backend_timeout'
+    status = 504
+
+    def __init__(self, backend, timeout):
+        super().__init__(backend, f'{backend} backend did not answer within {timeout}s')
+        self.timeout = timeout
+
+
+class CircuitBreaker:
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30, clock=time.monotonic):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0
+        self._probe_in_flight = False
+        self._stats = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self):
+        if self._state == self.OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self._state = self.HALF_OPEN
+            self._probe_in_flight = False
+        return self._state
+
+    def before_call(self):
+        with self._lock:
+            state = self._current_state()
+            if state == self.CLOSED:
+                return
+            if state == self.HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return
+            self._stats['rejected'] += 1
+            retry_after = max(self.reset_timeout - (self.clock() - self._opened_at), 1)
+        raise BackendUnavailable(self.name, retry_after)
+
+    def record_success(self):
+        with self._lock:
+            self._stats['successes'] += 1
+            self._state = self.CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._stats['failures'] += 1
+            self._failures += 1
+            state = self._current_state()
+            if state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if state != self.OPEN:
+                    self._stats['opened'] += 1
+                self._state = self.OPEN
+                self._opened_at = self.clock()
+                self._probe_in_flight = False
+
+    def release_probe(self):
+        with self._lock:
+            self._probe_in_flight = False
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['state'] = self._current_state()
+        return stats
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(name):
+    breaker = _breakers.get(name)
+    if breaker is None:
+        with _breakers_lock:
+            breaker = _breakers.get(name)
+            if breaker is None:
+                breaker = _breakers[name] = CircuitBreaker(
+                    name,
+                    failure_threshold=get_setting('BREAKER_FAILURE_THRESHOLD'),
+                    reset_timeout=get_setting('BREAKER_RESET_TIMEOUT'),
+                )
+    return breaker
+
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+
+def breaker_stats():
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.stats() for breaker in breakers}
+
+
+def backend_option(setting, backend):
+    return get_setting(setting).get(backend)
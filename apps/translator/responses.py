@@ -0,0 +1,239 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+from collections import OrderedDict
+from urllib.parse import quote
+
+from django.core import signing
+from django.http import FileResponse, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from rest_framework.negotiation import DefaultContentNegotiation
+
+from .audio import negotiate_format
+from .resilience import BackendUnavailable
+
+BASE64 = 'base64'
+STREAM = 'stream'
+URL = 'url'
+SSE = 'sse'
+DEFERRED = 'deferred'
+DELIVERY_MODES = (BASE64, STREAM, URL)
+
+AUDIO_URL_SALT = 'translator.audio'
+CHUNK_SIZE = 64 * 1024
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+ETAG_MEMO_SIZE = 1024
+
+_etags = OrderedDict()
+_etags_lock = threading.Lock()
+
+
+class IgnoreAcceptContentNegotiation(DefaultContentNegotiation):
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def get_delivery(request, data):
+    delivery = request.GET.get('delivery') or data.get('delivery')
+    if delivery:
+        return delivery
+    accept = request.META.get('HTTP_ACCEPT', '')
+    if accept.startswith('audio/'):
+        return STREAM
+    if accept.startswith('text/event-stream'):
+        return SSE
+    return BASE64
+
+
+def get_audio_format(request):
+    return negotiate_format(request.META.get('HTTP_ACCEPT', ''))
+
+
+def sign_audio_path(path):
+    return signing.dumps({'path': os.path.abspath(path)}, salt=AUDIO_URL_SALT)
+
+
+def load_audio_path(token, max_age):
+    return signing.loads(token, salt=AUDIO_URL_SALT, max_age=max_age)['path']
+
+
+class _ClosingFile:
+    # The file handed to FileResponse. The server closes it once the body is
+    # sent (or the client is gone), and that is when on_close runs.
+
+    def __init__(self, file, on_close):
+        self.file = file
+        self.on_close = on_close
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def close(self):
+        try:
+            self.file.close()
+        finally:
+            self.on_close()
+
+
+class _ClosingIterator:
+    def __init__(self, iterable, on_close):
+        self.iterable = iterable
+        self.on_close = on_close
+
+    def __iter__(self):
+        return iter(self.iterable)
+
+    def close(self):
+        try:
+            close = getattr(self.iterable, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            self.on_close()
+
+
+class _AsyncClosingIterator(_ClosingIterator):
+    def __aiter__(self):
+        return aiter(self.iterable)
+
+
+def close_with(content, on_close):
+    # Wraps streaming content so on_close runs when the response is closed.
+    if hasattr(content, '__aiter__'):
+        return _AsyncClosingIterator(content, on_close)
+    return _ClosingIterator(content, on_close)
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def audio_file_response(request, path, content_type='audio/wav', headers=None, on_close=None):
+    # on_close runs after the file has been sent, e.g. to delete a download.
+    size = os.path.getsize(path)
+    match = RANGE_RE.match(request.META.get('HTTP_RANGE', '').strip())
+    if match and (match.group(1) or match.group(2)):
+        first, last = match.groups()
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
+        else:
+            start = max(size - int(last), 0)
+            end = size - 1
+        if start >= size or start > end:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            if on_close is not None:
+                on_close()
+            return response
+        content = _iter_file_range(path, start, end - start + 1)
+        response = StreamingHttpResponse(
+            close_with(content, on_close) if on_close is not None else content,
+            status=206,
+            content_type=content_type
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        file = open(path, 'rb')
+        response = FileResponse(_ClosingFile(file, on_close) if on_close is not None else file, content_type=content_type)
+        # Read in larger blocks: under ASGI every block is a hop to a thread.
+        response.block_size = CHUNK_SIZE
+    response['Accept-Ranges'] = 'bytes'
+    for name, value in (headers or {}).items():
+        response[name] = value
+    return response
+
+
+def file_etag(path):
+    # Strong ETag of the file content. Audio files are renamed into place and
+    # never rewritten, so digests are memoized by path, size and mtime.
+    stat = os.stat(path)
+    memo_key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _etags_lock:
+        etag = _etags.get(memo_key)
+        if etag is not None:
+            _etags.move_to_end(memo_key)
+            return etag
+    with open(path, 'rb') as f:
+        etag = f'"{hashlib.file_digest(f, "sha256").hexdigest()}"'
+    with _etags_lock:
+        _etags[memo_key] = etag
+        while len(_etags) > ETAG_MEMO_SIZE:
+            _etags.popitem(last=False)
+    return etag
+
+
+def immutable_audio_response(request, path, content_type='audio/wav', on_close=None):
+    # Same URL, same audio: browsers and CDNs may keep the response for a year,
+    # and revalidation with If-None-Match costs a 304 without a body.
+    etag = file_etag(path)
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = audio_file_response(request, path, content_type, on_close=on_close)
+    else:
+        if on_close is not None:
+            on_close()
+        if response.status_code != 304:
+            return response
+    response['ETag'] = etag
+    response['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+    response['Access-Control-Expose-Headers'] = 'ETag, Content-Range, Accept-Ranges'
+    return response
+
+
+def translation_headers(translation, source=None, spans=None, score=None):
+    headers = {
+        'X-Translation': quote(translation, safe=''),
+        'Access-Control-Expose-Headers': (
+            'X-Translation, X-Translation-Source, X-Translation-Score, X-Audio-Chunks, Content-Range, Accept-Ranges'
+        ),
+    }
+    if source:
+        headers['X-Translation-Source'] = source
+    if score is not None:
+        headers['X-Translation-Score'] = f'{score:.3f}'
+    if spans:
+        headers['X-Audio-Chunks'] = ', '.join(f'{start:.3f}-{end:.3f}' for start, end in spans)
+    return headers
+
+
+def backend_error_response(error):
+    response = JsonResponse(
+        {'error': str(error), 'code': error.code, 'backend': error.backend},
+        status=error.status
+    )
+    if isinstance(error, BackendUnavailable):
+        response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+
+def overloaded_response(error):
+    response = JsonResponse(
+        {'error': str(error), 'code': error.code, 'reason': error.reason},
+        status=503
+    )
+    response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+
+def sse_event(event, data):
+    return f'event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n'
+
+
+def sse_response(events):
+    response = StreamingHttpResponse(events, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,81 @@
+from django.urls import reverse
+from rest_framework import serializers
+from .audio import FORMATS
+from .conf import get_setting
+from .models import TTSJob
+from .responses import BASE64, URL
+from .services import ADD_PAUSES, NOISE_SCALE, SPEAKING_RATE
+
+
+class BatchItemField(serializers.Field):
+    def to_internal_value(self, data):
+        if isinstance(data, str):
+            data = {'text': data}
+        if not isinstance(data, dict):
+            raise serializers.ValidationError("Элемент должен быть строкой или объектом с полем text!")
+        text = data.get('text')
+        if not isinstance(text, str) or not text.strip():
+            raise serializers.ValidationError("Текст для перевода не может быть пустым!")
+        max_chars = get_setting('MAX_INPUT_CHARS')
+        if max_chars and len(text) > max_chars:
+            raise serializers.ValidationError(f"Текст длиннее {max_chars} символов!")
+        tts = data.get('tts')
+        if tts is not None and not isinstance(tts, bool):
+            raise serializers.ValidationError("Поле tts должно быть логическим значением!")
+        return {'text': text, 'tts': tts}
+
+    def to_representation(self, value):
+        return value
+
+
+class BatchTranslateSerializer(serializers.Serializer):
+    texts = serializers.ListField(child=BatchItemField(), allow_empty=False)
+    tts = serializers.BooleanField(default=False)
+    delivery = serializers.ChoiceField(choices=(BASE64, URL), default=BASE64)
+
+    @staticmethod
+    def validate_texts(value):
+        max_items = get_setting('BATCH_MAX_ITEMS')
+        if len(value) > max_items:
+            raise serializers.ValidationError(f"Не больше {max_items} текстов за один запрос!")
+        return value
+
+
+class TTSAudioQuerySerializer(serializers.Serializer):
+    lezgin_text = serializers.CharField(max_length=1000)
+    speaking_rate = serializers.FloatField(default=SPEAKING_RATE, min_value=0.1, max_value=5)
+    noise_scale = serializers.FloatField(default=NOISE_SCALE, min_value=0, max_value=1)
+    add_pauses = serializers.BooleanField(default=ADD_PAUSES)
+    audio_format = serializers.ChoiceField(choices=tuple(FORMATS), required=False)
+
+
+class TTSJobSerializer(serializers.ModelSerializer):
+    status_url = serializers.SerializerMethodField()
+    audio_url = serializers.SerializerMethodField()
+    class Meta:
+        model = TTSJob
+        fields = (
+            'id', 'lezgin_text', 'speaking_rate', 'noise_scale', 'add_pauses', 'status',
+            'error', 'created_at', 'finished_at', 'expires_at', 'status_url', 'audio_url'
+        )
+        read_only_fields = ('status', 'error', 'created_at', 'finished_at', 'expires_at')
+
+    def _absolute_url(self, name, obj):
+        url = reverse(name, args=[obj.pk])
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def get_status_url(self, obj):
+        return self._absolute_url('translator:tts-job-detail', obj)
+
+    def get_audio_url(self, obj):
+        if obj.status != TTSJob.DONE:
+            return None
+        return self._absolute_url('translator:tts-job-audio', obj)
+
+    @staticmethod
+    def validate_lezgin_text(value):
+        if not value.strip():
+            raise serializers.ValidationError("Текст для озвучки не может быть пустым!")
+        return value.strip()
+
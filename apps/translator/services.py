@@ -0,0 +1,644 @@
+import asyncio
+import os
+import re
+import textwrap
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from urllib.parse import urlsplit
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.files.storage import default_storage
+from gradio_client.exceptions import AppError
+
+from .cache import get_audio_cache, get_translation_cache, TranslationCache
+from .audio import chunk_spans, concatenate
+from .backends import discard_download, download_path, get_backend, is_download
+from .clients import get_pool, TRANSLATOR, TTS
+from .coalesce import get_single_flight
+from .conf import get_setting
+from .fallback import fallback_translate
+from .language import is_lezgian
+from .memory import FALLBACK, INPUT, MODEL, lookup
+from .metrics import propagate, record, timed
+from .resilience import BackendTimeout, backend_option, get_breaker
+from .warmup import check_warm
+
+SPEAKING_RATE = 1
+NOISE_SCALE = 0
+ADD_PAUSES = True
+
+SENTENCE_END_RE = re.compile(r'(?<=[.!?…])\s+')
+CLAUSE_END_RE = re.compile(r'(?<=[,;:])\s+|\s+(?=[—–]\s)')
+
+
+def _audio_key(cache, lezgin_text, speaking_rate, noise_scale, add_pauses):
+    return cache.make_key(
+        get_setting('BACKENDS')[TTS],
+        get_setting('TTS_SPACE'),
+        lezgin_text,
+        speaking_rate,
+        noise_scale,
+        add_pauses
+    )
+
+
+def _first_result(backend, jobs, timeout):
+    # Returns the first successful result among the jobs; cancels the rest.
+    pending = {job.future: job for job in jobs}
+    deadline = time.monotonic() + timeout if timeout else None
+    error = None
+    try:
+        while pending:
+            remaining = max(deadline - time.monotonic(), 0) if deadline else None
+            done, _ = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            if not done:
+                raise BackendTimeout(backend, timeout)
+            for future in done:
+                del pending[future]
+                if future.exception() is None:
+                    return future.result()
+                error = future.exception()
+        raise error
+    finally:
+        for job in pending.values():
+            job.cancel()
+
+
+def _call_once(backend, submit):
+    timeout = backend_option('TIMEOUTS', backend)
+    hedge_delay = backend_option('HEDGE_DELAYS', backend)
+    pool = get_pool()
+    with pool.client(backend) as client, timed('remote', backend):
+        job = submit(client)
+        if not hedge_delay or (timeout and hedge_delay >= timeout):
+            return _first_result(backend, [job], timeout)
+        wait([job.future], timeout=hedge_delay)
+        if job.future.done():
+            return job.result()
+        # Slow call: hedge with a second request on another pooled client.
+        with pool.client(backend) as hedge_client:
+            return _first_result(
+                backend,
+                [job, submit(hedge_client)],
+                timeout - hedge_delay if timeout else None
+            )
+
+
+def call_backend(backend, submit):
+    # submit(client) starts one remote job. Calls fail fast while the backend's
+    # circuit is open; AppError is an answer from a healthy Space and is not retried.
+    check_warm(backend)
+    breaker = get_breaker(backend)
+    retries = backend_option('RETRIES', backend) or 0
+    for attempt in range(retries + 1):
+        breaker.before_call()
+        try:
+            result = _call_once(backend, submit)
+        except AppError:
+            breaker.record_success()
+            raise
+        except Exception:
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            time.sleep(get_setting('RETRY_BACKOFF') * (attempt + 1))
+        else:
+            breaker.record_success()
+            return result
+
+
+def _remote_translate(russian_text, cache):
+    backend = get_backend(TRANSLATOR)
+    lezgin_text = call_backend(TRANSLATOR, lambda client: backend.submit(client, russian_text))
+
+    if cache is not None and lezgin_text:
+        cache.set(russian_text, lezgin_text)
+    return lezgin_text
+
+
+def translate(russian_text):
+    cache = get_translation_cache()
+    if cache is not None:
+        with timed('cache', TRANSLATOR):
+            cached = cache.get(russian_text)
+        if cached is not None:
+            return cached
+
+    return get_single_flight().do(
+        (TRANSLATOR, TranslationCache.normalize(russian_text)),
+        lambda: _remote_translate(russian_text, cache),
+        recheck=(lambda: cache.get(russian_text)) if cache is not None else None
+    )
+
+
+def _remote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, cache, key):
+    backend = get_backend(TTS)
+    audio_path = call_backend(TTS, lambda client: backend.submit(
+        client,
+        lezgin_text,
+        speaking_rate,
+        noise_scale,
+        add_pauses
+    ))
+
+    if cache is not None:
+        path = cache.put_file(key, audio_path, move=is_download(audio_path))
+        discard_download(audio_path)
+        return path
+    return audio_path
+
+
+def synthesize(lezgin_text, speaking_rate=SPEAKING_RATE, noise_scale=NOISE_SCALE, add_pauses=ADD_PAUSES):
+    cache = get_audio_cache()
+    if cache is None:
+        # Without the cache every caller owns, and later discards, its own file.
+        return _remote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, None, None)
+
+    key = _audio_key(cache, lezgin_text, speaking_rate, noise_scale, add_pauses)
+    with timed('cache', TTS):
+        cached_path = cache.get(key)
+    if cached_path is not None:
+        return cached_path
+
+    return get_single_flight().do(
+        (TTS, lezgin_text, speaking_rate, noise_scale, add_pauses),
+        lambda: _remote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, cache, key),
+        recheck=lambda: cache.get(key)
+    )
+
+
+def fetch_recording(url):
+    with timed('recording'):
+        return _fetch_recording(url)
+
+
+def _fetch_recording(url):
+    suffix = os.path.splitext(urlsplit(url).path)[1].lower() or '.wav'
+    cache = get_audio_cache()
+    if cache is not None:
+        key = cache.make_key('recording', url)
+        cached_path = cache.get(key, suffix)
+        if cached_path is not None:
+            return cached_path
+    response = httpx.get(url, timeout=get_setting('MEMORY_RECORDING_TIMEOUT'), follow_redirects=True)
+    response.raise_for_status()
+    if cache is not None:
+        return cache.put(key, response.content, suffix)
+    # Stored like a backend download, so discard_download() cleans it up.
+    path = download_path('recording' + suffix)
+    with open(path, 'wb') as f:
+        f.write(response.content)
+    return path
+
+
+def local_recording(url):
+    # Audio generated by backfill_tts_audio lives in our own media storage.
+    if not settings.MEDIA_URL or not url.startswith(settings.MEDIA_URL):
+        return None
+    name = url[len(settings.MEDIA_URL):]
+    try:
+        return default_storage.path(name) if default_storage.exists(name) else None
+    except NotImplementedError:
+        return None
+
+
+def lookup_translation(russian_text):
+    # Returns (lezgin_text, source, recording_url, chunks, score). Curated
+    # translations from the translation memory skip the remote translator;
+    # score is their match score, 1.0 for an exact match and None otherwise.
+    # Long texts are translated in chunks; chunks is then a list of
+    # (russian, lezgin) pairs.
+    if is_lezgian(russian_text):
+        return _untranslated(russian_text)
+    if get_setting('MEMORY_ENABLED'):
+        with timed('memory'):
+            entry = lookup(russian_text)
+        if entry is not None:
+            return entry.translation, entry.source, entry.audio, None, entry.score
+    chunks = split_chunks(russian_text, get_setting('CHUNK_MAX_CHARS'))
+    if len(chunks) < 2:
+        lezgin_text, source = translate_or_fallback(russian_text)
+        return lezgin_text, source, '', None, None
+    results = map_ordered(translate_or_fallback, chunks, get_setting('CHUNK_PARALLELISM'))
+    translations = [lezgin_text for lezgin_text, _ in results]
+    source = FALLBACK if any(source == FALLBACK for _, source in results) else MODEL
+    return ' '.join(translations), source, '', list(zip(chunks, translations)), None
+
+
+def _untranslated(lezgin_text):
+    # Text that is already Lezgian goes straight to TTS, chunked like a translation.
+    chunks = split_chunks(lezgin_text, get_setting('CHUNK_MAX_CHARS'))
+    if len(chunks) < 2:
+        return lezgin_text, INPUT, '', None, None
+    return lezgin_text, INPUT, '', [(chunk, chunk) for chunk in chunks], None
+
+
+def translate_or_fallback(russian_text):
+    # While the translator Space fails, known words and phrases from the
+    # dictionary and phrasebook give a degraded translation instead of an error.
+    try:
+        return translate(russian_text), MODEL
+    except Exception:
+        lezgin_text = fallback_translate(russian_text)
+        if lezgin_text is None:
+            raise
+        return lezgin_text, FALLBACK
+
+
+def speak(lezgin_text, recording_url=''):
+    # Pre-recorded audio wins over synthesis; a broken link falls back to TTS.
+    local_path = local_recording(recording_url)
+    if local_path is not None:
+        return local_path
+    if recording_url.startswith(('http://', 'https://')):
+        try:
+            return fetch_recording(recording_url)
+        except (httpx.HTTPError, OSError):
+            pass
+    return synthesize(lezgin_text)
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=get_setting('BATCH_MAX_WORKERS'),
+                    thread_name_prefix='translator-batch'
+                )
+    return _executor
+
+
+def map_ordered(fn, items, parallelism):
+    # Runs fn over items on the shared executor, at most `parallelism` at a
+    # time, and returns the results in input order. With a parallelism of 1
+    # the items run right here, which is what code already running on the
+    # executor must use: waiting on the same pool from inside it can deadlock.
+    if not parallelism or parallelism <= 1:
+        return [fn(item) for item in items]
+    executor = get_executor()
+    futures, results = [], []
+    try:
+        for index, item in enumerate(items):
+            if index >= parallelism:
+                results.append(futures[index - parallelism].result())
+            futures.append(executor.submit(propagate(fn), item))
+        results.extend(future.result() for future in futures[len(results):])
+    finally:
+        for future in futures:
+            future.cancel()
+    return results
+
+
+def _store_chunk_audio(audio_paths):
+    cache = get_audio_cache()
+    if cache is not None:
+        key = cache.make_key('chunks', *map(os.path.abspath, audio_paths))
+        cached_path = cache.get(key)
+        if cached_path is not None:
+            return cached_path
+    with timed('concatenate'):
+        data = concatenate(audio_paths)
+    if cache is not None:
+        return cache.put(key, data)
+    path = download_path('chunks.wav')
+    with open(path, 'wb') as f:
+        f.write(data)
+    return path
+
+
+def speak_chunks(lezgin_texts, parallelism=None):
+    # Synthesizes chunks in parallel and joins them into one WAV. Returns the
+    # path and the (start, end) second of every chunk in it.
+    if parallelism is None:
+        parallelism = get_setting('CHUNK_PARALLELISM')
+    audio_paths = map_ordered(synthesize, lezgin_texts, parallelism)
+    try:
+        return _store_chunk_audio(audio_paths), chunk_spans(audio_paths)
+    finally:
+        for audio_path in audio_paths:
+            discard_download(audio_path)
+
+
+def _translate_item(russian_text, with_tts):
+    # Items run on the shared executor, so a long item's chunks are translated
+    # and synthesized one after another instead of on the same pool.
+    chunks = split_chunks(russian_text, get_setting('CHUNK_MAX_CHARS')) or [russian_text]
+    if is_lezgian(russian_text):
+        lezgin_text, translations = russian_text, chunks
+    else:
+        translations = map_ordered(translate, chunks, 1)
+        lezgin_text = ' '.join(translations)
+    if not with_tts:
+        return lezgin_text, None
+    if len(translations) < 2:
+        return lezgin_text, synthesize(lezgin_text)
+    return lezgin_text, speak_chunks(translations, parallelism=1)[0]
+
+
+def translate_many(items):
+    # items are (russian_text, with_tts) pairs; identical texts are translated once
+    # and synthesized once if any occurrence asked for audio.
+    unique = {}
+    for russian_text, with_tts in items:
+        key = TranslationCache.normalize(russian_text)
+        unique[key] = unique.get(key, False) or with_tts
+
+    executor = get_executor()
+    futures = {
+        key: executor.submit(propagate(_translate_item), key, with_tts)
+        for key, with_tts in unique.items()
+    }
+
+    results = []
+    for russian_text, with_tts in items:
+        future = futures[TranslationCache.normalize(russian_text)]
+        try:
+            lezgin_text, audio_path = future.result()
+        except Exception as e:
+            results.append((None, None, e))
+        else:
+            results.append((lezgin_text, audio_path if with_tts else None, None))
+    return results, len(unique)
+
+
+def split_sentences(text):
+    return [sentence for sentence in SENTENCE_END_RE.split(text.strip()) if sentence]
+
+
+def _chunk_pieces(text, max_chars):
+    for sentence in split_sentences(text):
+        if len(sentence) <= max_chars:
+            yield sentence
+            continue
+        for clause in CLAUSE_END_RE.split(sentence):
+            if len(clause) <= max_chars:
+                yield clause
+            else:
+                yield from textwrap.wrap(clause, max_chars, break_on_hyphens=False)
+
+
+def split_chunks(text, max_chars):
+    # Packs whole sentences into chunks of at most max_chars; longer sentences
+    # are split at clause boundaries, then between words.
+    if not max_chars or len(text) <= max_chars:
+        return [text] if text.strip() else []
+    chunks = []
+    for piece in _chunk_pieces(text, max_chars):
+        if chunks and len(chunks[-1]) + 1 + len(piece) <= max_chars:
+            chunks[-1] += ' ' + piece
+        else:
+            chunks.append(piece)
+    return chunks
+
+
+def translate_sentences(russian_text):
+    # Yields (sentence, lezgin_text, audio_path) in order. Sentence k+1 is
+    # translated on the executor while sentence k is synthesized here.
+    sentences = split_sentences(russian_text)
+    if not sentences:
+        return
+    if is_lezgian(russian_text):
+        for sentence in sentences:
+            yield sentence, sentence, synthesize(sentence)
+        return
+    executor = get_executor()
+    translation = executor.submit(propagate(translate), sentences[0])
+    try:
+        for index, sentence in enumerate(sentences):
+            lezgin_text = translation.result()
+            if index + 1 < len(sentences):
+                translation = executor.submit(propagate(translate), sentences[index + 1])
+            yield sentence, lezgin_text, synthesize(lezgin_text)
+    finally:
+        translation.cancel()
+
+
+async def await_job(job):
+    try:
+        return await asyncio.wrap_future(job.future)
+    except asyncio.CancelledError:
+        job.cancel()
+        raise
+
+
+async def _afirst_result(backend, tasks, timeout):
+    pending = set(tasks)
+    deadline = time.monotonic() + timeout if timeout else None
+    error = None
+    while pending:
+        remaining = max(deadline - time.monotonic(), 0) if deadline else None
+        done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+        if not done:
+            raise BackendTimeout(backend, timeout)
+        for task in done:
+            if task.exception() is None:
+                return task.result()
+            error = task.exception()
+    raise error
+
+
+async def _acall_once(backend, submit):
+    timeout = backend_option('TIMEOUTS', backend)
+    hedge_delay = backend_option('HEDGE_DELAYS', backend)
+    pool = get_pool()
+    tasks = []
+    try:
+        async with pool.aclient(backend) as client:
+            started = time.perf_counter()
+            tasks.append(asyncio.ensure_future(await_job(submit(client))))
+            if not hedge_delay or (timeout and hedge_delay >= timeout):
+                return await _afirst_result(backend, tasks, timeout)
+            await asyncio.wait(tasks, timeout=hedge_delay)
+            if tasks[0].done():
+                return tasks[0].result()
+            async with pool.aclient(backend) as hedge_client:
+                tasks.append(asyncio.ensure_future(await_job(submit(hedge_client))))
+                return await _afirst_result(backend, tasks, timeout - hedge_delay if timeout else None)
+    finally:
+        if tasks:
+            record('remote', time.perf_counter() - started, backend)
+        # Cancelling the tasks cancels their remote jobs (see await_job).
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def acall_backend(backend, submit):
+    await sync_to_async(check_warm, thread_sensitive=False)(backend)
+    breaker = get_breaker(backend)
+    retries = backend_option('RETRIES', backend) or 0
+    for attempt in range(retries + 1):
+        breaker.before_call()
+        try:
+            result = await _acall_once(backend, submit)
+        except AppError:
+            breaker.record_success()
+            raise
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure()
+            if attempt == retries:
+                raise
+            await asyncio.sleep(get_setting('RETRY_BACKOFF') * (attempt + 1))
+        else:
+            breaker.record_success()
+            return result
+
+
+async def _aremote_translate(russian_text, cache):
+    backend = get_backend(TRANSLATOR)
+    lezgin_text = await acall_backend(TRANSLATOR, lambda client: backend.submit(client, russian_text))
+
+    if cache is not None and lezgin_text:
+        await sync_to_async(cache.set, thread_sensitive=False)(russian_text, lezgin_text)
+    return lezgin_text
+
+
+async def atranslate(russian_text):
+    cache = get_translation_cache()
+    if cache is not None:
+        with timed('cache', TRANSLATOR):
+            cached = await sync_to_async(cache.get, thread_sensitive=False)(russian_text)
+        if cached is not None:
+            return cached
+
+    return await get_single_flight().ado(
+        (TRANSLATOR, TranslationCache.normalize(russian_text)),
+        lambda: _aremote_translate(russian_text, cache),
+        recheck=(lambda: cache.get(russian_text)) if cache is not None else None
+    )
+
+
+async def _aremote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, cache, key):
+    backend = get_backend(TTS)
+    audio_path = await acall_backend(TTS, lambda client: backend.submit(
+        client,
+        lezgin_text,
+        speaking_rate,
+        noise_scale,
+        add_pauses
+    ))
+
+    if cache is not None:
+        path = await sync_to_async(cache.put_file, thread_sensitive=False)(key, audio_path, move=is_download(audio_path))
+        discard_download(audio_path)
+        return path
+    return audio_path
+
+
+async def asynthesize(lezgin_text, speaking_rate=SPEAKING_RATE, noise_scale=NOISE_SCALE, add_pauses=ADD_PAUSES):
+    cache = get_audio_cache()
+    if cache is None:
+        return await _aremote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, None, None)
+
+    key = _audio_key(cache, lezgin_text, speaking_rate, noise_scale, add_pauses)
+    with timed('cache', TTS):
+        cached_path = await sync_to_async(cache.get, thread_sensitive=False)(key)
+    if cached_path is not None:
+        return cached_path
+
+    return await get_single_flight().ado(
+        (TTS, lezgin_text, speaking_rate, noise_scale, add_pauses),
+        lambda: _aremote_synthesize(lezgin_text, speaking_rate, noise_scale, add_pauses, cache, key),
+        recheck=lambda: cache.get(key)
+    )
+
+
+async def amap_ordered(fn, items, parallelism):
+    semaphore = asyncio.Semaphore(max(parallelism or 1, 1))
+
+    async def run(item):
+        async with semaphore:
+            return await fn(item)
+
+    tasks = [asyncio.ensure_future(run(item)) for item in items]
+    try:
+        return await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def alookup_translation(russian_text):
+    if await sync_to_async(is_lezgian)(russian_text):
+        return _untranslated(russian_text)
+    if get_setting('MEMORY_ENABLED'):
+        with timed('memory'):
+            entry = await sync_to_async(lookup)(russian_text)
+        if entry is not None:
+            return entry.translation, entry.source, entry.audio, None, entry.score
+    chunks = split_chunks(russian_text, get_setting('CHUNK_MAX_CHARS'))
+    if len(chunks) < 2:
+        lezgin_text, source = await atranslate_or_fallback(russian_text)
+        return lezgin_text, source, '', None, None
+    results = await amap_ordered(atranslate_or_fallback, chunks, get_setting('CHUNK_PARALLELISM'))
+    translations = [lezgin_text for lezgin_text, _ in results]
+    source = FALLBACK if any(source == FALLBACK for _, source in results) else MODEL
+    return ' '.join(translations), source, '', list(zip(chunks, translations)), None
+
+
+async def atranslate_or_fallback(russian_text):
+    try:
+        return await atranslate(russian_text), MODEL
+    except Exception:
+        lezgin_text = await sync_to_async(fallback_translate)(russian_text)
+        if lezgin_text is None:
+            raise
+        return lezgin_text, FALLBACK
+
+
+async def aspeak_chunks(lezgin_texts):
+    audio_paths = await amap_ordered(asynthesize, lezgin_texts, get_setting('CHUNK_PARALLELISM'))
+    try:
+        return (
+            await sync_to_async(_store_chunk_audio, thread_sensitive=False)(audio_paths),
+            await sync_to_async(chunk_spans, thread_sensitive=False)(audio_paths)
+        )
+    finally:
+        for audio_path in audio_paths:
+            discard_download(audio_path)
+
+
+async def aspeak(lezgin_text, recording_url=''):
+    local_path = local_recording(recording_url)
+    if local_path is not None:
+        return local_path
+    if recording_url.startswith(('http://', 'https://')):
+        try:
+            return await sync_to_async(fetch_recording, thread_sensitive=False)(recording_url)
+        except (httpx.HTTPError, OSError):
+            pass
+    return await asynthesize(lezgin_text)
+
+
+async def atranslate_sentences(russian_text):
+    sentences = split_sentences(russian_text)
+    if not sentences:
+        return
+    if await sync_to_async(is_lezgian)(russian_text):
+        for sentence in sentences:
+            yield sentence, sentence, await asynthesize(sentence)
+        return
+    translation = asyncio.ensure_future(atranslate(sentences[0]))
+    try:
+        for index, sentence in enumerate(sentences):
+            lezgin_text = await translation
+            if index + 1 < len(sentences):
+                translation = asyncio.ensure_future(atranslate(sentences[index + 1]))
+            yield sentence, lezgin_text, await asynthesize(lezgin_text)
+    finally:
+        if not translation.done():
+            translation.cancel()
+            await asyncio.gather(translation, return_exceptions=True)
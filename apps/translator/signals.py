@@ -0,0 +1,42 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.dictionary.models import Translation as WordTranslation, Word
+from apps.library.models import Sentence
+from apps.phrasebook.models import Phrase, Translation as PhraseTranslation
+from . import fallback, language
+from .memory import refresh as refresh_memory
+from .models import MemoryEntry
+
+
+def refresh(source, source_ids):
+    # Indexes built from the memory are rebuilt in the background once the edit is committed.
+    refresh_memory(source, source_ids)
+    transaction.on_commit(fallback.start_rebuild)
+    transaction.on_commit(language.start_rebuild)
+
+
+@receiver([post_save, post_delete], sender=Word)
+def refresh_word(sender, instance, **kwargs):
+    refresh(MemoryEntry.DICTIONARY, [instance.id])
+
+
+@receiver([post_save, post_delete], sender=WordTranslation)
+def refresh_word_translation(sender, instance, **kwargs):
+    refresh(MemoryEntry.DICTIONARY, [instance.word_id])
+
+
+@receiver([post_save, post_delete], sender=Phrase)
+def refresh_phrase(sender, instance, **kwargs):
+    refresh(MemoryEntry.PHRASEBOOK, [instance.id])
+
+
+@receiver([post_save, post_delete], sender=PhraseTranslation)
+def refresh_phrase_translation(sender, instance, **kwargs):
+    refresh(MemoryEntry.PHRASEBOOK, [instance.phrase_id])
+
+
+@receiver([post_save, post_delete], sender=Sentence)
+def refresh_sentence(sender, instance, **kwargs):
+    refresh(MemoryEntry.LIBRARY, [instance.id])
@@ -1,8 +1,58 @@
 from django.contrib.auth import get_user_model
 from django.urls import reverse
-from rest_framework.test import APITestCase, APIClient
+from rest_framework.test import APITestCase, APIClient, APITransactionTestCase
 from rest_framework import status
+from gradio_client.exceptions import AppError
+from unittest import mock
+from urllib.parse import unquote
+from django.test import override_settings
+from django.utils import timezone
+import asyncio
+from django.core.cache import cache
+from apps.translator import audio, fallback, language, warmup
+from apps.translator.fallback import FallbackIndex, get_index, reset_index
+from apps.translator.live import LIVE_PATH, live_translation
+from apps.translator.language import LEZGIAN, RUSSIAN, LanguageDetector, get_detector, reset_detector
+from apps.translator.bulkhead import Bulkhead, BulkheadFull, get_bulkhead, reset_bulkhead
+from apps.translator.backends import FakeTTS, GradioTranslator, get_backend
+from apps.translator.cache import AudioCache, TranslationCache
+from apps.translator.clients import ClientPool, TRANSLATOR, TTS, get_pool, reset_pool
+from apps.translator.coalesce import SingleFlight
+from apps.translator.fake import FakeJob, FakeSpaceClient, write_wav
+from apps.translator.memory import lookup, normalize
+from apps.translator.metrics import Histogram, Metrics, reset_metrics
+from apps.translator.jobs import (
+    claim_next_job,
+    process_next_job,
+    purge_expired_jobs,
+    start_job,
+    submit_job,
+    sweep_expired_downloads,
+    wait_for_job
+)
+from apps.translator.models import MemoryEntry, TTSJob
+from apps.alphabet import models as alphabet
+from apps.dictionary import models as dictionary
+from apps.library import models as library
+from apps.phrasebook import models as phrasebook
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+import httpx
+import io
+from apps.translator.resilience import BackendUnavailable, CircuitBreaker, get_breaker, reset_breakers
+from apps.translator.warmup import COLD, STATE_KEY, WARM, KeepWarm, get_state, ping_backend, set_state
+from apps.translator.services import atranslate, map_ordered, speak_chunks, split_chunks, split_sentences, translate
+from concurrent.futures import Future, ThreadPoolExecutor
+import tempfile
+import threading
+import time
+import os
 import base64
+import hashlib
+import json
+import numpy as np
+import soundfile as sf
 
 User = get_user_model()
 
@@ -80,3 +130,1894 @@ class SerializerValidationTests(APITestCase):
             format='json'
         )
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class FakeClient:
+    instances = 0
+    calls = []
+    output_dir = tempfile.mkdtemp()
+
+    def __init__(self, src, **kwargs):
+        FakeClient.instances += 1
+        self.src = None
+        self.closed = False
+
+    def predict(self, *args, api_name=None, fn_index=None, **kwargs):
+        FakeClient.calls.append(api_name or fn_index)
+        if api_name == '/translate':
+            return f"lez:{kwargs['text']}"
+        path = os.path.join(self.output_dir, f'{len(FakeClient.calls)}.wav')
+        with open(path, 'wb') as f:
+            f.write(b'RIFF' + args[0].encode('utf-8') * 400)
+        return path
+
+    def submit(self, *args, api_name=None, fn_index=None, **kwargs):
+        future = Future()
+        future.set_result(self.predict(*args, api_name=api_name, fn_index=fn_index, **kwargs))
+        return FakeJob(future, threading.Event())
+
+    def close(self):
+        self.closed = True
+
+
+def make_fake_pool():
+    return ClientPool({TRANSLATOR: 'fake/translator', TTS: 'fake/tts'}, client_factory=FakeClient)
+
+
+class ClientPoolTests(APITestCase):
+    def setUp(self):
+        FakeClient.instances = 0
+        self.pool = ClientPool({TRANSLATOR: 'fake/translator'}, client_factory=FakeClient, max_idle=2)
+
+    def test_client_is_reused(self):
+        with self.pool.client(TRANSLATOR) as first:
+            pass
+        with self.pool.client(TRANSLATOR) as second:
+            pass
+        self.assertIs(first, second)
+        self.assertEqual(FakeClient.instances, 1)
+        stats = self.pool.stats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def test_concurrent_checkouts_get_distinct_clients(self):
+        with self.pool.client(TRANSLATOR) as first:
+            with self.pool.client(TRANSLATOR) as second:
+                self.assertIsNot(first, second)
+        self.assertEqual(self.pool.stats()['idle'][TRANSLATOR], 2)
+
+    def test_broken_client_is_replaced(self):
+        with self.assertRaises(ConnectionError):
+            with self.pool.client(TRANSLATOR) as broken:
+                raise ConnectionError
+        self.assertTrue(broken.closed)
+        with self.pool.client(TRANSLATOR) as replacement:
+            self.assertIsNot(broken, replacement)
+        self.assertEqual(self.pool.stats()['reconnects'], 1)
+
+    def test_app_error_keeps_client(self):
+        with self.assertRaises(AppError):
+            with self.pool.client(TRANSLATOR) as client:
+                raise AppError('bad input')
+        self.assertFalse(client.closed)
+        self.assertEqual(self.pool.stats()['idle'][TRANSLATOR], 1)
+
+    def test_warm_prefills_pool(self):
+        self.pool.warm()
+        with self.pool.client(TRANSLATOR):
+            pass
+        self.assertEqual(self.pool.stats()['misses'], 0)
+        self.assertEqual(self.pool.stats()['hits'], 1)
+
+
+class AudioCacheTests(APITestCase):
+    def setUp(self):
+        self.cache = AudioCache(tempfile.mkdtemp(), max_bytes=2500)
+
+    def test_key_depends_on_synthesis_parameters(self):
+        self.assertNotEqual(
+            self.cache.make_key('text', 1, 0, True),
+            self.cache.make_key('text', 1, 0, False)
+        )
+        self.assertEqual(self.cache.make_key('text', 1, 0, True), self.cache.make_key('text', 1, 0, True))
+
+    def test_put_and_get(self):
+        key = self.cache.make_key('text')
+        self.assertIsNone(self.cache.get(key))
+        path = self.cache.put(key, b'audio')
+        self.assertEqual(self.cache.get(key), path)
+        with open(path, 'rb') as f:
+            self.assertEqual(f.read(), b'audio')
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+
+    def test_least_recently_used_entries_are_evicted(self):
+        first, second, third = (self.cache.make_key(str(i)) for i in range(3))
+        self.cache.put(first, b'1' * 1000)
+        os.utime(self.cache.path(first), (1, 1))
+        self.cache.put(second, b'2' * 1000)
+        os.utime(self.cache.path(second), (2, 2))
+        self.cache.get(first)
+        self.cache.put(third, b'3' * 1000)
+        self.assertIsNotNone(self.cache.get(first))
+        self.assertIsNone(self.cache.get(second))
+        self.assertIsNotNone(self.cache.get(third))
+
+    def test_directory_is_scanned_only_when_total_passes_limit(self):
+        self.cache.put(self.cache.make_key('0'), b'0' * 1000)
+        with mock.patch.object(AudioCache, '_entries', wraps=self.cache._entries) as entries:
+            self.cache.put(self.cache.make_key('1'), b'1' * 1000)
+            self.cache.put(self.cache.make_key('1'), b'1' * 1200)
+            self.assertEqual(entries.call_count, 0)
+            self.cache.put(self.cache.make_key('2'), b'2' * 1000)
+            self.assertEqual(entries.call_count, 1)
+        self.assertEqual(self.cache._read_total(), 2200)
+
+
+class CachedTTSTests(APITestCase):
+    def setUp(self):
+        FakeClient.calls = []
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={'AUDIO_CACHE_DIR': tempfile.mkdtemp()})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_repeated_phrase_is_served_from_cache(self):
+        url = reverse('translator:tts')
+        first = self.client.post(url, {'lezgin_text': 'Салам'}, format='json')
+        second = self.client.post(url, {'lezgin_text': 'Салам'}, format='json')
+        self.assertEqual(first.status_code, status.HTTP_200_OK)
+        self.assertEqual(first.json()['audio'], second.json()['audio'])
+        self.assertEqual(FakeClient.calls, [0])
+
+        self.client.post(url, {'lezgin_text': 'Сагъ хьуй'}, format='json')
+        self.assertEqual(FakeClient.calls, [0, 0])
+
+
+class TranslationCacheTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.cache = TranslationCache(cache_alias='default', ttl=60, max_entries=2)
+
+    def test_normalized_text_shares_entry(self):
+        self.cache.set('Доброе  утро ', 'Экуьнин хийир')
+        self.assertEqual(self.cache.get(' Доброе утро'), 'Экуьнин хийир')
+        self.assertEqual(self.cache.stats()['l1_hits'], 1)
+
+    def test_shared_layer_fills_local_layer(self):
+        self.cache.set('Привет', 'Салам')
+        self.cache.clear()
+        self.assertEqual(self.cache.get('Привет'), 'Салам')
+        self.assertEqual(self.cache.get('Привет'), 'Салам')
+        stats = self.cache.stats()
+        self.assertEqual(stats['l2_hits'], 1)
+        self.assertEqual(stats['l1_hits'], 1)
+        self.assertEqual(stats['hit_ratio'], 1.0)
+
+    def test_local_layer_is_bounded(self):
+        for text in ('один', 'два', 'три'):
+            self.cache.set(text, text)
+        stats = self.cache.stats()
+        self.assertEqual(stats['l1_size'], 2)
+        self.assertEqual(stats['evictions'], 1)
+
+    def test_expired_entries_are_not_served(self):
+        expired = TranslationCache(cache_alias=None, ttl=0)
+        expired.set('Привет', 'Салам')
+        self.assertIsNone(expired.get('Привет'))
+
+    def test_identical_requests_skip_remote_model(self):
+        FakeClient.calls = []
+        with mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool()), \
+                mock.patch('apps.translator.services.get_translation_cache', return_value=self.cache), \
+                override_settings(TRANSLATOR={'AUDIO_CACHE_DIR': tempfile.mkdtemp()}):
+            url = reverse('translator:translator')
+            for _ in range(3):
+                response = self.client.post(url, {'text': 'Доброе утро'}, format='json')
+                self.assertEqual(response.json()['translation'], 'lez:Доброе утро')
+        self.assertEqual(FakeClient.calls, ['/translate', 0])
+
+
+class AudioDeliveryTests(APITestCase):
+    def setUp(self):
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={'AUDIO_CACHE_DIR': tempfile.mkdtemp()})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.tts_url = reverse('translator:tts')
+
+    def test_base64_contract_is_default(self):
+        response = self.client.post(self.tts_url, {'lezgin_text': 'Салам'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(base64.b64decode(response.json()['audio']).startswith(b'RIFF'))
+
+    def test_stream_delivery(self):
+        response = self.client.post(
+            reverse('translator:translator') + '?delivery=stream',
+            {'text': 'Привет'},
+            format='json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(unquote(response['X-Translation']), 'lez:Привет')
+        self.assertTrue(b''.join(response.streaming_content).startswith(b'RIFF'))
+
+    def test_accept_header_selects_stream(self):
+        response = self.client.post(self.tts_url, {'lezgin_text': 'Салам'}, format='json', HTTP_ACCEPT='audio/wav')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+
+    def test_range_request(self):
+        response = self.client.post(
+            self.tts_url + '?delivery=stream',
+            {'lezgin_text': 'Салам'},
+            format='json',
+            HTTP_RANGE='bytes=0-3'
+        )
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(b''.join(response.streaming_content), b'RIFF')
+        self.assertTrue(response['Content-Range'].startswith('bytes 0-3/'))
+
+    def test_url_delivery(self):
+        response = self.client.post(self.tts_url, {'lezgin_text': 'Салам', 'delivery': 'url'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('audio', response.json())
+        audio = self.client.get(response.json()['audio_url'], HTTP_RANGE='bytes=-4')
+        self.assertEqual(audio.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(len(b''.join(audio.streaming_content)), 4)
+
+    def test_invalid_audio_token(self):
+        response = self.client.get(reverse('translator:audio', args=['forged']))
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_unknown_delivery(self):
+        response = self.client.post(self.tts_url, {'lezgin_text': 'Салам', 'delivery': 'fax'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncViewTests(APITestCase):
+    def setUp(self):
+        self.pool = ClientPool({
+            TRANSLATOR: 'fake://translator?latency=0.01',
+            TTS: 'fake://tts?latency=0.01',
+        })
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TRANSLATION_CACHE_ENABLED': False
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    async def test_async_translate_and_tts(self):
+        response = await self.async_client.post(
+            reverse('translator:translator-async'),
+            {'text': 'Привет'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['translation'], 'lez:Привет')
+        self.assertTrue(base64.b64decode(response.json()['audio']).startswith(b'RIFF'))
+
+    async def test_async_tts_requires_text(self):
+        response = await self.async_client.post(
+            reverse('translator:tts-async'),
+            {},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_cancellation_cancels_remote_job(self):
+        slow_pool = ClientPool({TRANSLATOR: 'fake://translator?latency=5'})
+        with mock.patch('apps.translator.services.get_pool', return_value=slow_pool):
+            task = asyncio.ensure_future(atranslate('Привет'))
+            await asyncio.sleep(0.1)
+            with mock.patch.object(FakeJob, 'cancel', autospec=True, side_effect=FakeJob.cancel) as cancel:
+                task.cancel()
+                with self.assertRaises(asyncio.CancelledError):
+                    await task
+            cancel.assert_called_once()
+        self.assertEqual(slow_pool.stats()['idle'][TRANSLATOR], 1)
+
+
+class BatchTranslateTests(APITestCase):
+    def setUp(self):
+        FakeClient.calls = []
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TRANSLATION_CACHE_ENABLED': False,
+            'BATCH_MAX_ITEMS': 3
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('translator:batch')
+
+    def test_results_are_ordered_and_deduplicated(self):
+        response = self.client.post(self.url, {
+            'texts': ['Привет', {'text': 'Пока', 'tts': True}, 'Привет ']
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.json()['results']
+        self.assertEqual([item['translation'] for item in results], ['lez:Привет', 'lez:Пока', 'lez:Привет'])
+        self.assertEqual(response.json()['unique'], 2)
+        self.assertNotIn('audio', results[0])
+        self.assertIn('audio', results[1])
+        self.assertEqual(sorted(map(str, FakeClient.calls)), ['/translate', '/translate', '0'])
+
+    def test_per_item_errors(self):
+        def flaky_translate(text):
+            if text == 'Ошибка':
+                raise ValueError('model failed')
+            return f'lez:{text}'
+
+        with mock.patch('apps.translator.services.translate', side_effect=flaky_translate):
+            response = self.client.post(self.url, {'texts': ['Ошибка', 'Привет']}, format='json')
+        results = response.json()['results']
+        self.assertIn('model failed', results[0]['error'])
+        self.assertEqual(results[1]['translation'], 'lez:Привет')
+
+    def test_batch_size_limit(self):
+        response = self.client.post(self.url, {'texts': ['a', 'b', 'c', 'd']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.post(self.url, {'texts': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_long_items_are_limited_and_chunked(self):
+        with override_settings(TRANSLATOR={**settings.TRANSLATOR, 'MAX_INPUT_CHARS': 40, 'CHUNK_MAX_CHARS': 12}):
+            response = self.client.post(self.url, {'texts': ['Привет', 'а' * 41]}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            response = self.client.post(self.url, {'texts': ['Привет. Как дела? Пока.']}, format='json')
+        self.assertEqual(response.json()['results'][0]['translation'], 'lez:Привет. lez:Как дела? lez:Пока.')
+        self.assertEqual(FakeClient.calls, ['/translate'] * 3)
+
+
+class SingleFlightTests(APITestCase):
+    def run_concurrently(self, target, count):
+        threads = [threading.Thread(target=target) for _ in range(count)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def test_concurrent_identical_calls_share_one_call(self):
+        single_flight = SingleFlight()
+        calls = []
+        results = []
+
+        def remote():
+            calls.append(1)
+            time.sleep(0.2)
+            return 'Салам'
+
+        self.run_concurrently(lambda: results.append(single_flight.do('key', remote)), 5)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['Салам'] * 5)
+        self.assertEqual(single_flight.stats()['collapsed'], 4)
+        self.assertEqual(single_flight.stats()['inflight'], 0)
+
+    def test_errors_are_shared_and_not_cached(self):
+        single_flight = SingleFlight()
+        with self.assertRaises(ValueError):
+            single_flight.do('key', mock.Mock(side_effect=ValueError))
+        self.assertEqual(single_flight.do('key', lambda: 'ok'), 'ok')
+
+    def test_workers_collapse_through_lock_file(self):
+        lock_dir = tempfile.mkdtemp()
+        workers = [SingleFlight(lock_dir=lock_dir), SingleFlight(lock_dir=lock_dir)]
+        shared_cache = {}
+        calls = []
+
+        def remote():
+            calls.append(1)
+            time.sleep(0.2)
+            shared_cache['key'] = 'Салам'
+            return 'Салам'
+
+        def request(worker):
+            return lambda: worker.do('key', remote, recheck=lambda: shared_cache.get('key'))
+
+        threads = [threading.Thread(target=request(worker)) for worker in workers]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sum(w.stats()['collapsed_across_workers'] for w in workers), 1)
+
+    def test_unrelated_keys_do_not_share_a_lock(self):
+        lock_dir = tempfile.mkdtemp()
+        workers = [SingleFlight(lock_dir=lock_dir, lock_timeout=5) for _ in range(8)]
+        started = time.monotonic()
+
+        def request(index):
+            return lambda: workers[index].do(f'key{index}', lambda: time.sleep(0.3), recheck=lambda: None)
+
+        threads = [threading.Thread(target=request(index)) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_lock_files_are_bounded(self):
+        lock_dir = tempfile.mkdtemp()
+        worker = SingleFlight(lock_dir=lock_dir, stripes=16)
+        for index in range(100):
+            worker.do(f'key{index}', lambda: 'value', recheck=lambda: None)
+        self.assertLessEqual(len(os.listdir(lock_dir)), 16)
+
+    async def test_async_workers_recheck_after_the_lock(self):
+        lock_dir = tempfile.mkdtemp()
+        workers = [SingleFlight(lock_dir=lock_dir, poll_interval=0.01), SingleFlight(lock_dir=lock_dir, poll_interval=0.01)]
+        shared_cache = {}
+        calls = []
+
+        async def remote():
+            calls.append(1)
+            await asyncio.sleep(0.1)
+            shared_cache['key'] = 'Салам'
+            return 'Салам'
+
+        results = await asyncio.gather(*(
+            worker.ado('key', remote, recheck=lambda: shared_cache.get('key')) for worker in workers
+        ))
+        self.assertEqual(results, ['Салам', 'Салам'])
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(sum(w.stats()['collapsed_across_workers'] for w in workers), 1)
+
+    async def test_async_calls_share_one_call(self):
+        single_flight = SingleFlight()
+        calls = []
+
+        async def remote():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return 'Салам'
+
+        results = await asyncio.gather(*(single_flight.ado('key', remote) for _ in range(5)))
+        self.assertEqual(results, ['Салам'] * 5)
+        self.assertEqual(len(calls), 1)
+
+    async def test_cancelled_leader_hands_over(self):
+        single_flight = SingleFlight()
+
+        async def remote():
+            await asyncio.sleep(0.1)
+            return 'Салам'
+
+        leader = asyncio.ensure_future(single_flight.ado('key', remote))
+        await asyncio.sleep(0.01)
+        follower = asyncio.ensure_future(single_flight.ado('key', remote))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        self.assertEqual(await follower, 'Салам')
+
+
+class TTSJobTests(APITestCase):
+    def setUp(self):
+        FakeClient.calls = []
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TTS_JOB_MAX_ATTEMPTS': 2
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def submit(self, text='Салам'):
+        response = self.client.post(reverse('translator:tts-job-list'), {'lezgin_text': text}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        return response.json()
+
+    def test_submit_poll_and_download(self):
+        job = self.submit()
+        self.assertEqual(job['status'], TTSJob.PENDING)
+        self.assertIsNone(job['audio_url'])
+        self.assertEqual(self.client.get(job['status_url'] + 'audio/').status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(FakeClient.calls, [])
+
+        process_next_job()
+
+        job = self.client.get(job['status_url']).json()
+        self.assertEqual(job['status'], TTSJob.DONE)
+        audio = self.client.get(job['audio_url'])
+        self.assertEqual(audio.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(audio.streaming_content).startswith(b'RIFF'))
+
+    def test_job_is_claimed_once(self):
+        self.submit()
+        self.assertIsNotNone(claim_next_job())
+        self.assertIsNone(claim_next_job())
+
+    def test_failed_job_is_retried_then_marked_failed(self):
+        job = self.submit()
+        with mock.patch('apps.translator.jobs.synthesize', side_effect=ConnectionError('Space is down')):
+            self.assertEqual(process_next_job().status, TTSJob.PENDING)
+            self.assertEqual(process_next_job().status, TTSJob.FAILED)
+        job = self.client.get(job['status_url']).json()
+        self.assertEqual(job['error'], 'Space is down')
+
+    def test_expired_jobs_are_hidden_and_purged(self):
+        job = self.submit()
+        TTSJob.objects.update(expires_at=timezone.now())
+        self.assertEqual(self.client.get(job['status_url']).status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIsNone(claim_next_job())
+        self.assertEqual(purge_expired_jobs(), 1)
+
+    def test_empty_text(self):
+        response = self.client.post(reverse('translator:tts-job-list'), {'lezgin_text': ' '}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+
+class ResilienceTests(APITestCase):
+    def setUp(self):
+        reset_breakers()
+        self.addCleanup(reset_breakers)
+
+    def use_backends(self, translator_src, **settings):
+        pool = ClientPool({TRANSLATOR: translator_src, TTS: 'fake://tts'})
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'TRANSLATION_CACHE_ENABLED': False,
+            'RETRY_BACKOFF': 0,
+            **settings
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        return pool
+
+    def test_breaker_opens_and_recovers(self):
+        now = [0]
+        breaker = CircuitBreaker('translator', failure_threshold=2, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        with self.assertRaises(BackendUnavailable):
+            breaker.before_call()
+
+        now[0] = 10
+        breaker.before_call()
+        with self.assertRaises(BackendUnavailable):
+            breaker.before_call()
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        now = [0]
+        breaker = CircuitBreaker('tts', failure_threshold=1, reset_timeout=10, clock=lambda: now[0])
+        breaker.record_failure()
+        now[0] = 10
+        breaker.before_call()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(breaker.stats()['opened'], 2)
+
+    def test_open_circuit_fails_fast(self):
+        pool = self.use_backends(
+            'fake://translator?error_rate=1',
+            RETRIES={}, BREAKER_FAILURE_THRESHOLD=2
+        )
+        for _ in range(2):
+            response = self.client.post(reverse('translator:batch'), {'texts': ['Привет']}, format='json')
+            self.assertIn('Injected failure', response.json()['results'][0]['error'])
+
+        response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['code'], 'backend_unavailable')
+        self.assertEqual(response.json()['backend'], TRANSLATOR)
+        self.assertIn('Retry-After', response)
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def test_timeout_returns_distinct_code(self):
+        self.use_backends('fake://translator?latency=5', TIMEOUTS={TRANSLATOR: 0.05}, RETRIES={})
+        started = time.monotonic()
+        response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.status_code, status.HTTP_504_GATEWAY_TIMEOUT)
+        self.assertEqual(response.json()['code'], 'backend_timeout')
+
+    def test_transient_failure_is_retried(self):
+        self.use_backends('fake://translator?fail_first=1', RETRIES={TRANSLATOR: 1})
+        self.assertEqual(translate('Привет'), 'lez:Привет')
+        self.assertEqual(get_breaker(TRANSLATOR).stats()['failures'], 1)
+
+    def test_app_error_does_not_trip_breaker(self):
+        self.use_backends('fake://translator', BREAKER_FAILURE_THRESHOLD=1)
+        with mock.patch('apps.translator.fake.FakeSpaceClient._run', side_effect=AppError('bad input')):
+            with self.assertRaises(AppError):
+                translate('Привет')
+        self.assertEqual(get_breaker(TRANSLATOR).state, CircuitBreaker.CLOSED)
+
+    def test_hedged_request_beats_slow_call(self):
+        pool = self.use_backends('fake://translator?latency=0.05', HEDGE_DELAYS={TRANSLATOR: 0.01})
+        with mock.patch('apps.translator.fake.FakeSpaceClient.submit', autospec=True,
+                        side_effect=self.first_call_stalls()) as submit:
+            started = time.monotonic()
+            self.assertEqual(translate('Привет'), 'lez:Привет')
+            self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(submit.call_count, 2)
+        self.assertEqual(pool.stats()['idle'][TRANSLATOR], 2)
+
+    async def test_async_hedged_request_beats_slow_call(self):
+        self.use_backends('fake://translator?latency=0.05', HEDGE_DELAYS={TRANSLATOR: 0.01})
+        with mock.patch('apps.translator.fake.FakeSpaceClient.submit', autospec=True,
+                        side_effect=self.first_call_stalls()) as submit:
+            self.assertEqual(await atranslate('Привет'), 'lez:Привет')
+        self.assertEqual(submit.call_count, 2)
+
+    @staticmethod
+    def first_call_stalls():
+        submit = FakeSpaceClient.submit
+
+        def side_effect(client, *args, **kwargs):
+            if not hasattr(side_effect, 'stalled'):
+                side_effect.stalled = True
+                client.latency = 5
+            else:
+                client.latency = 0.01
+            return submit(client, *args, **kwargs)
+        return side_effect
+
+
+def parse_events(body):
+    events = []
+    for block in body.decode('utf-8').strip().split('\n\n'):
+        event, data = block.split('\n')
+        events.append((event[len('event: '):], json.loads(data[len('data: '):])))
+    return events
+
+
+class SentenceStreamTests(APITestCase):
+    def setUp(self):
+        reset_breakers()
+        self.pool = ClientPool({
+            TRANSLATOR: 'fake://translator?latency=0.15',
+            TTS: 'fake://tts?latency=0.15',
+        })
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={'TRANSLATION_CACHE_ENABLED': False})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_split_sentences(self):
+        self.assertEqual(
+            split_sentences(' Привет! Как дела? Хорошо… Пока '),
+            ['Привет!', 'Как дела?', 'Хорошо…', 'Пока']
+        )
+
+    def test_sentences_are_pipelined(self):
+        started = time.monotonic()
+        response = self.client.post(
+            reverse('translator:translator'),
+            {'text': 'Привет. Как дела? Пока!'},
+            format='json',
+            HTTP_ACCEPT='text/event-stream'
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        chunks = iter(response.streaming_content)
+        first = next(chunks)
+        first_event_at = time.monotonic() - started
+        events = parse_events(first + b''.join(chunks))
+        elapsed = time.monotonic() - started
+
+        self.assertEqual([event for event, _ in events], ['sentence', 'sentence', 'sentence', 'done'])
+        self.assertEqual(events[1][1]['translation'], 'lez:Как дела?')
+        self.assertTrue(base64.b64decode(events[0][1]['audio']).startswith(b'RIFF'))
+        self.assertEqual(events[-1][1]['translation'], 'lez:Привет. lez:Как дела? lez:Пока!')
+        self.assertLess(first_event_at, elapsed * 0.75)
+        # Sequential translate+synthesize would take 6 calls of 0.15 s.
+        self.assertLess(elapsed, 0.8)
+
+    def test_error_event(self):
+        with mock.patch('apps.translator.services.translate', side_effect=[
+            'lez:Привет.', BackendUnavailable(TRANSLATOR, 30)
+        ]):
+            response = self.client.post(
+                reverse('translator:translator') + '?delivery=sse',
+                {'text': 'Привет. Пока.'},
+                format='json'
+            )
+            events = parse_events(b''.join(response.streaming_content))
+        self.assertEqual([event for event, _ in events], ['sentence', 'error'])
+        self.assertEqual(events[1][1]['code'], 'backend_unavailable')
+        self.assertEqual(events[1][1]['index'], 1)
+
+    async def test_sync_stream_is_not_buffered_under_asgi(self):
+        started = time.monotonic()
+        response = await self.async_client.post(
+            reverse('translator:translator'),
+            {'text': 'Привет. Как дела? Пока!', 'delivery': 'sse'},
+            content_type='application/json'
+        )
+        self.assertTrue(response.is_async)
+        chunks = aiter(response.streaming_content)
+        first = await anext(chunks)
+        first_event_at = time.monotonic() - started
+        events = parse_events(first + b''.join([chunk async for chunk in chunks]))
+        self.assertEqual([event for event, _ in events], ['sentence', 'sentence', 'sentence', 'done'])
+        self.assertLess(first_event_at, (time.monotonic() - started) * 0.75)
+
+    async def test_async_stream(self):
+        response = await self.async_client.post(
+            reverse('translator:translator-async'),
+            {'text': 'Привет. Пока.', 'delivery': 'sse'},
+            content_type='application/json'
+        )
+        events = parse_events(b''.join([chunk async for chunk in response.streaming_content]))
+        self.assertEqual([event for event, _ in events], ['sentence', 'sentence', 'done'])
+        self.assertEqual(events[0][1]['translation'], 'lez:Привет.')
+
+
+class AudioEncodingTests(APITestCase):
+    def setUp(self):
+        reset_breakers()
+        pool = ClientPool({TRANSLATOR: 'fake://translator', TTS: 'fake://tts'})
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TRANSLATION_CACHE_ENABLED': False
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_negotiate_format(self):
+        self.assertEqual(audio.negotiate_format(''), audio.WAV)
+        self.assertEqual(audio.negotiate_format('application/json'), audio.WAV)
+        self.assertEqual(audio.negotiate_format('audio/ogg;q=0.5, audio/mpeg;q=0.8, audio/x-unknown'), 'audio/mpeg')
+        self.assertEqual(audio.negotiate_format('application/json, audio/flac'), 'audio/flac')
+
+    def test_process_downmixes_trims_and_resamples(self):
+        rate = 22050
+        tone = np.sin(np.arange(rate) * 2 * np.pi * 300 / rate).astype(np.float32)
+        silence = np.zeros(rate // 2, dtype=np.float32)
+        stereo = np.stack([np.concatenate([silence, tone, silence])] * 2, axis=1)
+
+        samples, processed_rate = audio.process(stereo, rate, target_rate=16000)
+
+        self.assertEqual(samples.ndim, 1)
+        self.assertEqual(processed_rate, 16000)
+        self.assertAlmostEqual(len(samples) / processed_rate, 1.1, delta=0.05)
+
+    def test_transcode_is_smaller_and_cached(self):
+        source = write_wav(os.path.join(tempfile.mkdtemp(), 'speech.wav'), 'Салам алейкум ' * 5)
+        ogg_path = audio.transcode(source, 'audio/ogg')
+        self.assertTrue(ogg_path.endswith('.ogg'))
+        self.assertLess(os.path.getsize(ogg_path), os.path.getsize(source) / 4)
+        self.assertEqual(sf.info(ogg_path).format, 'OGG')
+        self.assertEqual(audio.transcode(source, 'audio/ogg'), ogg_path)
+        self.assertEqual(audio.transcode(source, audio.WAV), source)
+
+    def test_opus_is_written_at_a_supported_rate(self):
+        source = write_wav(os.path.join(tempfile.mkdtemp(), 'speech.wav'), 'Салам', sample_rate=22050)
+        with override_settings(TRANSLATOR={**settings.TRANSLATOR, 'AUDIO_SAMPLE_RATE': None}):
+            opus_path = audio.transcode(source, 'audio/opus')
+        self.assertEqual(sf.info(opus_path).subtype, 'OPUS')
+        self.assertEqual(sf.info(opus_path).samplerate, 24000)
+
+    def test_stream_in_accepted_format(self):
+        response = self.client.post(
+            reverse('translator:tts'),
+            {'lezgin_text': 'Салам'},
+            format='json',
+            HTTP_ACCEPT='audio/mpeg, audio/wav;q=0.5'
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+
+    def test_base64_in_accepted_format(self):
+        response = self.client.post(
+            reverse('translator:translator'),
+            {'text': 'Привет'},
+            format='json',
+            HTTP_ACCEPT='application/json, audio/flac'
+        )
+        self.assertEqual(response.json()['audio_format'], 'audio/flac')
+        self.assertTrue(base64.b64decode(response.json()['audio']).startswith(b'fLaC'))
+
+    def test_audio_link_keeps_format(self):
+        response = self.client.post(
+            reverse('translator:tts') + '?delivery=url',
+            {'lezgin_text': 'Салам'},
+            format='json',
+            HTTP_ACCEPT='application/json, audio/opus'
+        )
+        self.assertEqual(response.json()['audio_format'], 'audio/ogg; codecs=opus')
+        audio_response = self.client.get(response.json()['audio_url'])
+        self.assertEqual(audio_response['Content-Type'], 'audio/ogg; codecs=opus')
+
+
+class TranslationMemoryTests(APITestCase):
+    def setUp(self):
+        FakeClient.calls = []
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=make_fake_pool())
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TRANSLATION_CACHE_ENABLED': False
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.word = dictionary.Word.objects.create(
+            text='Вода',
+            part_of_speech=dictionary.PartOfSpeech.objects.create(name='Существительное'),
+            category=dictionary.Category.objects.create(name='Природа')
+        )
+        self.word_translation = dictionary.Translation.objects.create(
+            text='Яд',
+            audio='https://cdn.example.com/yad.wav',
+            word=self.word,
+            origin=dictionary.Origin.objects.create(language='Лезгинский')
+        )
+        phrase = phrasebook.Phrase.objects.create(
+            text='Доброе утро',
+            category=phrasebook.Category.objects.create(name='Приветствия')
+        )
+        phrasebook.Translation.objects.create(text='Экуьн хийир', audio='', phrase=phrase)
+        library.Sentence.objects.create(
+            text='Ёжик шёл по лесу.',
+            translate='Кьуьгьуьр вацӀал физвай.',
+            audio='',
+            book=library.Book.objects.create(
+                title='Сказки',
+                author='Автор',
+                logo='',
+                category=library.Category.objects.create(name='Детям')
+            )
+        )
+
+    def recording(self):
+        path = write_wav(os.path.join(tempfile.mkdtemp(), 'yad.wav'), 'Яд')
+        with open(path, 'rb') as f:
+            return httpx.Response(200, content=f.read(), request=httpx.Request('GET', 'https://cdn.example.com/yad.wav'))
+
+    def test_normalize(self):
+        self.assertEqual(normalize('  ЁЖИК   шёл по лесу... '), 'ежик шел по лесу')
+
+    def test_signals_keep_memory_in_sync(self):
+        self.assertEqual(MemoryEntry.objects.count(), 3)
+        self.word_translation.text = 'Ятар'
+        self.word_translation.save()
+        self.assertEqual(lookup('вода').translation, 'Ятар')
+        self.word.delete()
+        self.assertIsNone(lookup('вода'))
+        self.assertEqual(MemoryEntry.objects.count(), 2)
+
+    def test_exact_and_fuzzy_lookup(self):
+        entry = lookup('ежик шел по лесу')
+        self.assertEqual((entry.source, entry.score), (MemoryEntry.LIBRARY, 1.0))
+        self.assertIsNone(lookup('Ёжик шёл по тёмному лесу'))
+        with override_settings(TRANSLATOR={'MEMORY_FUZZY_THRESHOLD': 0.8}):
+            entry = lookup('Ёжик шёл по тёмному лесу')
+            self.assertEqual(entry.source, MemoryEntry.LIBRARY)
+            self.assertLess(entry.score, 1)
+            self.assertIsNone(lookup('Ёжик не шёл по лесу'))
+            self.assertIsNone(lookup('Совсем другой текст'))
+
+    def test_fuzzy_match_is_reported(self):
+        with override_settings(TRANSLATOR={
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'TRANSLATION_CACHE_ENABLED': False,
+            'MEMORY_FUZZY_THRESHOLD': 0.8
+        }):
+            response = self.client.post(
+                reverse('translator:translator') + '?delivery=stream',
+                {'text': 'Ёжик шёл по тёмному лесу.'},
+                format='json'
+            )
+            self.assertEqual(response['X-Translation-Source'], MemoryEntry.LIBRARY)
+            self.assertEqual(response['X-Translation-Score'], '0.889')
+            response = self.client.post(reverse('translator:translator'), {'text': 'Вода'}, format='json')
+        self.assertEqual((response.json()['fuzzy'], response.json()['score']), (False, 1.0))
+
+    def test_texts_longer_than_the_column_are_not_matched(self):
+        long_text = 'Ёжик шёл по лесу. ' + 'Дальше был долгий и совсем другой рассказ. ' * 8
+        self.assertIsNone(lookup(long_text))
+        library.Sentence.objects.create(
+            text=long_text,
+            translate='Перевод',
+            audio='',
+            book=library.Book.objects.first()
+        )
+        self.assertEqual(MemoryEntry.objects.count(), 3)
+
+    def test_rebuild_command(self):
+        MemoryEntry.objects.all().delete()
+        out = io.StringIO()
+        call_command('rebuild_translation_memory', stdout=out)
+        self.assertIn('3 entries', out.getvalue())
+
+    def test_memory_hit_skips_remote_calls(self):
+        with mock.patch('apps.translator.services.httpx.get', return_value=self.recording()) as get:
+            response = self.client.post(reverse('translator:translator'), {'text': 'вода'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['translation'], 'Яд')
+        self.assertEqual(response.json()['source'], MemoryEntry.DICTIONARY)
+        self.assertTrue(base64.b64decode(response.json()['audio']).startswith(b'RIFF'))
+        get.assert_called_once()
+        self.assertEqual(FakeClient.calls, [])
+
+    def test_missing_recording_falls_back_to_tts(self):
+        response = self.client.post(
+            reverse('translator:translator') + '?delivery=stream',
+            {'text': 'Доброе утро'},
+            format='json'
+        )
+        self.assertEqual(response['X-Translation-Source'], MemoryEntry.PHRASEBOOK)
+        self.assertEqual(FakeClient.calls, [0])
+
+    def test_unknown_text_uses_model(self):
+        response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+        self.assertEqual(response.json()['source'], 'model')
+        self.assertEqual(FakeClient.calls, ['/translate', 0])
+
+    async def test_async_memory_hit(self):
+        with mock.patch('apps.translator.services.httpx.get', return_value=self.recording()):
+            response = await self.async_client.post(
+                reverse('translator:translator-async'),
+                {'text': 'Вода'},
+                content_type='application/json'
+            )
+        self.assertEqual(response.json()['source'], MemoryEntry.DICTIONARY)
+        self.assertEqual(FakeClient.calls, [])
+
+
+class BackfillAudioTests(APITestCase):
+    def setUp(self):
+        reset_breakers()
+        self.pool = ClientPool({TRANSLATOR: 'fake://translator', TTS: 'fake://tts'})
+        patcher = mock.patch('apps.translator.services.get_pool', return_value=self.pool)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        settings_override = override_settings(
+            MEDIA_ROOT=tempfile.mkdtemp(),
+            TRANSLATOR={'AUDIO_CACHE_DIR': None, 'TRANSLATION_CACHE_ENABLED': False}
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.letter = alphabet.Letter.objects.create(letter='Кь', audio='')
+        self.sentence = library.Sentence.objects.create(
+            text='Привет',
+            translate='Салам',
+            audio='',
+            book=library.Book.objects.create(
+                title='Сказки',
+                author='Автор',
+                logo='',
+                category=library.Category.objects.create(name='Детям')
+            )
+        )
+        self.recorded = alphabet.Letter.objects.create(letter='А', audio='https://cdn.example.com/a.mp3')
+
+    def backfill(self, *args):
+        out = io.StringIO()
+        call_command('backfill_tts_audio', *args, '--workers', '2', stdout=out)
+        return out.getvalue()
+
+    @staticmethod
+    def tts_calls():
+        return FakeSpaceClient.served.get('fake://tts', 0)
+
+    def test_backfill_is_idempotent(self):
+        output = self.backfill('alphabet', 'library')
+        self.assertIn('2 updated', output)
+
+        self.letter.refresh_from_db()
+        self.assertTrue(self.letter.audio.startswith('/media/tts/alphabet/'))
+        self.assertTrue(self.letter.audio.endswith('.mp3'))
+        self.assertTrue(os.path.exists(os.path.join(settings.MEDIA_ROOT, self.letter.audio[len('/media/'):])))
+        self.recorded.refresh_from_db()
+        self.assertEqual(self.recorded.audio, 'https://cdn.example.com/a.mp3')
+        self.assertEqual(MemoryEntry.objects.get(source=MemoryEntry.LIBRARY).audio,
+                         library.Sentence.objects.get().audio)
+
+        calls = self.tts_calls()
+        self.assertIn('0 rows checked', self.backfill())
+        self.assertEqual(self.tts_calls(), calls)
+
+    def test_edited_text_is_regenerated(self):
+        self.backfill('alphabet')
+        old_audio = alphabet.Letter.objects.get(pk=self.letter.pk).audio
+        alphabet.Letter.objects.filter(pk=self.letter.pk).update(letter='Къ')
+        self.assertIn('1 updated', self.backfill('alphabet'))
+        self.assertNotEqual(alphabet.Letter.objects.get(pk=self.letter.pk).audio, old_audio)
+
+    def test_force_synthesizes_stored_audio_again(self):
+        self.backfill('alphabet')
+        audio_url = alphabet.Letter.objects.get(pk=self.letter.pk).audio
+        calls = self.tts_calls()
+        self.assertIn('2 updated', self.backfill('alphabet', '--force'))
+        self.assertEqual(self.tts_calls(), calls + 2)
+        self.assertEqual(alphabet.Letter.objects.get(pk=self.letter.pk).audio, audio_url)
+
+    def test_dead_links_are_replaced(self):
+        with mock.patch('apps.translator.backfill.httpx.head', return_value=httpx.Response(404)):
+            self.backfill('alphabet', '--check-links')
+        self.recorded.refresh_from_db()
+        self.assertTrue(self.recorded.audio.startswith('/media/tts/alphabet/'))
+
+    def test_unknown_target(self):
+        with self.assertRaises(CommandError):
+            self.backfill('nowhere')
+
+    def test_backfilled_audio_answers_translation(self):
+        self.backfill('library')
+        response = self.client.post(
+            reverse('translator:translator') + '?delivery=stream',
+            {'text': 'Привет'},
+            format='json'
+        )
+        self.assertEqual(response['X-Translation-Source'], MemoryEntry.LIBRARY)
+        self.assertEqual(response['Content-Type'], 'audio/mpeg')
+
+
+class BackendTests(APITestCase):
+    fake_settings = {
+        'BACKENDS': {
+            TRANSLATOR: 'apps.translator.backends.FakeTranslator',
+            TTS: 'apps.translator.backends.FakeTTS',
+        },
+        'BACKEND_OPTIONS': {TTS: {'audio_seconds': 1.5}},
+        'AUDIO_CACHE_DIR': None,
+        'TRANSLATION_CACHE_ENABLED': False,
+        'MEMORY_ENABLED': False,
+    }
+
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+
+    def test_default_backend_is_gradio(self):
+        backend = get_backend(TRANSLATOR)
+        self.assertIsInstance(backend, GradioTranslator)
+        self.assertEqual(backend.source, 'stazizov/lezghian_translator_v1')
+
+    def test_configured_fake_backends_answer_offline(self):
+        with override_settings(TRANSLATOR=self.fake_settings):
+            self.assertIsInstance(get_backend(TTS), FakeTTS)
+            response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+            self.assertEqual(response.json()['translation'], 'lez:Привет')
+            self.assertEqual(get_pool().stats()['created'], 2)
+        audio_data = base64.b64decode(response.json()['audio'])
+        self.assertEqual(sf.info(io.BytesIO(audio_data)).duration, 1.5)
+
+    def test_loadtest_command(self):
+        out = io.StringIO()
+        call_command(
+            'translator_loadtest', 'app', 'async-tts',
+            '--requests', '6', '--concurrency', '3', '--latency', '0', '--audio-seconds', '0.2',
+            stdout=out
+        )
+        lines = out.getvalue().splitlines()
+        self.assertTrue(lines[-2].startswith('app'))
+        self.assertTrue(lines[-1].startswith('async-tts'))
+        self.assertTrue(all(line.endswith('errors 0') for line in lines[-2:]))
+
+
+class BulkheadTests(APITestCase):
+    def setUp(self):
+        reset_bulkhead()
+        self.addCleanup(reset_bulkhead)
+
+    def test_sync_callers_are_rejected_without_queueing(self):
+        bulkhead = Bulkhead(limit=1, queue_size=1, queue_timeout=5)
+        slot = bulkhead.acquire()
+        started = time.monotonic()
+        with self.assertRaises(BulkheadFull) as raised:
+            bulkhead.acquire()
+        self.assertLess(time.monotonic() - started, 0.1)
+        self.assertEqual(raised.exception.reason, 'no free slot')
+        bulkhead.release(slot)
+        stats = bulkhead.stats()
+        self.assertEqual((stats['admitted'], stats['queued'], stats['rejected']), (1, 0, 1))
+
+    async def test_async_waiter_gets_released_slot_and_overflow_is_rejected(self):
+        bulkhead = Bulkhead(limit=1, queue_size=1, queue_timeout=5)
+        slot = bulkhead.acquire()
+        waiter = asyncio.ensure_future(bulkhead.aacquire())
+        while bulkhead.stats()['queue_depth'] == 0:
+            await asyncio.sleep(0.005)
+        with self.assertRaises(BulkheadFull) as raised:
+            await bulkhead.aacquire()
+        self.assertEqual(raised.exception.reason, 'queue is full')
+
+        bulkhead.release(slot)
+        bulkhead.release(await asyncio.wait_for(waiter, 5))
+        stats = bulkhead.stats()
+        self.assertEqual((stats['active'], stats['queue_depth']), (0, 0))
+        self.assertEqual((stats['admitted'], stats['queued'], stats['rejected']), (2, 1, 1))
+        self.assertGreater(stats['wait_max'], 0)
+
+    def test_queue_timeout(self):
+        bulkhead = Bulkhead(limit=1, queue_size=1, queue_timeout=0.05)
+        bulkhead.acquire()
+        with self.assertRaises(BulkheadFull) as raised:
+            asyncio.run(bulkhead.aacquire())
+        self.assertEqual(raised.exception.reason, 'queue timeout')
+        self.assertEqual(bulkhead.stats()['timed_out'], 1)
+        self.assertEqual(bulkhead.stats()['queue_depth'], 0)
+
+    def test_lock_dir_shares_slots_between_processes(self):
+        lock_dir = tempfile.mkdtemp()
+        first = Bulkhead(limit=1, lock_dir=lock_dir)
+        second = Bulkhead(limit=1, lock_dir=lock_dir)
+        slot = first.acquire()
+        with self.assertRaises(BulkheadFull):
+            second.acquire()
+        self.assertEqual(second.stats()['host_active'], 1)
+        first.release(slot)
+        second.release(second.acquire())
+        self.assertEqual(second.stats()['host_active'], 0)
+
+    def test_slot_can_be_released_on_another_thread(self):
+        bulkhead = Bulkhead(limit=1, lock_dir=tempfile.mkdtemp())
+        slot = asyncio.run(bulkhead.aacquire())
+        releaser = threading.Thread(target=bulkhead.release, args=(slot,))
+        releaser.start()
+        releaser.join()
+        self.assertEqual(bulkhead.stats()['host_active'], 0)
+        bulkhead.release(bulkhead.acquire())
+
+    def test_overloaded_translator_answers_503(self):
+        with override_settings(TRANSLATOR={'BULKHEAD_LIMIT': 1, 'BULKHEAD_QUEUE_SIZE': 0, 'BULKHEAD_RETRY_AFTER': 3}):
+            slot = get_bulkhead().acquire()
+            try:
+                response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+            finally:
+                get_bulkhead().release(slot)
+            self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+            self.assertEqual(response.json()['code'], 'overloaded')
+            self.assertEqual(response['Retry-After'], '3')
+            self.assertEqual(get_bulkhead().stats()['rejected'], 1)
+
+    def test_disabled_without_limit(self):
+        with override_settings(TRANSLATOR={'BULKHEAD_LIMIT': None}):
+            self.assertIsNone(get_bulkhead())
+
+
+class MetricsTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        reset_metrics()
+        self.addCleanup(reset_pool)
+        self.addCleanup(reset_metrics)
+
+    def test_histogram_quantiles(self):
+        histogram = Histogram()
+        for seconds in [0.02] * 90 + [0.4] * 9 + [3]:
+            histogram.observe(seconds)
+        summary = histogram.summary()
+        self.assertEqual(summary['count'], 100)
+        self.assertTrue(0.01 <= summary['p50'] <= 0.025)
+        self.assertTrue(0.25 <= summary['p95'] <= 0.5)
+        self.assertTrue(0.25 <= summary['p99'] <= 0.5)
+
+    def test_server_timing_header_and_metrics_endpoint(self):
+        with override_settings(TRANSLATOR={**BackendTests.fake_settings, 'BACKEND_OPTIONS': {}}):
+            response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            stages = [entry.split(';')[0] for entry in response['Server-Timing'].split(', ')]
+            for stage in ['queue', 'translator-client', 'translator-remote', 'tts-remote', 'encode', 'total']:
+                self.assertIn(stage, stages)
+            self.assertIn('Server-Timing', response['Access-Control-Expose-Headers'])
+
+            url = reverse('translator:metrics')
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_401_UNAUTHORIZED)
+            self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+            text = self.client.get(url).content.decode()
+            self.assertIn('translator_stage_seconds_bucket{stage="remote",backend="tts",le="+Inf"} 1', text)
+            self.assertIn('translator_stage_quantile_seconds{stage="total",backend="",quantile="0.99"}', text)
+            stages = self.client.get(url, {'format': 'json'}).json()['stages']
+            remote = next(row for row in stages if row['stage'] == 'remote' and row['backend'] == 'translator')
+            self.assertEqual(remote['count'], 1)
+            self.assertIsNotNone(remote['p95'])
+
+    def test_worker_files_are_merged(self):
+        metrics_dir = tempfile.mkdtemp()
+        other = Metrics(metrics_dir)
+        other.observe('remote', 'tts', 0.3)
+        with mock.patch('apps.translator.metrics.os.getpid', return_value=-1):
+            other.flush(force=True)
+        metrics = Metrics(metrics_dir)
+        metrics.observe('remote', 'tts', 0.7)
+        metrics.flush(force=True)
+        self.assertEqual(metrics.snapshot()[('remote', 'tts')].count, 2)
+        self.assertEqual(len(os.listdir(metrics_dir)), 2)
+
+
+class DownloadCleanupTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+        self.download_dir = tempfile.mkdtemp()
+
+    def use_settings(self, **settings):
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'DOWNLOAD_DIR': self.download_dir,
+            **settings
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_download_is_moved_into_cache(self):
+        cache_dir = tempfile.mkdtemp()
+        self.use_settings(AUDIO_CACHE_DIR=cache_dir)
+        response = self.client.post(reverse('translator:tts'), {'lezgin_text': 'Салам'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(os.listdir(self.download_dir), [])
+        cached = [name for _, _, names in os.walk(cache_dir) for name in names if name.endswith('.wav')]
+        self.assertEqual(len(cached), 1)
+
+    def test_uncached_download_is_discarded_after_response(self):
+        self.use_settings()
+        response = self.client.post(reverse('translator:tts'), {'lezgin_text': 'Салам'}, format='json')
+        self.assertEqual(sf.info(io.BytesIO(base64.b64decode(response.json()['audio']))).duration, 1.5)
+        self.assertEqual(os.listdir(self.download_dir), [])
+
+        response = self.client.post(
+            reverse('translator:tts') + '?delivery=stream',
+            {'lezgin_text': 'Салам'},
+            format='json',
+            HTTP_ACCEPT='audio/ogg'
+        )
+        self.assertEqual(len(os.listdir(self.download_dir)), 1)
+        b''.join(response.streaming_content)
+        response.close()
+        self.assertEqual(os.listdir(self.download_dir), [])
+
+        response = self.client.post(
+            reverse('translator:tts') + '?delivery=stream',
+            {'lezgin_text': 'Салам'},
+            format='json',
+            HTTP_RANGE='bytes=0-99'
+        )
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(len(b''.join(response.streaming_content)), 100)
+        response.close()
+        self.assertEqual(os.listdir(self.download_dir), [])
+
+    def test_url_downloads_are_swept_after_their_links_expire(self):
+        self.use_settings(AUDIO_URL_TTL=60, TTS_JOB_TTL=120)
+        response = self.client.post(reverse('translator:tts') + '?delivery=url', {'lezgin_text': 'Салам'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(sweep_expired_downloads(), 0)
+        (download,) = os.listdir(self.download_dir)
+        old = time.time() - 121
+        os.utime(os.path.join(self.download_dir, download), (old, old))
+        self.assertEqual(sweep_expired_downloads(), 1)
+        self.assertEqual(os.listdir(self.download_dir), [])
+
+    def test_expired_job_audio_is_deleted_with_the_job(self):
+        self.use_settings()
+        job = submit_job('Салам')
+        process_next_job()
+        job.refresh_from_db()
+        self.assertTrue(os.path.exists(job.audio_path))
+        TTSJob.objects.filter(pk=job.pk).update(expires_at=timezone.now())
+        self.assertEqual(purge_expired_jobs(), 1)
+        self.assertFalse(os.path.exists(job.audio_path))
+
+    def test_put_file_copies_foreign_files(self):
+        cache = AudioCache(tempfile.mkdtemp(), 10 ** 9)
+        source = write_wav(os.path.join(tempfile.mkdtemp(), 'a.wav'), 'салам')
+        path = cache.put_file('ab' * 32, source)
+        self.assertTrue(os.path.exists(source))
+        with open(source, 'rb') as a, open(path, 'rb') as b:
+            self.assertEqual(a.read(), b.read())
+
+
+class ChunkedTranslationTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'BACKEND_OPTIONS': {TTS: {'audio_seconds': 0.5}},
+            'CHUNK_MAX_CHARS': 40,
+            'MAX_INPUT_CHARS': 200,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_split_chunks(self):
+        text = 'Первое предложение. Второе. Очень длинное третье предложение, с запятой; и еще одной частью.'
+        chunks = split_chunks(text, 40)
+        self.assertEqual(chunks, [
+            'Первое предложение. Второе.',
+            'Очень длинное третье предложение,',
+            'с запятой; и еще одной частью.',
+        ])
+        self.assertTrue(all(len(chunk) <= 40 for chunk in split_chunks('слово ' * 50, 40)))
+        self.assertEqual(split_chunks('Коротко.', 40), ['Коротко.'])
+        self.assertEqual(split_chunks('Без ограничения. ' * 10, None), ['Без ограничения. ' * 10])
+
+    def test_map_ordered_keeps_order_and_limits_parallelism(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work(value):
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.01 * (5 - value))
+            with lock:
+                running[0] -= 1
+            return value * 2
+
+        self.assertEqual(map_ordered(work, range(5), 2), [0, 2, 4, 6, 8])
+        self.assertLessEqual(peak[0], 2)
+
+    def test_long_text_is_translated_in_chunks_with_timestamps(self):
+        text = 'Первое предложение текста. Второе предложение текста. Третье.'
+        for url in [reverse('translator:translator'), reverse('translator:translator-async')]:
+            response = self.client.post(url, {'text': text}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertEqual([chunk['text'] for chunk in data['chunks']], split_chunks(text, 40))
+            self.assertEqual(data['translation'], ' '.join(f"lez:{chunk['text']}" for chunk in data['chunks']))
+            self.assertEqual([(chunk['start'], chunk['end']) for chunk in data['chunks']], [(0, 0.5), (0.5, 1.0)])
+            self.assertEqual(sf.info(io.BytesIO(base64.b64decode(data['audio']))).duration, 1.0)
+
+        response = self.client.post(
+            reverse('translator:translator') + '?delivery=stream', {'text': text}, format='json'
+        )
+        self.assertEqual(response['X-Audio-Chunks'], '0.000-0.500, 0.500-1.000')
+
+    def test_short_text_has_no_chunks(self):
+        response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+        self.assertNotIn('chunks', response.json())
+
+    def test_input_limit(self):
+        response = self.client.post(reverse('translator:translator'), {'text': 'а' * 201}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('200', response.json()['error'])
+
+
+class FallbackTranslationTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        reset_index()
+        self.addCleanup(reset_pool)
+        self.addCleanup(reset_index)
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'TRANSLATOR_SPACE': 'fake://translator?error_rate=1',
+            'RETRIES': {},
+            'CHUNK_MAX_CHARS': None,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.part_of_speech = dictionary.PartOfSpeech.objects.create(name='Существительное')
+        self.category = dictionary.Category.objects.create(name='Природа')
+        self.origin = dictionary.Origin.objects.create(language='Лезгинский')
+        for text, translation in [('Вода', 'Яд'), ('Гора', 'Дагъ'), ('Холодный', 'Мекьи')]:
+            self.add_word(text, translation)
+        phrase = phrasebook.Phrase.objects.create(
+            text='Доброе утро',
+            category=phrasebook.Category.objects.create(name='Приветствия')
+        )
+        phrasebook.Translation.objects.create(text='Экуьн хийир', audio='', phrase=phrase)
+
+    def add_word(self, text, translation):
+        word = dictionary.Word.objects.create(
+            text=text, part_of_speech=self.part_of_speech, category=self.category
+        )
+        dictionary.Translation.objects.create(text=translation, audio='', word=word, origin=self.origin)
+
+    def test_index_prefers_phrases_and_matches_inflections(self):
+        index = FallbackIndex([('доброе утро', 'Экуьн хийир'), ('утро', 'Экуьн'), ('гора', 'Дагъ')])
+        self.assertEqual(index.translate('Доброе утро, горы!'), ('Экуьн хийир, Дагъ!', 1.0))
+        self.assertEqual(index.translate('Утро и горы'), ('Экуьн и Дагъ', 2 / 3))
+
+    def test_degraded_translation_when_space_fails(self):
+        for url in [reverse('translator:translator'), reverse('translator:translator-async')]:
+            response = self.client.post(url, {'text': 'Холодная вода'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['translation'], 'Мекьи Яд')
+            self.assertEqual(response.json()['source'], 'fallback')
+            self.assertTrue(response.json()['degraded'])
+
+    def test_unknown_text_still_fails(self):
+        response = self.client.post(reverse('translator:translator'), {'text': 'Совсем незнакомые слова'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+    def test_index_is_rebuilt_after_catalog_changes(self):
+        index = get_index()
+        self.assertEqual(len(index), 4)
+        self.assertIs(get_index(), index)
+        started = time.perf_counter()
+        index.translate('Холодная вода в горах. ' * 50)
+        self.assertLess(time.perf_counter() - started, 0.05)
+
+
+class FallbackRebuildTests(APITransactionTestCase):
+    def setUp(self):
+        reset_index()
+        self.addCleanup(reset_index)
+        self.part_of_speech = dictionary.PartOfSpeech.objects.create(name='Существительное')
+        self.category = dictionary.Category.objects.create(name='Природа')
+        self.origin = dictionary.Origin.objects.create(language='Лезгинский')
+        self.add_word('Вода', 'Яд')
+
+    def add_word(self, text, translation):
+        word = dictionary.Word.objects.create(
+            text=text, part_of_speech=self.part_of_speech, category=self.category
+        )
+        dictionary.Translation.objects.create(text=translation, audio='', word=word, origin=self.origin)
+
+    def test_old_index_serves_while_the_new_one_is_built(self):
+        index = get_index()
+        self.assertEqual(len(index), 1)
+        release = threading.Event()
+        build = fallback.build_index
+
+        def slow_build():
+            release.wait(5)
+            return build()
+
+        with mock.patch('apps.translator.fallback.build_index', side_effect=slow_build):
+            self.add_word('Снег', 'Жив')
+            started = time.perf_counter()
+            self.assertIs(get_index(), index)
+            self.assertLess(time.perf_counter() - started, 0.05)
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == 'fallback-index':
+                    thread.join(5)
+        self.assertEqual(len(get_index()), 2)
+        self.assertEqual(get_index().translate('снег')[0], 'Жив')
+
+
+class CacheableTTSTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'DOWNLOAD_DIR': tempfile.mkdtemp()
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.url = reverse('translator:tts-audio')
+
+    def test_get_returns_immutable_audio_with_content_etag(self):
+        response = self.client.get(self.url, {'lezgin_text': 'Салам'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'audio/wav')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertIn('Accept', response['Vary'])
+        body = b''.join(response.streaming_content)
+        self.assertTrue(body.startswith(b'RIFF'))
+        self.assertEqual(response['ETag'], f'"{hashlib.sha256(body).hexdigest()}"')
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.client.get(self.url, {'lezgin_text': 'Салам'})['ETag']
+        response = self.client.get(self.url, {'lezgin_text': 'Салам'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        self.assertIn('immutable', response['Cache-Control'])
+
+        response = self.client.get(self.url, {'lezgin_text': 'Салам'}, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_format_parameter_and_range(self):
+        response = self.client.get(self.url, {'lezgin_text': 'Салам', 'audio_format': 'audio/ogg'}, HTTP_RANGE='bytes=0-3')
+        self.assertEqual(response.status_code, status.HTTP_206_PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Type'], 'audio/ogg')
+        self.assertEqual(b''.join(response.streaming_content), b'OggS')
+        self.assertNotIn('Accept', response.get('Vary', ''))
+        self.assertNotEqual(response['ETag'], self.client.get(self.url, {'lezgin_text': 'Салам'})['ETag'])
+
+    def test_invalid_parameters(self):
+        self.assertEqual(self.client.get(self.url).status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'lezgin_text': 'Салам', 'speaking_rate': 'fast'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('speaking_rate', response.json())
+
+
+class LanguageDetectionTests(APITestCase):
+    russian = ['Здравствуйте', 'Спасибо тебе', 'Хорошо', 'Я лезгин', 'Как тебя зовут', 'Как у вас дела', 'Моя семья', 'Наше село']
+    lezgian = ['Салам алейкум', 'Ваз чухсагъул', 'Хъсан я', 'Зун лезги я', 'Ви тӏвар вуж я', 'Куьн гьихьтин ава', 'Зи хизан', 'Чи хуьр']
+
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        reset_detector()
+        self.addCleanup(reset_pool)
+        self.addCleanup(reset_detector)
+        settings_override = override_settings(TRANSLATOR=BackendTests.fake_settings)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_detector_uses_ngrams_and_lezgian_letters(self):
+        detector = LanguageDetector(self.russian, self.lezgian)
+        self.assertEqual(detector.detect('Ви тӏвар вуж я?'), LEZGIAN)
+        self.assertEqual(detector.detect('Ви тIвар вуж я?'), LEZGIAN)
+        self.assertEqual(detector.detect('Зун лезги я'), LEZGIAN)
+        self.assertEqual(detector.detect('Как тебя зовут?'), RUSSIAN)
+        self.assertEqual(detector.detect('Как переводится слово хъсан?'), RUSSIAN)
+        self.assertEqual(detector.detect('12:30'), RUSSIAN)
+
+    def test_digraphs_seen_in_russian_are_not_markers(self):
+        detector = LanguageDetector(['подъезд'], [], digraphs=('дъ', 'хъ'))
+        self.assertEqual(detector.markers, ('хъ',))
+
+    def test_detection_is_fast(self):
+        detector = LanguageDetector(self.russian * 20, self.lezgian * 20)
+        text = ('Лезгины живут в южном Дагестане и на севере Азербайджана. ' * 20)[:500]
+        started = time.perf_counter()
+        for _ in range(100):
+            detector.detect(text)
+        self.assertLess((time.perf_counter() - started) / 100, 0.005)
+
+    def test_lezgian_input_skips_translator(self):
+        text = 'Къе гьава хъсан туш, гъвечӏи хуьре марф къвазва.'
+        for url in [reverse('translator:translator'), reverse('translator:translator-async')]:
+            with mock.patch('apps.translator.services.translate') as translate_mock, \
+                    mock.patch('apps.translator.services.atranslate') as atranslate_mock:
+                response = self.client.post(url, {'text': text}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json()['translation'], text)
+            self.assertEqual(response.json()['source'], 'input')
+            self.assertTrue(response.json()['audio'])
+            translate_mock.assert_not_called()
+            atranslate_mock.assert_not_called()
+
+    def test_russian_input_is_translated(self):
+        response = self.client.post(reverse('translator:translator'), {'text': 'Как тебя зовут?'}, format='json')
+        self.assertEqual(response.json()['source'], 'model')
+
+    def test_detection_can_be_disabled(self):
+        with override_settings(TRANSLATOR={**BackendTests.fake_settings, 'LANGUAGE_DETECTION_ENABLED': False}):
+            response = self.client.post(reverse('translator:translator'), {'text': 'Хъсан гьава'}, format='json')
+        self.assertEqual(response.json()['source'], 'model')
+
+
+class LanguageRebuildTests(APITransactionTestCase):
+    def setUp(self):
+        reset_detector()
+        self.addCleanup(reset_detector)
+        self.category = phrasebook.Category.objects.create(name='Приветствия')
+
+    def add_phrase(self, text, translation):
+        phrase = phrasebook.Phrase.objects.create(text=text, category=self.category)
+        phrasebook.Translation.objects.create(text=translation, audio='', phrase=phrase)
+
+    def test_old_detector_answers_while_the_new_one_is_trained(self):
+        self.add_phrase('Доброе утро', 'Экуьн хийир')
+        detector = get_detector()
+        release = threading.Event()
+        build = language.build_detector
+
+        def slow_build():
+            release.wait(5)
+            return build()
+
+        with mock.patch('apps.translator.language.build_detector', side_effect=slow_build):
+            self.add_phrase('Спасибо', 'Чухсагъул')
+            started = time.perf_counter()
+            self.assertIs(get_detector(), detector)
+            self.assertLess(time.perf_counter() - started, 0.05)
+            release.set()
+            for thread in threading.enumerate():
+                if thread.name == 'language-detector':
+                    thread.join(5)
+        self.assertIsNot(get_detector(), detector)
+        self.assertGreater(get_detector().version, detector.version)
+
+
+class KeepWarmTests(APITestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        FakeSpaceClient.awake.clear()
+        self.addCleanup(reset_pool)
+        self.addCleanup(FakeSpaceClient.awake.clear)
+        for name in (TRANSLATOR, TTS):
+            self.addCleanup(cache.delete, STATE_KEY.format(name))
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'BACKEND_OPTIONS': {TTS: {'sleep_after': 60, 'wake_latency': 0.5}},
+            'DOWNLOAD_DIR': tempfile.mkdtemp(),
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.keep_warm = KeepWarm(interval=60, timeout=0.1)
+        self.addCleanup(self.keep_warm.close)
+
+    def tick_until(self, predicate, deadline=5):
+        started = time.monotonic()
+        while not predicate():
+            self.assertLess(time.monotonic() - started, deadline)
+            time.sleep(0.02)
+            self.keep_warm.tick()
+
+    def test_fake_space_sleeps_and_wakes(self):
+        client = FakeSpaceClient('fake://sleepy', sleep_after=60, wake_latency=0.2)
+        started = time.monotonic()
+        client.predict('салам', fn_index=0)
+        self.assertGreaterEqual(time.monotonic() - started, 0.2)
+        started = time.monotonic()
+        client.predict('салам', fn_index=0)
+        self.assertLess(time.monotonic() - started, 0.1)
+
+    def test_cold_backend_is_recorded_and_then_warm(self):
+        self.keep_warm.tick()
+        self.tick_until(lambda: (get_state(TTS) or {}).get('state') == COLD)
+        self.assertEqual(get_state(TTS)['error'], 'no answer within 0.1s')
+        self.tick_until(lambda: get_state(TTS)['state'] == WARM)
+        self.assertGreaterEqual(get_state(TTS)['latency'], 0.5)
+        self.assertEqual(get_state(TRANSLATOR)['state'], WARM)
+        self.assertFalse(self.keep_warm.pending)
+        self.assertEqual(
+            self.client.get(reverse('translator:tts-audio'), {'lezgin_text': 'Салам'}).status_code,
+            status.HTTP_200_OK
+        )
+
+    def test_requests_fail_fast_while_cold(self):
+        self.keep_warm.tick()
+        self.tick_until(lambda: (get_state(TTS) or {}).get('state') == COLD)
+
+        started = time.monotonic()
+        response = self.client.post(reverse('translator:translator'), {'text': 'Привет'}, format='json')
+        self.assertLess(time.monotonic() - started, 0.4)
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.json()['code'], 'backend_warming')
+        self.assertEqual(response['Retry-After'], '15')
+
+        for url in [reverse('translator:tts'), reverse('translator:tts-async')]:
+            response = self.client.post(url, {'lezgin_text': 'Салам'}, format='json')
+            self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+            self.assertEqual(response.json()['code'], 'backend_warming')
+            self.assertEqual(response.json()['status'], TTSJob.PENDING)
+            self.assertEqual(response['Location'], response.json()['status_url'])
+
+        job = process_next_job()
+        self.assertEqual(job.status, TTSJob.DONE)
+
+    def test_timed_out_ping_is_cancelled_and_not_repeated(self):
+        self.addCleanup(warmup._remote_pings.clear)
+        with override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'BACKEND_OPTIONS': {TTS: {'latency': 0.5}},
+            'TIMEOUTS': {TTS: 0.05},
+        }):
+            reset_pool()
+            with mock.patch.object(FakeJob, 'cancel', autospec=True, return_value=False) as cancel, \
+                    mock.patch.object(FakeSpaceClient, 'submit', autospec=True, side_effect=FakeSpaceClient.submit) as submit:
+                for _ in range(2):
+                    with self.assertRaises(TimeoutError):
+                        ping_backend(TTS)
+                self.assertEqual(cancel.call_count, 2)
+                self.assertEqual(submit.call_count, 1)
+                time.sleep(0.6)
+                with self.assertRaises(TimeoutError):
+                    ping_backend(TTS)
+                self.assertEqual(submit.call_count, 2)
+
+    def test_stale_state_expires(self):
+        set_state(TTS, COLD, ttl=0.05)
+        time.sleep(0.1)
+        self.assertIsNone(get_state(TTS))
+
+
+class DeferredAudioTests(APITransactionTestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'BACKEND_OPTIONS': {TTS: {'latency': 0.5}},
+            'AUDIO_CACHE_DIR': tempfile.mkdtemp(),
+            'DOWNLOAD_DIR': tempfile.mkdtemp(),
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_translation_returns_before_audio(self):
+        for url in [reverse('translator:translator'), reverse('translator:translator-async')]:
+            started = time.monotonic()
+            response = self.client.post(url + '?delivery=deferred', {'text': 'Привет'}, format='json')
+            self.assertLess(time.monotonic() - started, 0.4)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            data = response.json()
+            self.assertEqual(data['translation'], 'lez:Привет')
+            self.assertNotIn('audio', data)
+            self.assertEqual(data['audio_job']['status'], TTSJob.RUNNING)
+            self.assertEqual(data['audio_job']['lezgin_text'], 'lez:Привет')
+
+            job = self.client.get(data['audio_job']['status_url'], {'wait': 5}).json()
+            self.assertEqual(job['status'], TTSJob.DONE)
+            audio = self.client.get(job['audio_url'], HTTP_ACCEPT='audio/ogg')
+            self.assertEqual(audio['Content-Type'], 'audio/ogg')
+            self.assertTrue(b''.join(audio.streaming_content).startswith(b'OggS'))
+
+    def test_audio_can_be_long_polled(self):
+        data = self.client.post(
+            reverse('translator:translator'), {'text': 'Привет', 'delivery': 'deferred'}, format='json'
+        ).json()
+        audio_url = data['audio_job']['status_url'] + 'audio/'
+        self.assertEqual(self.client.get(audio_url).status_code, status.HTTP_409_CONFLICT)
+        audio = self.client.get(audio_url, {'wait': 5})
+        self.assertEqual(audio.status_code, status.HTTP_200_OK)
+        self.assertTrue(b''.join(audio.streaming_content).startswith(b'RIFF'))
+
+    def test_chunked_jobs_do_not_exhaust_the_shared_executor(self):
+        shared = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(shared.shutdown, wait=False, cancel_futures=True)
+        chunks = ['Салам.', 'Хъсан я.', 'Сагърай.']
+        with mock.patch('apps.translator.services._executor', shared), override_settings(TRANSLATOR={
+            **settings.TRANSLATOR, 'CHUNK_PARALLELISM': 2,
+        }):
+            jobs = [start_job(' '.join(chunks), lambda: speak_chunks(chunks)[0]) for _ in range(4)]
+            for job in jobs:
+                self.assertEqual(wait_for_job(job, 5).status, TTSJob.DONE)
+
+    def test_long_poll_is_capped(self):
+        job = submit_job('Салам')
+        with override_settings(TRANSLATOR={**settings.TRANSLATOR, 'TTS_JOB_MAX_WAIT': 0.2}):
+            started = time.monotonic()
+            response = self.client.get(reverse('translator:tts-job-detail', args=[job.pk]), {'wait': 60})
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(response.json()['status'], TTSJob.PENDING)
+
+    def test_job_running_elsewhere_is_polled_in_database(self):
+        job = submit_job('Салам')
+        threading.Timer(0.2, lambda: TTSJob.objects.filter(pk=job.pk).update(status=TTSJob.DONE)).start()
+        self.assertEqual(wait_for_job(job, 5, poll_interval=0.05).status, TTSJob.DONE)
+        self.assertEqual(wait_for_job(submit_job('Салам'), 0.1).status, TTSJob.PENDING)
+
+
+class LiveSocket:
+    def __init__(self, app, path=LIVE_PATH):
+        self.inbox = asyncio.Queue()
+        self.outbox = asyncio.Queue()
+        self.task = asyncio.ensure_future(app({'type': 'websocket', 'path': path}, self.inbox.get, self.outbox.put))
+
+    async def connect(self):
+        await self.inbox.put({'type': 'websocket.connect'})
+        return await asyncio.wait_for(self.outbox.get(), 2)
+
+    async def send_json(self, data):
+        await self.inbox.put({'type': 'websocket.receive', 'text': json.dumps(data)})
+
+    async def receive_json(self, timeout=2):
+        return json.loads((await asyncio.wait_for(self.outbox.get(), timeout))['text'])
+
+    async def close(self):
+        await self.inbox.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(self.task, 2)
+
+
+class LiveTranslationTests(APITransactionTestCase):
+    def setUp(self):
+        reset_pool()
+        reset_breakers()
+        self.addCleanup(reset_pool)
+        settings_override = override_settings(TRANSLATOR={
+            **BackendTests.fake_settings,
+            'BACKEND_OPTIONS': {TRANSLATOR: {'latency': 0.2}},
+            'LIVE_DEBOUNCE': 0.05,
+            'LIVE_DRAFT_CALLS': 2,
+        })
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    async def test_pushes_translations_sentence_by_sentence(self):
+        socket = LiveSocket(live_translation)
+        self.assertEqual((await socket.connect())['type'], 'websocket.accept')
+        await socket.send_json({'text': 'Привет.'})
+        message = await socket.receive_json()
+        self.assertEqual(message['translation'], 'lez:Привет.')
+        self.assertTrue(message['complete'])
+
+        await socket.send_json({'append': ' Как дела?'})
+        message = await socket.receive_json()
+        self.assertEqual(message['translation'], 'lez:Привет. lez:Как дела?')
+        self.assertEqual([item['source'] for item in message['sentences']], ['model', 'model'])
+        await socket.close()
+
+    async def test_deleted_sentences_are_pushed(self):
+        socket = LiveSocket(live_translation)
+        await socket.connect()
+        await socket.send_json({'text': 'Привет. Как дела?'})
+        while not (message := await socket.receive_json())['complete']:
+            pass
+        self.assertEqual(message['translation'], 'lez:Привет. lez:Как дела?')
+
+        await socket.send_json({'text': 'Привет.'})
+        message = await socket.receive_json()
+        self.assertEqual(message['translation'], 'lez:Привет.')
+        self.assertEqual([item['text'] for item in message['sentences']], ['Привет.'])
+
+        await socket.send_json({'text': ''})
+        message = await socket.receive_json()
+        self.assertEqual((message['translation'], message['sentences']), ('', []))
+        await socket.close()
+
+    async def test_database_connections_are_checked_around_lookups(self):
+        socket = LiveSocket(live_translation)
+        await socket.connect()
+        with mock.patch('apps.translator.live.close_old_connections') as close_old_connections:
+            await socket.send_json({'text': 'Привет.'})
+            await socket.receive_json()
+        self.assertEqual(close_old_connections.call_count, 2)
+        await socket.close()
+
+    async def test_superseded_text_cancels_remote_call(self):
+        socket = LiveSocket(live_translation)
+        await socket.connect()
+        with mock.patch.object(FakeJob, 'cancel', autospec=True, side_effect=FakeJob.cancel) as cancel:
+            await socket.send_json({'text': 'Привет'})
+            await asyncio.sleep(0.12)
+            await socket.send_json({'text': 'Пока!'})
+            message = await socket.receive_json()
+            self.assertEqual(cancel.call_count, 1)
+        self.assertEqual(message['translation'], 'lez:Пока!')
+        with self.assertRaises(asyncio.TimeoutError):
+            await socket.receive_json(timeout=0.3)
+        await socket.close()
+
+    async def test_remote_calls_per_typed_sentence_are_bounded(self):
+        calls = []
+
+        async def lookup(text):
+            calls.append(text)
+            return f'lez:{text}', 'model', '', None, None
+
+        socket = LiveSocket(live_translation)
+        await socket.connect()
+        with mock.patch('apps.translator.live.alookup_translation', side_effect=lookup):
+            for text in ['Д', 'До', 'Доб', 'Добр', 'Добрый']:
+                await socket.send_json({'text': text})
+                await asyncio.sleep(0.1)
+            await socket.send_json({'text': 'Добрый день.'})
+            while not (await socket.receive_json())['complete'] or calls[-1] != 'Добрый день.':
+                pass
+        self.assertEqual(calls, ['Д', 'До', 'Добрый день.'])
+        await socket.close()
+
+    async def test_invalid_messages_and_unknown_paths(self):
+        socket = LiveSocket(live_translation)
+        await socket.connect()
+        await socket.inbox.put({'type': 'websocket.receive', 'text': 'not json'})
+        self.assertEqual((await socket.receive_json())['code'], 'invalid')
+        await socket.send_json({'text': 'а' * 6000})
+        self.assertEqual((await socket.receive_json())['code'], 'too_long')
+        await socket.close()
+
+        from lezgify_backend.asgi import application
+        socket = LiveSocket(application, path='/ws/unknown/')
+        self.assertEqual((await socket.connect())['type'], 'websocket.close')
@@ -1,10 +1,34 @@
-from django.urls import path
-from .views import TranslateAndTTSView, TTSOnlyView
+from django.urls import path, include
+from rest_framework import routers
+from .views import (
+    TranslateAndTTSView,
+    TTSOnlyView,
+    TTSAudioView,
+    BatchTranslateView,
+    AsyncTranslateAndTTSView,
+    AsyncTTSOnlyView,
+    TTSJobViewSet,
+    AudioView,
+    TranslatorStatsView,
+    TranslatorMetricsView
+)
 
 app_name = 'translator'
 
+router = routers.DefaultRouter()
+
+router.register(r'jobs', TTSJobViewSet, basename='tts-job')
+
 
 urlpatterns = [
     path('app/', TranslateAndTTSView.as_view(), name='translator'),
     path('tts/', TTSOnlyView.as_view(), name='tts'),
-]
\ No newline at end of file
+    path('tts/audio/', TTSAudioView.as_view(), name='tts-audio'),
+    path('batch/', BatchTranslateView.as_view(), name='batch'),
+    path('async/app/', AsyncTranslateAndTTSView.as_view(), name='translator-async'),
+    path('async/tts/', AsyncTTSOnlyView.as_view(), name='tts-async'),
+    path('audio/<str:token>/', AudioView.as_view(), name='audio'),
+    path('stats/', TranslatorStatsView.as_view(), name='stats'),
+    path('metrics/', TranslatorMetricsView.as_view(), name='metrics'),
+    path('', include(router.urls)),
+]
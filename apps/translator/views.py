@@ -1,60 +1,267 @@
-from django.http import JsonResponse
-from rest_framework.permissions import IsAuthenticated, AllowAny
+from asgiref.sync import sync_to_async
+from django.core import signing
+from django.http import HttpResponse, JsonResponse
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from django.utils import timezone
+from rest_framework import mixins, status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
+from rest_framework.response import Response
 from rest_framework.views import APIView
-from gradio_client import Client
-import tempfile
-import shutil
+from .audio import content_type_for, transcode
+from .backends import discard_download
+from .bulkhead import get_bulkhead, limit_concurrency
+from .metrics import get_metrics, server_timing, timed
+from .cache import get_audio_cache, get_translation_cache
+from .clients import get_pool
+from .coalesce import get_single_flight
+from .conf import get_setting
+from .responses import (
+    IgnoreAcceptContentNegotiation,
+    DELIVERY_MODES,
+    DEFERRED,
+    STREAM,
+    URL,
+    SSE,
+    get_delivery,
+    get_audio_format,
+    sign_audio_path,
+    load_audio_path,
+    audio_file_response,
+    immutable_audio_response,
+    translation_headers,
+    backend_error_response,
+    sse_event,
+    sse_response
+)
+from .jobs import FINISHED, start_job, submit_job, wait_for_job
+from .memory import FALLBACK
+from .models import TTSJob
+from .resilience import BackendError, BackendWarming, breaker_stats
+from .serializers import BatchTranslateSerializer, TTSAudioQuerySerializer, TTSJobSerializer
+from .warmup import fail_fast_while_cold, warmth
+from .services import (
+    synthesize,
+    asynthesize,
+    translate_many,
+    translate_sentences,
+    atranslate_sentences,
+    lookup_translation,
+    alookup_translation,
+    speak,
+    aspeak,
+    speak_chunks,
+    aspeak_chunks
+)
+import json
+import math
+import mmap
 import os
 import base64
+from functools import partial
+
+
+def audio_url_response(request, audio_path, data):
+    token = sign_audio_path(audio_path)
+    data.update({
+        'audio_url': request.build_absolute_uri(reverse('translator:audio', args=[token])),
+        'audio_format': content_type_for(audio_path),
+        'expires_in': get_setting('AUDIO_URL_TTL')
+    })
+    return JsonResponse(data)
+
+
+def parse_body(request):
+    if request.content_type == 'application/json':
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            return None
+        return data if isinstance(data, dict) else None
+    return request.POST
+
+
+def read_audio_base64(audio_path):
+    # Encodes straight from the page cache instead of reading the file into a buffer first.
+    with timed('encode'), open(audio_path, 'rb') as f:
+        if not os.fstat(f.fileno()).st_size:
+            return ''
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            return base64.b64encode(data).decode('ascii')
+
+
+def too_long_response(text):
+    max_chars = get_setting('MAX_INPUT_CHARS')
+    if max_chars and len(text) > max_chars:
+        return JsonResponse({'error': f'Text is longer than {max_chars} characters'}, status=400)
+    return None
+
+
+def chunk_data(chunks, spans):
+    return [
+        {'text': text, 'translation': translation, 'start': round(start, 3), 'end': round(end, 3)}
+        for (text, translation), (start, end) in zip(chunks, spans)
+    ]
+
+
+def translation_data(lezgin_text, source, score=None):
+    # score is set for translation memory matches; below 1.0 the match was fuzzy.
+    return {
+        'translation': lezgin_text,
+        'source': source,
+        'degraded': source == FALLBACK,
+        'fuzzy': score is not None and score < 1,
+        'score': round(score, 3) if score is not None else None
+    }
+
+
+def deferred_data(request, lezgin_text, source, recording_url, chunks, score=None):
+    # The translation goes back as soon as it is known; its audio is made on the
+    # job executor as a TTS job that the client fetches or long-polls.
+    if chunks:
+        job = start_job(lezgin_text, lambda: speak_chunks([translation for _, translation in chunks])[0])
+    else:
+        job = start_job(lezgin_text, lambda: speak(lezgin_text, recording_url))
+    data = {
+        **translation_data(lezgin_text, source, score),
+        'audio_job': TTSJobSerializer(job, context={'request': request}).data
+    }
+    if chunks:
+        data['chunks'] = [{'text': text, 'translation': translation} for text, translation in chunks]
+    return data
+
+
+def job_wait(request):
+    try:
+        wait = float(request.GET.get('wait', 0))
+    except ValueError:
+        return 0
+    return min(max(wait, 0), get_setting('TTS_JOB_MAX_WAIT'))
+
+
+def warming_job_response(request, lezgin_text, error):
+    # A cold TTS Space would hold this worker through its start-up; the job
+    # worker waits for it instead and the client polls the job.
+    job = submit_job(lezgin_text)
+    data = TTSJobSerializer(job, context={'request': request}).data
+    response = JsonResponse({**data, 'code': error.code}, status=202)
+    response['Location'] = data['status_url']
+    response['Retry-After'] = str(math.ceil(error.retry_after))
+    return response
+
+
+def sentence_event(index, sentence, lezgin_text, audio_path, audio_base64):
+    return sse_event('sentence', {
+        'index': index,
+        'text': sentence,
+        'translation': lezgin_text,
+        'audio': audio_base64,
+        'audio_format': content_type_for(audio_path)
+    })
+
+
+def error_event(error, index):
+    data = {'index': index, 'error': f'Processing error: {str(error)}'}
+    if isinstance(error, BackendError):
+        data.update({'error': str(error), 'code': error.code, 'backend': error.backend})
+    return sse_event('error', data)
+
+
+def translation_events(russian_text, media_type):
+    translations = []
+    try:
+        for sentence, lezgin_text, audio_path in translate_sentences(russian_text):
+            audio_path = transcode(audio_path, media_type)
+            audio_base64 = read_audio_base64(audio_path)
+            discard_download(audio_path)
+            yield sentence_event(len(translations), sentence, lezgin_text, audio_path, audio_base64)
+            translations.append(lezgin_text)
+    except Exception as e:
+        yield error_event(e, len(translations))
+        return
+    yield sse_event('done', {'sentences': len(translations), 'translation': ' '.join(translations)})
+
+
+async def atranslation_events(russian_text, media_type):
+    translations = []
+    try:
+        async for sentence, lezgin_text, audio_path in atranslate_sentences(russian_text):
+            audio_path = await sync_to_async(transcode, thread_sensitive=False)(audio_path, media_type)
+            audio_base64 = await sync_to_async(read_audio_base64, thread_sensitive=False)(audio_path)
+            discard_download(audio_path)
+            yield sentence_event(len(translations), sentence, lezgin_text, audio_path, audio_base64)
+            translations.append(lezgin_text)
+    except Exception as e:
+        yield error_event(e, len(translations))
+        return
+    yield sse_event('done', {'sentences': len(translations), 'translation': ' '.join(translations)})
 
 
 class TranslateAndTTSView(APIView):
     permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreAcceptContentNegotiation
 
     @staticmethod
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
     def post(request):
         russian_text = request.data.get('text')
         if not russian_text:
             return JsonResponse({'error': 'Text is required'}, status=400)
+        error_response = too_long_response(russian_text)
+        if error_response is not None:
+            return error_response
 
-        try:
-            translator_client = Client("stazizov/lezghian_translator_v1")
-            lezgin_text = translator_client.predict(
-                text=russian_text,
-                api_name="/translate"
-            )
-
-            tts_client = Client("https://leks-forever-lez-tts.hf.space/")
+        delivery = get_delivery(request, request.data)
+        media_type = get_audio_format(request)
+        if delivery == SSE:
+            return sse_response(translation_events(russian_text, media_type))
+        if delivery not in DELIVERY_MODES and delivery != DEFERRED:
+            return JsonResponse({'error': f'Unknown delivery: {delivery}'}, status=400)
 
-            speaking_rate = 1
-            noise_scale = 0
-            add_pauses = True
+        try:
+            lezgin_text, source, recording_url, chunks, score = lookup_translation(russian_text)
+            if delivery == DEFERRED:
+                return JsonResponse(deferred_data(request, lezgin_text, source, recording_url, chunks, score))
+            spans = None
+            if chunks:
+                audio_path, spans = speak_chunks([translation for _, translation in chunks])
+            else:
+                audio_path = speak(lezgin_text, recording_url)
+            audio_path = transcode(audio_path, media_type)
 
-            with tempfile.TemporaryDirectory() as temp_dir:
-                audio_path = tts_client.predict(
-                    lezgin_text,
-                    speaking_rate,
-                    noise_scale,
-                    add_pauses,
-                    fn_index=0
+            if delivery == STREAM:
+                return audio_file_response(
+                    request,
+                    audio_path,
+                    content_type_for(audio_path),
+                    headers=translation_headers(lezgin_text, source, spans, score),
+                    on_close=partial(discard_download, audio_path)
                 )
+            data = translation_data(lezgin_text, source, score)
+            if chunks:
+                data['chunks'] = chunk_data(chunks, spans)
+            if delivery == URL:
+                return audio_url_response(request, audio_path, data)
 
-                temp_file = os.path.join(temp_dir, "audio.wav")
-                shutil.copy(audio_path, temp_file)
-
-                with open(temp_file, 'rb') as f:
-                    audio_data = f.read()
-
-                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+            audio_base64 = read_audio_base64(audio_path)
+            discard_download(audio_path)
 
             response_data = {
-                'translation': lezgin_text,
+                **data,
                 'audio': audio_base64,
-                'audio_format': 'audio/wav'
+                'audio_format': content_type_for(audio_path)
             }
 
             return JsonResponse(response_data)
 
+        except BackendError as e:
+            return backend_error_response(e)
         except Exception as e:
             return JsonResponse(
                 {'error': f'Processing error: {str(e)}'},
@@ -64,44 +271,349 @@ class TranslateAndTTSView(APIView):
 
 class TTSOnlyView(APIView):
     permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreAcceptContentNegotiation
 
     @staticmethod
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
     def post(request):
         lezgin_text = request.data.get('lezgin_text')
         if not lezgin_text:
             return JsonResponse({'error': 'lezgin_text необходим'}, status=400)
 
+        delivery = get_delivery(request, request.data)
+        if delivery not in DELIVERY_MODES:
+            return JsonResponse({'error': f'Unknown delivery: {delivery}'}, status=400)
+        media_type = get_audio_format(request)
+
         try:
-            tts_client = Client("https://leks-forever-lez-tts.hf.space/")
-
-            speaking_rate = 1
-            noise_scale = 0
-            add_pauses = True
-
-            with tempfile.TemporaryDirectory() as temp_dir:
-                audio_path = tts_client.predict(
-                    lezgin_text,
-                    speaking_rate,
-                    noise_scale,
-                    add_pauses,
-                    fn_index=0
+            audio_path = transcode(synthesize(lezgin_text), media_type)
+            if delivery == STREAM:
+                return audio_file_response(
+                    request,
+                    audio_path,
+                    content_type_for(audio_path),
+                    on_close=partial(discard_download, audio_path)
                 )
+            if delivery == URL:
+                return audio_url_response(request, audio_path, {})
+
+            audio_base64 = read_audio_base64(audio_path)
+            discard_download(audio_path)
+
+            return JsonResponse({
+                'audio': audio_base64,
+                'audio_format': content_type_for(audio_path)
+            })
+
+        except BackendWarming as e:
+            return warming_job_response(request, lezgin_text, e)
+        except BackendError as e:
+            return backend_error_response(e)
+        except Exception as e:
+            return JsonResponse(
+                {'error': f'TTS Error: {str(e)}'},
+                status=500
+            )
 
-                temp_file = os.path.join(temp_dir, "audio.wav")
-                shutil.copy(audio_path, temp_file)
 
-                with open(temp_file, 'rb') as f:
-                    audio_data = f.read()
+class TTSAudioView(View):
+    # A plain View: DRF would add Vary: Accept to every response, which splits
+    # CDN caches even when the format comes from the query string.
+    http_method_names = ['get', 'head']
 
-                audio_base64 = base64.b64encode(audio_data).decode('utf-8')
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
+    def get(self, request):
+        serializer = TTSAudioQuerySerializer(data=request.GET.dict())
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
+        params = serializer.validated_data
+        media_type = params.get('audio_format') or get_audio_format(request)
+
+        try:
+            audio_path = transcode(
+                synthesize(params['lezgin_text'], params['speaking_rate'], params['noise_scale'], params['add_pauses']),
+                media_type
+            )
+        except BackendError as e:
+            return backend_error_response(e)
+        except Exception as e:
+            return JsonResponse(
+                {'error': f'TTS Error: {str(e)}'},
+                status=500
+            )
+
+        response = immutable_audio_response(
+            request,
+            audio_path,
+            content_type_for(audio_path),
+            on_close=partial(discard_download, audio_path)
+        )
+        if 'audio_format' not in params:
+            patch_vary_headers(response, ['Accept'])
+        return response
+
+
+class BatchTranslateView(APIView):
+    permission_classes = [AllowAny]
+
+    @staticmethod
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
+    def post(request):
+        serializer = BatchTranslateSerializer(data=request.data)
+        if not serializer.is_valid():
+            return JsonResponse(serializer.errors, status=400)
 
+        items = [
+            (item['text'], serializer.validated_data['tts'] if item['tts'] is None else item['tts'])
+            for item in serializer.validated_data['texts']
+        ]
+        delivery = serializer.validated_data['delivery']
+        media_type = get_audio_format(request)
+        results, unique_count = translate_many(items)
+
+        response_items = []
+        audio_paths = set()
+        for index, ((russian_text, _), (lezgin_text, audio_path, error)) in enumerate(zip(items, results)):
+            item = {'index': index, 'text': russian_text}
+            if isinstance(error, BackendError):
+                item['error'] = str(error)
+                item['code'] = error.code
+            elif error is not None:
+                item['error'] = f'Processing error: {str(error)}'
+            else:
+                item['translation'] = lezgin_text
+                if audio_path is not None:
+                    audio_path = transcode(audio_path, media_type)
+                    if delivery == URL:
+                        token = sign_audio_path(audio_path)
+                        item['audio_url'] = request.build_absolute_uri(reverse('translator:audio', args=[token]))
+                    else:
+                        item['audio'] = read_audio_base64(audio_path)
+                        audio_paths.add(audio_path)
+                    item['audio_format'] = content_type_for(audio_path)
+            response_items.append(item)
+        # Repeated texts share one file, so nothing is discarded before the loop ends.
+        for audio_path in audio_paths:
+            discard_download(audio_path)
+
+        return JsonResponse({'results': response_items, 'unique': unique_count})
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTranslateAndTTSView(View):
+    http_method_names = ['post']
+
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
+    async def post(self, request):
+        data = parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        russian_text = data.get('text')
+        if not russian_text:
+            return JsonResponse({'error': 'Text is required'}, status=400)
+        error_response = too_long_response(russian_text)
+        if error_response is not None:
+            return error_response
+
+        delivery = get_delivery(request, data)
+        media_type = get_audio_format(request)
+        if delivery == SSE:
+            return sse_response(atranslation_events(russian_text, media_type))
+        if delivery not in DELIVERY_MODES and delivery != DEFERRED:
+            return JsonResponse({'error': f'Unknown delivery: {delivery}'}, status=400)
+
+        try:
+            lezgin_text, source, recording_url, chunks, score = await alookup_translation(russian_text)
+            if delivery == DEFERRED:
+                return JsonResponse(
+                    await sync_to_async(deferred_data)(request, lezgin_text, source, recording_url, chunks, score)
+                )
+            spans = None
+            if chunks:
+                audio_path, spans = await aspeak_chunks([translation for _, translation in chunks])
+            else:
+                audio_path = await aspeak(lezgin_text, recording_url)
+            audio_path = await sync_to_async(transcode, thread_sensitive=False)(audio_path, media_type)
+
+            if delivery == STREAM:
+                return audio_file_response(
+                    request,
+                    audio_path,
+                    content_type_for(audio_path),
+                    headers=translation_headers(lezgin_text, source, spans, score),
+                    on_close=partial(discard_download, audio_path)
+                )
+            data = translation_data(lezgin_text, source, score)
+            if chunks:
+                data['chunks'] = chunk_data(chunks, spans)
+            if delivery == URL:
+                return audio_url_response(request, audio_path, data)
+
+            audio_base64 = await sync_to_async(read_audio_base64, thread_sensitive=False)(audio_path)
+            discard_download(audio_path)
             return JsonResponse({
+                **data,
                 'audio': audio_base64,
-                'audio_format': 'audio/wav'
+                'audio_format': content_type_for(audio_path)
             })
 
+        except BackendError as e:
+            return backend_error_response(e)
+        except Exception as e:
+            return JsonResponse(
+                {'error': f'Processing error: {str(e)}'},
+                status=500
+            )
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class AsyncTTSOnlyView(View):
+    http_method_names = ['post']
+
+    @server_timing
+    @limit_concurrency
+    @fail_fast_while_cold
+    async def post(self, request):
+        data = parse_body(request)
+        if data is None:
+            return JsonResponse({'error': 'Invalid JSON body'}, status=400)
+        lezgin_text = data.get('lezgin_text')
+        if not lezgin_text:
+            return JsonResponse({'error': 'lezgin_text необходим'}, status=400)
+
+        delivery = get_delivery(request, data)
+        if delivery not in DELIVERY_MODES:
+            return JsonResponse({'error': f'Unknown delivery: {delivery}'}, status=400)
+
+        try:
+            audio_path = await sync_to_async(transcode, thread_sensitive=False)(
+                await asynthesize(lezgin_text),
+                get_audio_format(request)
+            )
+
+            if delivery == STREAM:
+                return audio_file_response(
+                    request,
+                    audio_path,
+                    content_type_for(audio_path),
+                    on_close=partial(discard_download, audio_path)
+                )
+            if delivery == URL:
+                return audio_url_response(request, audio_path, {})
+
+            audio_base64 = await sync_to_async(read_audio_base64, thread_sensitive=False)(audio_path)
+            discard_download(audio_path)
+            return JsonResponse({
+                'audio': audio_base64,
+                'audio_format': content_type_for(audio_path)
+            })
+
+        except BackendWarming as e:
+            return await sync_to_async(warming_job_response)(request, lezgin_text, e)
+        except BackendError as e:
+            return backend_error_response(e)
         except Exception as e:
             return JsonResponse(
                 {'error': f'TTS Error: {str(e)}'},
                 status=500
-            )
\ No newline at end of file
+            )
+
+
+class TTSJobViewSet(mixins.CreateModelMixin, mixins.RetrieveModelMixin, viewsets.GenericViewSet):
+    serializer_class = TTSJobSerializer
+    permission_classes = [AllowAny]
+    content_negotiation_class = IgnoreAcceptContentNegotiation
+
+    def get_queryset(self):
+        return TTSJob.objects.filter(expires_at__gt=timezone.now())
+
+    def get_object(self):
+        # ?wait=N long-polls up to N seconds for the job to finish. The wait holds a
+        # server thread, so TTS_JOB_MAX_WAIT keeps it short and clients poll again.
+        job = super().get_object()
+        wait = job_wait(self.request)
+        if wait and job.status not in FINISHED:
+            job = wait_for_job(job, wait)
+        return job
+
+    def create(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        job = submit_job(**serializer.validated_data)
+        return Response(
+            self.get_serializer(job).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': self.get_serializer(job).data['status_url']}
+        )
+
+    @action(detail=True, methods=['get'], url_path='audio')
+    def audio(self, request, pk=None):
+        job = self.get_object()
+        if job.status != TTSJob.DONE:
+            return Response(
+                {'detail': 'Аудио еще не готово', 'status': job.status},
+                status=status.HTTP_409_CONFLICT
+            )
+        if not os.path.exists(job.audio_path):
+            return Response({'detail': 'Аудио больше недоступно'}, status=status.HTTP_410_GONE)
+        audio_path = transcode(job.audio_path, get_audio_format(request))
+        return audio_file_response(request, audio_path, content_type_for(audio_path))
+
+
+class AudioView(APIView):
+    permission_classes = [AllowAny]
+    authentication_classes = []
+    content_negotiation_class = IgnoreAcceptContentNegotiation
+
+    @staticmethod
+    def get(request, token):
+        try:
+            audio_path = load_audio_path(token, max_age=get_setting('AUDIO_URL_TTL'))
+        except signing.SignatureExpired:
+            return JsonResponse({'error': 'Audio link expired'}, status=410)
+        except signing.BadSignature:
+            return JsonResponse({'error': 'Audio not found'}, status=404)
+
+        if not os.path.exists(audio_path):
+            return JsonResponse({'error': 'Audio not found'}, status=404)
+        response = audio_file_response(request, audio_path, content_type_for(audio_path))
+        response['Cache-Control'] = f"private, max-age={get_setting('AUDIO_URL_TTL')}"
+        return response
+
+
+class TranslatorStatsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @staticmethod
+    def get(request):
+        audio_cache = get_audio_cache()
+        translation_cache = get_translation_cache()
+        bulkhead = get_bulkhead()
+        return JsonResponse({
+            'pool': get_pool().stats(),
+            'audio_cache': audio_cache.stats() if audio_cache is not None else None,
+            'translation_cache': translation_cache.stats() if translation_cache is not None else None,
+            'coalescing': get_single_flight().stats(),
+            'breakers': breaker_stats(),
+            'bulkhead': bulkhead.stats() if bulkhead is not None else None,
+            'warmth': warmth()
+        })
+
+
+class TranslatorMetricsView(APIView):
+    permission_classes = [IsAdminUser]
+
+    @staticmethod
+    def get(request):
+        metrics = get_metrics()
+        if request.GET.get('format') == 'json':
+            return JsonResponse({'stages': metrics.stats()})
+        return HttpResponse(metrics.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
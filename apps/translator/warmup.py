@@ -0,0 +1,155 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.cache import caches
+
+from .backends import discard_download, get_backend
+from .clients import TRANSLATOR, TTS, get_pool
+from .conf import get_setting
+from .metrics import record
+from .resilience import BackendWarming, backend_option
+
+WARM = 'warm'
+COLD = 'cold'
+STATE_KEY = 'translator:warmth:{}'
+
+_remote_pings = {}
+_remote_pings_lock = threading.Lock()
+_fail_fast = contextvars.ContextVar('translator_fail_fast_while_cold', default=False)
+
+
+def _store():
+    return caches[get_setting('TRANSLATION_CACHE_ALIAS')]
+
+
+def get_state(name):
+    return _store().get(STATE_KEY.format(name))
+
+
+def set_state(name, state, ttl, **info):
+    # Expires on its own, so a stopped keep-warm task never leaves a backend marked cold.
+    value = {'state': state, 'checked_at': time.time(), **info}
+    _store().set(STATE_KEY.format(name), value, ttl)
+    return value
+
+
+def warmth():
+    return {name: get_state(name) for name in (TRANSLATOR, TTS)}
+
+
+def check_warm(name):
+    # Only requests wrapped in fail_fast_while_cold are turned away; job
+    # workers, backfills and the pings themselves wait for the Space instead.
+    if not _fail_fast.get():
+        return
+    state = get_state(name)
+    if state is not None and state['state'] == COLD:
+        raise BackendWarming(name, get_setting('KEEP_WARM_RETRY_AFTER'))
+
+
+def fail_fast_while_cold(view):
+    if asyncio.iscoroutinefunction(view):
+        @functools.wraps(view)
+        async def async_wrapper(*args, **kwargs):
+            token = _fail_fast.set(True)
+            try:
+                return await view(*args, **kwargs)
+            finally:
+                _fail_fast.reset(token)
+        return async_wrapper
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        token = _fail_fast.set(True)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            _fail_fast.reset(token)
+    return wrapper
+
+
+def ping_backend(name):
+    # A ping that does not answer in time is cancelled; if the Space still runs
+    # it, the next ping waits for that job instead of queueing another one.
+    backend = get_backend(name)
+    started = time.perf_counter()
+    with get_pool().client(name) as client:
+        with _remote_pings_lock:
+            job = _remote_pings.get(name)
+            if job is None or job.done():
+                job = _remote_pings[name] = backend.ping(client)
+        try:
+            result = job.result(timeout=backend_option('TIMEOUTS', name))
+        except TimeoutError:
+            job.cancel()
+            raise
+    latency = time.perf_counter() - started
+    record('ping', latency, name)
+    if isinstance(result, str):
+        discard_download(result)
+    return latency
+
+
+class KeepWarm:
+    # Pings every backend once per interval, each on its own thread. A ping
+    # still running after timeout marks its backend cold until one answers;
+    # while cold, pings are repeated every timeout seconds.
+
+    def __init__(self, names=(TRANSLATOR, TTS), interval=240, timeout=20, clock=time.monotonic):
+        self.names = tuple(names)
+        self.interval = interval
+        self.timeout = timeout
+        self.clock = clock
+        self.state_ttl = 3 * interval + timeout
+        self._executor = ThreadPoolExecutor(max_workers=len(self.names), thread_name_prefix='keep-warm')
+        self._pings = {}
+        self._due = {}
+
+    @property
+    def pending(self):
+        return bool(self._pings)
+
+    def _record(self, name, state, **info):
+        return name, set_state(name, state, self.state_ttl, **info)
+
+    def tick(self):
+        # Returns the (name, state) pairs recorded by this tick.
+        now = self.clock()
+        recorded = []
+        for name in self.names:
+            ping = self._pings.get(name)
+            if ping is None:
+                if now >= self._due.get(name, now):
+                    self._pings[name] = (self._executor.submit(ping_backend, name), now)
+                continue
+            future, started = ping
+            if future.done():
+                del self._pings[name]
+                try:
+                    latency = future.result()
+                except Exception as e:
+                    self._due[name] = now + self.timeout
+                    recorded.append(self._record(name, COLD, error=str(e) or type(e).__name__))
+                else:
+                    self._due[name] = started + self.interval
+                    recorded.append(self._record(name, WARM, latency=latency))
+            elif now - started >= self.timeout:
+                state = get_state(name)
+                if state is None or state['state'] != COLD:
+                    recorded.append(self._record(name, COLD, error=f'no answer within {self.timeout}s'))
+        return recorded
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def keep_warm_loop(stop_event, keep_warm, poll_interval=1.0, on_record=None):
+    while not stop_event.is_set():
+        for name, state in keep_warm.tick():
+            if on_record is not None:
+                on_record(name, state)
+        stop_event.wait(poll_interval)
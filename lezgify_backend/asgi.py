@@ -4,4 +4,23 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'lezgify_backend.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported once the apps are loaded.
+from apps.translator.live import LIVE_PATH, live_translation  # noqa: E402
+
+websocket_routes = {
+    LIVE_PATH: live_translation,
+}
+
+
+async def application(scope, receive, send):
+    # Django only speaks HTTP; WebSockets are routed here by path.
+    if scope['type'] != 'websocket':
+        return await django_application(scope, receive, send)
+    handler = websocket_routes.get(scope['path'])
+    if handler is None:
+        await receive()
+        await send({'type': 'websocket.close', 'code': 4404})
+        return
+    return await handler(scope, receive, send)
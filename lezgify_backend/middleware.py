@@ -0,0 +1,63 @@
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+
+class AsyncWhiteNoiseMiddleware(WhiteNoiseMiddleware):
+    # WhiteNoise is sync-only, which makes Django run the whole ASGI middleware
+    # chain in one thread and serialises async views.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, *args, **kwargs):
+        super().__init__(get_response, *args, **kwargs)
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return super().__call__(request)
+
+    async def __acall__(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
+
+
+class AsyncStreamingMiddleware:
+    # Under ASGI Django reads a synchronous streaming body to the end before
+    # sending any of it. Here such a body is handed over chunk by chunk, so
+    # event streams and audio files from sync views reach the client as they
+    # are produced. Under WSGI responses pass through untouched.
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if response.streaming and not response.is_async:
+            response.streaming_content = stream_async(response.streaming_content)
+        return response
+
+
+async def stream_async(iterable):
+    iterator = iter(iterable)
+    done = object()
+    while True:
+        part = await sync_to_async(next)(iterator, done)
+        if part is done:
+            return
+        yield part
@@ -33,8 +33,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'lezgify_backend.middleware.AsyncStreamingMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'whitenoise.middleware.WhiteNoiseMiddleware',
+    'lezgify_backend.middleware.AsyncWhiteNoiseMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -112,6 +113,39 @@ SIMPLE_JWT = {
     'AUTH_HEADER_TYPES': ('Bearer',),
 }
 
+WEB_CONCURRENCY = int(os.getenv('WEB_CONCURRENCY', '1'))
+
+TRANSLATOR = {
+    'TRANSLATOR_SPACE': os.getenv('TRANSLATOR_SPACE', 'stazizov/lezghian_translator_v1'),
+    'TTS_SPACE': os.getenv('TTS_SPACE', 'https://leks-forever-lez-tts.hf.space/'),
+    'POOL_MAX_IDLE': int(os.getenv('TRANSLATOR_POOL_MAX_IDLE', '4')),
+    'POOL_PREWARM': os.getenv('TRANSLATOR_POOL_PREWARM', 'False') == 'True',
+    'AUDIO_CACHE_DIR': os.getenv('TRANSLATOR_AUDIO_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'tts')),
+    'AUDIO_CACHE_MAX_BYTES': int(os.getenv('TRANSLATOR_AUDIO_CACHE_MAX_BYTES', str(512 * 1024 * 1024))),
+    'DOWNLOAD_DIR': os.getenv('TRANSLATOR_DOWNLOAD_DIR', os.path.join(BASE_DIR, 'cache', 'downloads')),
+    'TRANSLATION_CACHE_ALIAS': 'translator',
+    'TRANSLATION_CACHE_TTL': int(os.getenv('TRANSLATOR_TRANSLATION_CACHE_TTL', str(24 * 60 * 60))),
+    'COALESCE_LOCK_DIR': os.getenv('TRANSLATOR_COALESCE_LOCK_DIR', os.path.join(BASE_DIR, 'cache', 'locks')),
+    'BULKHEAD_LIMIT': int(os.getenv('TRANSLATOR_BULKHEAD_LIMIT', str(max(WEB_CONCURRENCY // 2, 1)))),
+    'BULKHEAD_QUEUE_SIZE': int(os.getenv('TRANSLATOR_BULKHEAD_QUEUE_SIZE', '8')),
+    'BULKHEAD_QUEUE_TIMEOUT': float(os.getenv('TRANSLATOR_BULKHEAD_QUEUE_TIMEOUT', '10')),
+    'BULKHEAD_LOCK_DIR': os.getenv('TRANSLATOR_BULKHEAD_LOCK_DIR', os.path.join(BASE_DIR, 'cache', 'bulkhead')),
+    'METRICS_DIR': os.getenv('TRANSLATOR_METRICS_DIR', os.path.join(BASE_DIR, 'cache', 'metrics')),
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'translator': {
+        'BACKEND': os.getenv('TRANSLATOR_CACHE_BACKEND', 'django.core.cache.backends.filebased.FileBasedCache'),
+        'LOCATION': os.getenv('TRANSLATOR_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache', 'translations')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.getenv('TRANSLATOR_CACHE_MAX_ENTRIES', '10000')),
+        },
+    },
+}
+
 LANGUAGE_CODE = 'en-us'
 TIME_ZONE = 'Europe/Moscow'
 USE_I18N = True
@@ -121,6 +155,9 @@ STATIC_URL = '/static/'
 STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 
+MEDIA_URL = '/media/'
+MEDIA_ROOT = os.getenv('MEDIA_ROOT', os.path.join(BASE_DIR, 'media'))
+
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 if not DEBUG: